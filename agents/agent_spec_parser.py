@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Agent Specification Parser
+Deterministic parser for common agent specifications ("Create 3 agents: Product Manager, Developer, and Designer")
+"""
+
+import re
+from typing import Dict, Optional
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'a couple of': 2, 'a pair of': 2, 'a few': 3
+}
+
+# Words that make an item a role title rather than a bare domain ("strategy", "technical")
+ROLE_NOUNS = {
+    'manager', 'developer', 'designer', 'analyst', 'engineer', 'specialist', 'scientist', 'architect',
+    'lead', 'director', 'officer', 'coordinator', 'consultant', 'strategist', 'researcher', 'writer',
+    'editor', 'coach', 'trainer', 'advisor', 'adviser', 'expert', 'planner', 'marketer', 'accountant',
+    'lawyer', 'counsel', 'owner', 'tester', 'administrator', 'admin', 'recruiter', 'representative',
+    'executive', 'head', 'assistant', 'copywriter', 'nutritionist', 'dietitian', 'therapist', 'doctor',
+    'nurse', 'teacher', 'tutor', 'mentor', 'facilitator', 'producer', 'programmer', 'auditor',
+    'economist', 'statistician', 'investor', 'entrepreneur', 'founder', 'ceo', 'cto', 'cfo', 'cmo', 'coo'
+}
+
+KNOWN_EXPERTISE = {
+    'product manager': "Product strategy and project management",
+    'developer': "Technical implementation and coding",
+    'designer': "User interface and user experience design",
+    'marketing manager': "Marketing strategy and campaign management",
+    'data analyst': "Data analysis and insights",
+    'project manager': "Project planning and coordination",
+    'strategy specialist': "Strategic planning and business analysis",
+    'technical specialist': "Technical implementation and feasibility",
+    'nutrition specialist': "Nutrition planning and dietary optimization",
+    'ux designer': "User research and interaction design",
+    'qa engineer': "Quality assurance and test automation",
+}
+
+# Full role titles trusted without the LLM; anything else is at best a guess
+ROLE_TITLES = set(KNOWN_EXPERTISE) | ROLE_NOUNS | {
+    'software engineer', 'software developer', 'frontend developer', 'backend developer', 'full stack developer',
+    'mobile developer', 'web developer', 'devops engineer', 'data engineer', 'security engineer',
+    'machine learning engineer', 'data scientist', 'business analyst', 'financial analyst', 'ux researcher',
+    'ui designer', 'graphic designer', 'product designer', 'product owner', 'scrum master', 'sales manager',
+    'operations manager', 'engineering manager', 'content writer', 'technical writer', 'marketing specialist',
+    'seo specialist', 'customer success manager', 'community manager', 'legal counsel', 'hr manager',
+    'fitness coach', 'personal trainer', 'business strategist', 'solutions architect', 'software architect'
+}
+
+# Items made only of these are answers or filler, not roles ("yes", "it"); items containing them are prose
+_PRONOUNS = {
+    'i', 'me', 'my', 'mine', 'we', 'us', 'our', 'ours', 'you', 'your', 'yours', 'he', 'him', 'his', 'she',
+    'her', 'hers', 'it', 'its', 'they', 'them', 'their', 'theirs', 'this', 'that', 'these', 'those',
+    'someone', 'somebody', 'anyone', 'anybody', 'something'
+}
+_STOPWORDS = _PRONOUNS | {
+    'yes', 'no', 'ok', 'okay', 'sure', 'please', 'thanks', 'thank', 'who', 'whom', 'whose', 'which', 'what',
+    'can', 'could', 'will', 'would', 'should', 'is', 'are', 'was', 'be', 'has', 'have', 'do', 'does',
+    'know', 'knows', 'not', 'maybe', 'just', 'good', 'great'
+}
+
+_COUNT_WORDS = r"\d+|" + "|".join(sorted((re.escape(w) for w in NUMBER_WORDS), key=len, reverse=True))
+_MEMBER_NOUNS = r"agents?|employees?|people|persons?|members?|experts?|specialists?|roles?|bots?|assistants?"
+_COUNT_PATTERN = re.compile(rf"\b({_COUNT_WORDS})\s+(?:\w+\s+)?(?:{_MEMBER_NOUNS})\b|\b({_COUNT_WORDS})\s+total\b"
+                            rf"|\bteam of\s+({_COUNT_WORDS})\b", re.IGNORECASE)
+_TRIGGER_PATTERN = re.compile(r"\b(?:want|need|create|make|add|build|like|get|give me|hire|spin up|set up|"
+                              r"including|with)\b", re.IGNORECASE)
+# Group phrase at the start of a role list: "a team with", "a small group of", "a panel consisting of"
+_LEADING_GROUP_PATTERN = re.compile(r"^(?:(?:a|an|the|my|our|new|small)\s+)*(?:team|group|crew|panel|squad|committee)\s+"
+                                    r"(?:(?:made\s+up|consisting|composed)\s+of|of|with|including|containing)\b\s*",
+                                    re.IGNORECASE)
+# Count phrase at the start of a role list: "3 agents for", "two experts:", "4 with"
+_LEADING_COUNT_PATTERN = re.compile(rf"^(?:{_COUNT_WORDS})?\s*(?:(?:new|ai|more)\s+)?"
+                                    rf"(?:{_MEMBER_NOUNS})?\s*(?:for|as|to be|:|-|with|including)?(?:\s+|$)",
+                                    re.IGNORECASE)
+_SPLIT_PATTERN = re.compile(r"\s*(?:,|;|&|\+|\band\b|\bplus\b|\n)\s*", re.IGNORECASE)
+_LEADING_WORDS = re.compile(r"^(?:(?:a|an|the|one|another|some|also|then|finally|just)\s+)+", re.IGNORECASE)
+_TRAILING_WORDS = re.compile(r"\s+(?:agents?|roles?|persons?|people)$", re.IGNORECASE)
+_PARENTHESES = re.compile(r"\([^)]*\)")
+_SMALL_WORDS = {'of', 'and', 'for', 'the', 'to', 'in', 'on', 'at'}
+
+
+def parse_count(text: str) -> Optional[int]:
+    """
+    Requested number of agents ("3 agents", "four employees", "five total", "a team of 6"), if stated
+    """
+    match = _COUNT_PATTERN.search(text)
+    if not match:
+        return None
+    word = next(group for group in match.groups() if group).lower()
+    return int(word) if word.isdigit() else NUMBER_WORDS[word]
+
+
+def _role_list_text(text: str) -> str:
+    if ':' in text:
+        return text.split(':', 1)[1]
+    match = _TRIGGER_PATTERN.search(text)
+    # Without a trigger phrase the whole text may be the list ("Developer and Designer")
+    return text[match.end():] if match else text
+
+
+def _title(item: str) -> str:
+    words = item.split()
+    return " ".join(
+        word if word[:1].isupper() or (i and word.lower() in _SMALL_WORDS) else word.capitalize()
+        for i, word in enumerate(words)
+    )
+
+
+def _parse_item(item: str) -> Optional[Dict]:
+    """
+    Turn one list item into a spec with a per-item confidence
+    """
+    item = _TRAILING_WORDS.sub("", _LEADING_WORDS.sub("", item.strip(" .!?\"'()"))).strip()
+    if not item or item.isdigit():
+        return None
+    words = [word.lower() for word in item.split()]
+    if all(word in _STOPWORDS or word in _SMALL_WORDS for word in words):
+        return None
+    prose = len(words) > 4 or any(word in _STOPWORDS for word in words)
+    if " ".join(words) in ROLE_TITLES:
+        role, confidence = _title(item), 1.0
+        expertise = f"{role} responsibilities and best practices"
+    elif not prose and any(word in ROLE_NOUNS for word in words):
+        # Looks like a title but is not one we know ("Growth Marketer")
+        role, confidence = _title(item), 0.7
+        expertise = f"{role} responsibilities and best practices"
+    elif not prose and len(words) <= 2:
+        # A bare domain: "strategy" -> "Strategy Specialist"; a guess, so never enough to skip the LLM
+        role, confidence = f"{_title(item)} Specialist", 0.6
+        expertise = f"{_title(item)} planning and execution"
+    else:
+        # Sentence-like item ("a Developer who knows Python"); the LLM is better at these
+        role, confidence = _title(item), 0.3
+        expertise = "General expertise"
+    expertise = KNOWN_EXPERTISE.get(role.lower(), expertise)
+    return {'role': role, 'expertise': expertise, 'confidence': confidence}
+
+
+def parse_agent_specification(text: str) -> Dict:
+    """
+    Parse a user's agent specification without the LLM.
+    Returns {'agents': [{'role', 'expertise'}], 'count': requested count or None, 'confidence': 0..1};
+    confidence is high only when the text is a plain list of role titles that agrees with any stated count.
+    """
+    text = " ".join(text.split())
+    count = parse_count(text)
+    text = " ".join(_PARENTHESES.sub(" ", text).split())
+    list_text = _LEADING_GROUP_PATTERN.sub("", _role_list_text(text).strip(), count=1)
+    list_text = _LEADING_COUNT_PATTERN.sub("", list_text, count=1)
+    items = [parsed for parsed in (_parse_item(part) for part in _SPLIT_PATTERN.split(list_text)) if parsed]
+    if not items:
+        return {'agents': [], 'count': count, 'confidence': 0.0}
+
+    confidence = min(item['confidence'] for item in items)
+    if confidence < 1.0 and count is None:
+        # Bare domains are only trusted when a stated count confirms the list
+        confidence = min(confidence, 0.6)
+    if count is not None and count != len(items):
+        confidence = min(confidence, 0.3)
+    if len({item['role'].lower() for item in items}) != len(items):
+        confidence = min(confidence, 0.5)
+
+    return {
+        'agents': [{'role': item['role'], 'expertise': item['expertise']} for item in items],
+        'count': count,
+        'confidence': confidence
+    }
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Async Runtime
+Shared background event loop that lets the blocking API run the async agent pipeline
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_runtime_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop, starting its thread on first use.
+    Started lazily so each gunicorn worker gets its own loop after forking.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="agents-async-runtime", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Run a coroutine on the shared loop and block the calling thread until it finishes.
+    Many threads can wait at once; the coroutines themselves share one loop.
+    """
+    loop = get_runtime_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the async runtime loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
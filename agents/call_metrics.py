@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Call Metrics
+Per-call LLM instrumentation: latency histograms, token counts, statuses, retries, cache hits and fallbacks
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Histogram bucket upper bounds in seconds; the last bucket is unbounded
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram; quantiles are reported as the upper bound of their bucket
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        index = next((i for i, bound in enumerate(self.bounds) if seconds <= bound), len(self.bounds))
+        self.counts[index] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        count = sum(self.counts)
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        count = sum(self.counts)
+        labels = [f"le_{bound:g}" for bound in self.bounds] + ["le_inf"]
+        return {
+            'count': count,
+            'mean': round(self.total / count, 4) if count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 4),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+def _new_entry() -> Dict:
+    return {
+        'calls': 0, 'ok': 0, 'errors': 0, 'cancelled': 0, 'cache_hits': 0, 'fallbacks': 0, 'retries': 0, 'hedged': 0,
+        'prompt_tokens': 0, 'completion_tokens': 0,
+        'statuses': defaultdict(int), 'models': defaultdict(int),
+        'latency': LatencyHistogram()
+    }
+
+
+class CallMetrics:
+    """
+    Aggregates one record per LLM call by prompt type and appends each record as a JSON line
+    to a size-rotated log. Rotation is not safe across processes, so each worker writes its own
+    file: a {pid} placeholder in the path (present in the default) is replaced with the process ID.
+    Lines are written by a listener thread, so recording never blocks on file I/O; this matters
+    because async calls record on the shared event loop.
+    """
+
+    def __init__(self, log_path: str = None, max_bytes: int = None, backups: int = None):
+        self._lock = threading.Lock()
+        self.by_type = defaultdict(_new_entry)
+        self.started_at = time.time()
+
+        self.log_path = None
+        self._logger = None
+        self._listener = None
+        if os.getenv('XAI_CALL_LOG_ENABLED', '1') != '0':
+            self.log_path = (log_path or os.getenv(
+                'XAI_CALL_LOG_PATH', os.path.join(tempfile.gettempdir(), 'click2lead_llm_calls.{pid}.log')
+            )).replace('{pid}', str(os.getpid()))
+            max_bytes = max_bytes if max_bytes is not None else int(os.getenv('XAI_CALL_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+            backups = backups if backups is not None else int(os.getenv('XAI_CALL_LOG_BACKUPS', '3'))
+            try:
+                handler = RotatingFileHandler(self.log_path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+            except OSError as e:
+                print(f"Warning: LLM call log disabled: {e}")
+                self.log_path = None
+            else:
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                self._listener = QueueListener(queue.SimpleQueue(), handler)
+                self._logger = logging.getLogger(f"click2lead.llm_calls.{id(self)}")
+                self._logger.setLevel(logging.INFO)
+                self._logger.propagate = False
+                self._logger.addHandler(QueueHandler(self._listener.queue))
+                self._listener.start()
+                atexit.register(self.close)
+
+    def record(self, prompt_type: str, status: str, latency: float, model: Optional[str] = None,
+               http_status: Optional[int] = None, attempts: int = 1, hedged: bool = False,
+               prompt_tokens: int = 0, completion_tokens: int = 0, tokens_estimated: bool = False,
+               error: Optional[str] = None):
+        """
+        Record one call. status is 'ok', 'cache_hit', 'cancelled', 'error' or 'circuit_open';
+        callers answer every failed call with a fallback response, so failures count as fallbacks.
+        Cancelled calls (abandoned streams, hedge losers) are neither.
+        """
+        retries = max(0, attempts - 1)
+        with self._lock:
+            entry = self.by_type[prompt_type]
+            entry['calls'] += 1
+            if status == 'cache_hit':
+                entry['cache_hits'] += 1
+            elif status == 'ok':
+                entry['ok'] += 1
+            elif status == 'cancelled':
+                entry['cancelled'] += 1
+            else:
+                entry['errors'] += 1
+                entry['fallbacks'] += 1
+            entry['retries'] += retries
+            entry['hedged'] += int(hedged)
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+            entry['statuses'][str(http_status) if http_status is not None else status] += 1
+            if model:
+                entry['models'][model] += 1
+            entry['latency'].observe(latency)
+
+        logger = self._logger
+        if logger:
+            logger.info(json.dumps({
+                'ts': round(time.time(), 3),
+                'prompt_type': prompt_type,
+                'status': status,
+                'http_status': http_status,
+                'model': model,
+                'latency_ms': round(latency * 1000, 1),
+                'attempts': attempts,
+                'retries': retries,
+                'hedged': hedged,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'tokens_estimated': tokens_estimated,
+                'error': error
+            }))
+
+    def close(self):
+        """
+        Write out the queued log lines and stop the writer thread; later calls are still aggregated
+        """
+        with self._lock:
+            listener, self._listener = self._listener, None
+            logger, self._logger = self._logger, None
+        if listener is None:
+            return
+        atexit.unregister(self.close)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    def record_fallback(self, prompt_type: str):
+        """
+        Count a fallback taken after a call that itself succeeded (e.g. unusable structured output)
+        """
+        with self._lock:
+            self.by_type[prompt_type]['fallbacks'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            by_type = {}
+            for prompt_type, entry in self.by_type.items():
+                stats = {key: value for key, value in entry.items() if key not in ('statuses', 'models', 'latency')}
+                stats['statuses'] = dict(entry['statuses'])
+                stats['models'] = dict(entry['models'])
+                stats['latency'] = entry['latency'].to_dict()
+                stats['total_seconds'] = round(entry['latency'].total, 3)
+                by_type[prompt_type] = stats
+        return {
+            'since': self.started_at,
+            'log_path': self.log_path,
+            'total_calls': sum(stats['calls'] for stats in by_type.values()),
+            'total_seconds': round(sum(stats['total_seconds'] for stats in by_type.values()), 3),
+            'by_prompt_type': by_type
+        }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker
+Stops calling the XAI API after repeated failures so callers fall back instantly instead of waiting on the network
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; N consecutive failures open the circuit
+    open      -> calls are refused until the reset timeout elapses
+    half_open -> exactly one probe call is let through; success closes, failure re-opens with a longer timeout
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None, max_reset_timeout: float = None):
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv('XAI_BREAKER_FAILURES', '5'))
+        self.base_reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv('XAI_BREAKER_RESET_SECONDS', '30'))
+        self.max_reset_timeout = max_reset_timeout if max_reset_timeout is not None else float(os.getenv('XAI_BREAKER_MAX_RESET_SECONDS', '300'))
+
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.last_error = None
+        self.stats = {'rejected': 0, 'opened': 0, 'failures': 0, 'successes': 0}
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Return True if a call may go to the network now
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+
+            if self.state == 'half_open' and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats['successes'] += 1
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            if self.state != 'closed':
+                self.state = 'closed'
+                self.reset_timeout = self.base_reset_timeout
+                self.opened_at = None
+
+    def record_failure(self, error: Optional[Exception] = None):
+        with self._lock:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error else None
+
+            if self.state == 'half_open':
+                # Probe failed: stay open longer before the next probe
+                self.probe_in_flight = False
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == 'closed' and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def release_probe(self):
+        """
+        Give up a half-open probe slot without a verdict (e.g. the call was cancelled)
+        """
+        with self._lock:
+            self.probe_in_flight = False
+
+    def get_state(self) -> Dict:
+        with self._lock:
+            state = {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'opened_at': datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None,
+                'retry_in': max(0.0, self.opened_at + self.reset_timeout - time.time()) if self.state == 'open' else 0.0,
+                'last_error': self.last_error
+            }
+            state.update(self.stats)
+        return state
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.time()
+        self.stats['opened'] += 1
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Completion Cache
+Two-tier (in-memory LRU + SQLite) content-addressed cache for LLM completions
+"""
+
+import os
+import time
+import asyncio
+import json
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class CompletionCache:
+    """
+    Caches completion text keyed on a hash of (model, prompt, max_tokens, temperature).
+    The memory tier is a per-process LRU; the disk tier is shared by every worker on the host.
+    """
+
+    def __init__(self, path: str = None, memory_entries: int = None,
+                 disk_max_bytes: int = None, ttl: float = None):
+        self.path = path or os.getenv(
+            'XAI_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'click2lead_completions.db'))
+        self.memory_entries = memory_entries if memory_entries is not None else int(os.getenv('XAI_CACHE_MEMORY_ENTRIES', '256'))
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else int(os.getenv('XAI_CACHE_DISK_MAX_BYTES', str(50 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv('XAI_CACHE_TTL', str(7 * 24 * 3600)))
+
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        # _lock guards the memory tier and stats; _db_lock serialises the SQLite connection so
+        # memory hits never wait behind disk I/O
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        self._db = None
+        try:
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions(accessed_at)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: completion disk cache disabled: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(model: str, prompt: str, max_tokens: int, temperature: float, response_format: Dict = None) -> str:
+        parts = [model, prompt, max_tokens, temperature]
+        if response_format:
+            parts.append(response_format)
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def peek(self, key: str) -> Optional[str]:
+        """
+        Return the completion from the memory tier only, without touching disk
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached completion, checking memory first and then disk
+        """
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        now = time.time()
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        value, created_at = row
+                        if now - created_at <= self.ttl:
+                            self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+                        else:
+                            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                            value = None
+                        self._db.commit()
+                if value is not None:
+                    with self._lock:
+                        self._remember(key, value, created_at)
+                        self.stats['disk_hits'] += 1
+                    return value
+            except sqlite3.Error as e:
+                print(f"Warning: completion cache read failed: {e}")
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """
+        Store a completion in both tiers
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats['stores'] += 1
+
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO completions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, value, len(value.encode('utf-8')), now, now))
+                    evicted = self._evict_disk(now)
+                    self._db.commit()
+                with self._lock:
+                    self.stats['evictions'] += evicted
+            except sqlite3.Error as e:
+                print(f"Warning: completion cache write failed: {e}")
+
+    def delete(self, key: str):
+        """
+        Drop a completion from both tiers
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: completion cache delete failed: {e}")
+
+    async def async_get(self, key: str) -> Optional[str]:
+        """
+        Async counterpart of get; memory hits are answered inline and disk reads run in a worker thread
+        """
+        value = self.peek(key)
+        if value is not None:
+            return value
+        return await asyncio.to_thread(self.get, key)
+
+    async def async_set(self, key: str, value: str):
+        """
+        Async counterpart of set; the SQLite write runs in a worker thread
+        """
+        await asyncio.to_thread(self.set, key, value)
+
+    async def async_delete(self, key: str):
+        """
+        Async counterpart of delete
+        """
+        await asyncio.to_thread(self.delete, key)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> int:
+        """
+        Drop expired rows, then least-recently-used rows until the table fits the size budget.
+        Returns the number of rows removed.
+        """
+        cursor = self._db.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        evicted = max(cursor.rowcount, 0)
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return evicted
+        for key, size in self._db.execute(
+                "SELECT key, size FROM completions ORDER BY accessed_at ASC").fetchall():
+            if total <= self.disk_max_bytes:
+                break
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        return evicted
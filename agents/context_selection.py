@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Context Selection
+Relevance-ranked selection of prior messages for agent prompts, using cached local bag-of-words vectors
+"""
+
+import re
+import math
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from .token_budget import estimate_tokens, compress_text
+
+_WORD_PATTERN = re.compile(r"[a-z][a-z0-9'-]{2,}")
+STOP_WORDS = frozenset("""
+about above after again against all also and any are because been before being below between both but
+can could did does doing down during each few for from further had has have having her here hers him his
+how into its itself just let more most much must need not now off once only other our ours out over own
+same she should some such than that the their theirs them then there these they this those through too
+under until very was way we were what when where which while who whom why will with would you your yours
+think believe really important ensure consider approach perspective team well make sure
+""".split())
+
+
+def _stem(word: str) -> str:
+    # Light suffix stripping so "strategies" and "strategy" share a term
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+@lru_cache(maxsize=4096)
+def message_vector(text: str) -> Dict[str, float]:
+    """
+    Unit-length sublinear term-frequency vector of a message. Cached per text, so each message is
+    vectorised once however often it is ranked; callers must not mutate the result.
+    """
+    counts = {}
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word not in STOP_WORDS:
+            term = _stem(word)
+            counts[term] = counts.get(term, 0) + 1
+    weights = {term: 1.0 + math.log(count) for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return {term: weight / norm for term, weight in weights.items()}
+
+
+@lru_cache(maxsize=4096)
+def message_tokens(text: str) -> int:
+    return estimate_tokens(text)
+
+
+def select_relevant(query: str, texts: Sequence[str], k: int, max_tokens: int) -> List[Tuple[int, str]]:
+    """
+    (index, text) of up to k texts most similar to query, in their original order, with each text
+    shortened to at most max_tokens // k so the selection fits max_tokens. Similarity is the cosine of
+    the cached vectors with terms weighted by inverse document frequency over texts, so words every
+    message shares (the topic) count for little.
+    """
+    if not texts or k <= 0 or max_tokens <= 0:
+        return []
+    per_message = max(1, max_tokens // k)
+
+    vectors = [message_vector(text) for text in texts]
+    document_frequency = {}
+    for vector in vectors:
+        for term in vector:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    total = len(vectors)
+
+    query_vector = message_vector(query)
+    scores = []
+    for index, vector in enumerate(vectors):
+        score = sum(
+            weight * vector[term] * (1.0 + math.log(total / document_frequency[term])) ** 2
+            for term, weight in query_vector.items() if term in vector
+        )
+        scores.append((score, index))
+
+    # Best first; ties (such as no overlap at all) go to the more recent message
+    best = sorted(scores, key=lambda pair: (-pair[0], -pair[1]))[:k]
+    return [(index, _fit(texts[index], per_message)) for _, index in sorted(best, key=lambda pair: pair[1])]
+
+
+def _fit(text: str, max_tokens: int) -> str:
+    return text if message_tokens(text) <= max_tokens else compress_text(text, max_tokens)
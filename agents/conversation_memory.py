@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Conversation Memory
+Rolling per-conversation memory: a bounded, incrementally refreshed summary plus the latest raw messages
+"""
+
+import os
+from typing import Dict, List
+
+from .token_budget import compress_text, shrink_field, shrink_longest
+from .context_selection import select_relevant
+
+
+class ConversationMemory:
+    """
+    Messages stay raw until a refresh folds all but the last `recent_messages` of them into the summary,
+    which is kept under `summary_tokens`. Folded messages stay in an archive, from which the few most
+    relevant to each agent are selected within `relevant_tokens`. Prompts built from the memory therefore
+    stay the same size however long the conversation runs. Refreshes must not overlap; the broker runs
+    one per exchange.
+    """
+
+    def __init__(self, client, recent_messages: int = None, summary_tokens: int = None,
+                 relevant_messages: int = None, relevant_tokens: int = None, archive_size: int = None):
+        self.client = client
+        self.recent_messages = recent_messages if recent_messages is not None else int(os.getenv('CONVERSATION_MEMORY_RECENT', '6'))
+        self.summary_tokens = summary_tokens if summary_tokens is not None else int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '250'))
+        self.relevant_messages = relevant_messages if relevant_messages is not None else int(os.getenv('CONTEXT_SELECTION_K', '4'))
+        self.relevant_tokens = relevant_tokens if relevant_tokens is not None else int(os.getenv('CONTEXT_SELECTION_TOKENS', '400'))
+        self.archive_size = archive_size if archive_size is not None else int(os.getenv('CONVERSATION_MEMORY_ARCHIVE', '500'))
+
+        self.summary = ""
+        self.messages = []  # Not yet summarized, oldest first
+        self.archive = []  # Every message, oldest first; self.messages is always its tail
+        self.summarized_count = 0
+        self.stats = {'refreshes': 0, 'fallbacks': 0}
+
+    def add_exchange(self, exchange_number: int, agent_responses: List[Dict]):
+        for resp in agent_responses:
+            message = {
+                'exchange_number': exchange_number,
+                'agent_id': resp['agent_id'],
+                'agent_role': resp['agent_role'],
+                'message': resp['message']
+            }
+            self.messages.append(message)
+            self.archive.append(message)
+        # Never trim into the raw tail
+        excess = len(self.archive) - max(self.archive_size, len(self.messages))
+        if excess > 0:
+            del self.archive[:excess]
+
+    def context(self, query: str = None) -> List[Dict]:
+        """
+        The memory as conversation_context entries: the summary, if any, then the folded messages most
+        relevant to query (an agent's role, expertise and topic), then the raw messages
+        """
+        entries = []
+        if self.summary:
+            entries.append({'type': 'summary', 'content': self.summary, 'messages_covered': self.summarized_count})
+        if query:
+            folded = self.archive[:len(self.archive) - len(self.messages)]
+            entries.extend({
+                'type': 'relevant',
+                'exchange_number': folded[index]['exchange_number'],
+                'agent_role': folded[index]['agent_role'],
+                'content': text
+            } for index, text in select_relevant(query, [message['message'] for message in folded],
+                                                 self.relevant_messages, self.relevant_tokens))
+        entries.extend({
+            'type': 'message',
+            'exchange_number': message['exchange_number'],
+            'agent_role': message['agent_role'],
+            'content': message['message']
+        } for message in self.messages)
+        return entries
+
+    async def async_refresh(self) -> bool:
+        """
+        Fold the messages beyond the recent window into the summary; False when there was nothing to fold
+        """
+        overflow = len(self.messages) - self.recent_messages
+        if overflow <= 0:
+            return False
+
+        folded = self.messages[:overflow]
+        try:
+            summary = await self.client.async_chat_completion(self._build_summary_prompt(folded), cache=False,
+                                                              prompt_type='summary')
+            summary = summary.strip()
+        except Exception as e:
+            summary = ""
+        if not summary:
+            summary = self._fallback_summary(folded)
+            self.stats['fallbacks'] += 1
+
+        self.summary = compress_text(summary, self.summary_tokens)
+        del self.messages[:overflow]
+        self.summarized_count += overflow
+        self.stats['refreshes'] += 1
+        return True
+
+    def _build_summary_prompt(self, folded: List[Dict]) -> str:
+        """
+        Summary update prompt within the summary input budget: the longest new messages are halved first
+        """
+        state = {'summary': self.summary}
+        texts = [message['message'] for message in folded]
+
+        def render() -> str:
+            new_text = "\n".join(
+                f"- {message['agent_role']} (exchange {message['exchange_number']}): {text}"
+                for message, text in zip(folded, texts)
+            )
+            return f"""You maintain the running summary of a team discussion.
+
+Current summary:
+{state['summary'] or '(none yet)'}
+
+New messages:
+{new_text}
+
+Rewrite the summary to include the new messages. Keep who proposed what, agreements, disagreements and open questions. Use at most {self.summary_tokens * 3 // 4} words and return only the summary."""
+
+        return self.client.budgeter.fit('summary', render, [
+            shrink_longest(texts),
+            shrink_field(state, 'summary')
+        ])
+
+    def _fallback_summary(self, folded: List[Dict]) -> str:
+        # Older summary and the new messages' leading sentences, half the budget each
+        half = max(1, self.summary_tokens // 2)
+        new_points = " ".join(
+            compress_text(f"{message['agent_role']}: {message['message']}", max(8, half // len(folded)))
+            for message in folded
+        )
+        if not self.summary:
+            return new_points
+        return f"{compress_text(self.summary, half)} {new_points}"
+
+    def export_state(self) -> Dict:
+        return {
+            'summary': self.summary,
+            'archive': self.archive,
+            'raw_messages': len(self.messages),
+            'summarized_count': self.summarized_count,
+            'stats': dict(self.stats)
+        }
+
+    def restore_state(self, state: Dict):
+        self.summary = state.get('summary', "")
+        self.archive = state.get('archive', [])
+        raw = state.get('raw_messages', 0)
+        self.messages = self.archive[len(self.archive) - raw:] if raw else []
+        self.summarized_count = state.get('summarized_count', 0)
+        self.stats.update(state.get('stats', {}))
+
+    def get_stats(self) -> Dict:
+        return {
+            'summary_tokens_limit': self.summary_tokens,
+            'recent_messages': self.recent_messages,
+            'raw_messages': len(self.messages),
+            'summarized_messages': self.summarized_count,
+            'archived_messages': len(self.archive),
+            **self.stats
+        }
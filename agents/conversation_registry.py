@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Conversation Registry
+Session-keyed conversation state with per-session locks and LRU eviction of idle sessions to disk
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    # Session IDs name files on disk, so nothing that could form a path is accepted
+    return bool(session_id) and bool(_SESSION_ID_PATTERN.match(session_id))
+
+
+class SessionNotFoundError(LookupError):
+    """Raised for a conversation ID that no session owns"""
+
+
+class InvalidSessionIdError(ValueError):
+    """Raised for session IDs that are not 1-64 letters, digits, '_' or '-'"""
+
+
+class _Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.owner = None  # The orchestrator; None until loaded
+        self.lock = threading.RLock()  # Serialises requests within the session
+        self.refs = 0  # Requests holding or waiting for the session; pinned while non-zero
+        self.last_used = time.time()
+        self.approx_bytes = 0
+
+
+class ConversationRegistry:
+    """
+    Holds one orchestrator per session. Requests in different sessions run concurrently; requests
+    in the same session are serialised by that session's lock, except read-only ones. The registry's own lock only guards
+    its dictionaries and is never held while a session does work or is written to disk.
+
+    When more than `max_sessions` sessions, or more than `max_bytes` of serialised state, are in
+    memory, the least recently used idle sessions are saved as JSON under `directory` and dropped;
+    the next request for one of them loads it back. The conversation ID index is also kept under
+    `directory`, so a request naming only its conversation finds the session after a restart.
+
+    Sessions live in one process: with several server processes, requests for a session must be
+    routed to the same one (sticky sessions), or two processes can each hold and save a copy.
+    """
+
+    def __init__(self, factory: Callable[[], Any], directory: str = None, max_sessions: int = None,
+                 max_bytes: int = None, on_create: Callable[[str, Any], None] = None,
+                 on_evict: Callable[[str], None] = None):
+        self.factory = factory
+        self.directory = directory or os.getenv(
+            'CONVERSATION_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'click2lead_sessions'))
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv('CONVERSATION_SESSION_MAX', '1000'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv('CONVERSATION_SESSION_MEMORY_MB', '512')) * 1024 * 1024)
+        # on_create(session_id, owner) runs for new and reloaded owners, e.g. to attach listeners
+        self.on_create = on_create
+        self.on_evict = on_evict
+        os.makedirs(os.path.join(self.directory, 'conversations'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()  # Least recently used first
+        self._conversations: Dict[str, str] = {}  # conversation_id -> session_id
+        self._bytes = 0
+        self.stats = {'created': 0, 'loaded': 0, 'evicted': 0, 'evict_failures': 0}
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
+
+    def resolve(self, session_id: str = None, conversation_id: str = None) -> str:
+        """
+        The session for a request: the owner of conversation_id if known, else the given session ID,
+        else a new session. A conversation ID alone that no session owns is an error.
+        """
+        if session_id and not is_valid_session_id(session_id):
+            raise InvalidSessionIdError(f"Invalid session ID: {session_id!r}")
+        if conversation_id:
+            with self._lock:
+                owner = self._conversations.get(conversation_id)
+            if owner is None:
+                owner = self._read_conversation_owner(conversation_id)
+            if owner is not None:
+                return owner
+            if not session_id:
+                raise SessionNotFoundError(f"Unknown conversation ID: {conversation_id}")
+        return session_id or self.new_session_id()
+
+    @contextmanager
+    def session(self, session_id: str, read_only: bool = False) -> Iterator[Any]:
+        """
+        Hold the session's lock and yield its orchestrator, loading it from disk or creating it first.
+        Pass read_only for requests that only read the session: a loaded session is then yielded without
+        its lock, so they never wait behind a long request in the same session, and its size estimate
+        and conversation index are left as they are. The lock is only taken to load the session.
+        """
+        if not is_valid_session_id(session_id):
+            raise InvalidSessionIdError(f"Invalid session ID: {session_id!r}")
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = _Session(session_id)
+            self._sessions.move_to_end(session_id)
+            entry.refs += 1
+
+        try:
+            if read_only:
+                # The pin keeps a loaded owner from being evicted and closed while it is read
+                owner = entry.owner
+                if owner is None:
+                    with entry.lock:
+                        if entry.owner is None:
+                            entry.owner = self._load_or_create(session_id)
+                            self._touch(entry)
+                        owner = entry.owner
+                try:
+                    yield owner
+                finally:
+                    self._touch(entry, measure=False)
+            else:
+                with entry.lock:
+                    if entry.owner is None:
+                        entry.owner = self._load_or_create(session_id)
+                    try:
+                        yield entry.owner
+                    finally:
+                        self._touch(entry)
+        finally:
+            with self._lock:
+                entry.refs -= 1
+            self._evict_over_limits()
+
+    def _load_or_create(self, session_id: str) -> Any:
+        owner = self.factory()
+        state = self._read_state(session_id)
+        if state is not None:
+            owner.restore_state(state)
+        with self._lock:
+            self.stats['loaded' if state is not None else 'created'] += 1
+        if self.on_create:
+            self.on_create(session_id, owner)
+        return owner
+
+    def _touch(self, entry: _Session, measure: bool = True):
+        """
+        Mark a session used after a request; with measure, also refresh its size estimate and
+        conversation index (serialising the whole state, so only after requests that may change it)
+        """
+        if not measure:
+            with self._lock:
+                entry.last_used = time.time()
+            return
+
+        state = entry.owner.export_state()
+        size = len(json.dumps(state, default=str))
+        conversation_ids = [c['conversation_id'] for c in state.get('broker', {}).get('conversation_history', [])]
+        with self._lock:
+            if self._sessions.get(entry.session_id) is entry:
+                self._bytes += size - entry.approx_bytes
+            entry.approx_bytes = size
+            entry.last_used = time.time()
+            new_ids = [c for c in conversation_ids if self._conversations.get(c) != entry.session_id]
+            for conversation_id in new_ids:
+                self._conversations[conversation_id] = entry.session_id
+        for conversation_id in new_ids:
+            self._write_conversation_owner(conversation_id, entry.session_id)
+
+    def _over_limits(self) -> bool:
+        return len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+
+    def _evict_over_limits(self):
+        while True:
+            with self._lock:
+                if not self._over_limits():
+                    return
+                victim = next((entry for entry in self._sessions.values() if entry.refs == 0), None)
+                if victim is None:
+                    return
+                # Pin the victim while it is written out; a request arriving meanwhile keeps it in memory
+                victim.refs += 1
+            if not self._evict(victim):
+                return
+
+    def _evict(self, entry: _Session) -> bool:
+        """
+        Save and drop a pinned session; False if it could not be saved
+        """
+        saved = True
+        with entry.lock:
+            if entry.owner is not None:
+                try:
+                    self._write_state(entry.session_id, entry.owner.export_state())
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"Warning: could not save session {entry.session_id}: {e}")
+                    saved = False
+
+            with self._lock:
+                entry.refs -= 1
+                if not saved:
+                    self.stats['evict_failures'] += 1
+                dropped = saved and entry.refs == 0 and self._sessions.get(entry.session_id) is entry
+                if dropped:
+                    del self._sessions[entry.session_id]
+                    self._bytes -= entry.approx_bytes
+                    self.stats['evicted'] += 1
+                elif not saved and self._sessions.get(entry.session_id) is entry:
+                    # Keep it, but as most recently used so the next eviction tries another session first
+                    self._sessions.move_to_end(entry.session_id)
+
+            if dropped and entry.owner is not None:
+                entry.owner.close()
+                entry.owner = None
+        if dropped and self.on_evict:
+            self.on_evict(entry.session_id)
+        return saved
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _conversation_path(self, conversation_id: str) -> str:
+        return os.path.join(self.directory, 'conversations', conversation_id)
+
+    def _read_conversation_owner(self, conversation_id: str) -> Optional[str]:
+        """
+        The session owning a conversation according to the on-disk index, remembered in memory once found
+        """
+        if not is_valid_session_id(conversation_id):
+            return None
+        try:
+            with open(self._conversation_path(conversation_id), 'r') as f:
+                session_id = f.read().strip()
+        except OSError:
+            return None
+        if not is_valid_session_id(session_id):
+            return None
+        with self._lock:
+            self._conversations[conversation_id] = session_id
+        return session_id
+
+    def _write_conversation_owner(self, conversation_id: str, session_id: str):
+        if not is_valid_session_id(conversation_id):
+            return
+        path = self._conversation_path(conversation_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(session_id)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: could not index conversation {conversation_id}: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _read_state(self, session_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(session_id), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable session {session_id}: {e}")
+            return None
+
+    def _write_state(self, session_id: str, state: Dict):
+        # Write then rename so a crash never leaves a half-written session
+        path = self._path(session_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(state, f, default=str)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Forget a session in memory and on disk; False if it is in use or unknown
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                if entry.refs:
+                    return False
+                del self._sessions[session_id]
+                self._bytes -= entry.approx_bytes
+            conversation_ids = [c for c, s in self._conversations.items() if s == session_id]
+            for conversation_id in conversation_ids:
+                del self._conversations[conversation_id]
+        for conversation_id in conversation_ids:
+            try:
+                os.remove(self._conversation_path(conversation_id))
+            except OSError:
+                pass
+
+        existed = entry is not None
+        if entry is not None and entry.owner is not None:
+            entry.owner.close()
+        try:
+            os.remove(self._path(session_id))
+            existed = True
+        except FileNotFoundError:
+            pass
+        if existed and self.on_evict:
+            self.on_evict(session_id)
+        return existed
+
+    def peek(self, session_id: str) -> Optional[Any]:
+        """
+        A loaded session's orchestrator without taking its lock, for thread-safe reads such as stats
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry.owner if entry is not None else None
+
+    def holds(self, session_id: str) -> bool:
+        """
+        Whether the session is in this process's memory (loaded or being loaded)
+        """
+        with self._lock:
+            return session_id in self._sessions
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'sessions_in_memory': len(self._sessions),
+                'sessions_in_use': sum(1 for entry in self._sessions.values() if entry.refs),
+                'approx_bytes_in_memory': self._bytes,
+                'max_sessions': self.max_sessions,
+                'max_bytes': self.max_bytes,
+                'known_conversations': len(self._conversations),
+                'directory': self.directory,
+                **self.stats
+            }
@@ -7,54 +7,137 @@ Creates and manages agents dynamically based on user specifications
 import os
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import requests
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 from dotenv import load_dotenv
 
+from .xai_client import get_xai_client, configured_api_token, configured_base_url
+from .token_budget import shrink_field, drop_item
+from .structured_output import StructuredOutputError
+from .context_selection import select_relevant
+
+# Personalities longer than this are compressed to their leading sentences when a prompt is over budget
+PERSONALITY_PROMPT_TOKENS = 120
+# Messages from the current round shown to an agent: the most relevant ones, within this many tokens
+ROUND_CONTEXT_MESSAGES = 3
+ROUND_CONTEXT_TOKENS = 450
+
+# Expected shapes of the structured completions
+PERSONALITY_BATCH_SCHEMA = {'type': 'object'}
+SUGGESTION_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'required': ['role', 'expertise'],
+        'properties': {'role': {'type': 'string', 'minLength': 1}, 'expertise': {'type': 'string'},
+                       'reasoning': {'type': 'string'}}
+    }
+}
+VALIDATION_SCHEMA = {
+    'type': 'object',
+    'required': ['is_valid'],
+    'properties': {'is_valid': {'type': 'boolean'}, 'personality_traits': {'type': 'array'}}
+}
+
 load_dotenv()
 
+_creation_pool = None
+_creation_pool_lock = threading.Lock()
+
+
+def _shared_creation_executor() -> ThreadPoolExecutor:
+    """
+    The process-wide bounded pool every manager generates personalities on.
+    One pool per process rather than per manager: a worker serving many sessions would
+    otherwise hold AGENT_CREATION_WORKERS idle threads for each of them.
+    """
+    global _creation_pool
+    with _creation_pool_lock:
+        if _creation_pool is None:
+            _creation_pool = ThreadPoolExecutor(max_workers=int(os.getenv('AGENT_CREATION_WORKERS', '16')),
+                                                thread_name_prefix="agent-creation")
+        return _creation_pool
+
+
 class DynamicAgentManager:
     def __init__(self):
-        self.xai_api_token = os.getenv('XAI_API_TOKEN')
+        self.xai_api_token = configured_api_token()
         if not self.xai_api_token:
             raise ValueError("XAI_API_TOKEN not found in environment variables")
-        self.base_url = "https://api.x.ai/v1"
+        self.base_url = configured_base_url()
+        self.client = get_xai_client(self.xai_api_token, self.base_url)
         self.agents = {}  # Store created agents
         self.agent_counter = 0
+        self._counter_lock = threading.Lock()
+        # Optional callable(agent_id, delta); when set, agent responses are streamed token by token
+        self.delta_listener = None
+        # Lazy mode: create_multiple_agents returns agents with the fallback personality at once
+        # and upgrades them in the background; personality_listener(agent) is told when one is ready
+        self.lazy_personalities = os.getenv('AGENT_LAZY_PERSONALITIES', '0') == '1'
+        self.personality_listener = None
+        self._agents_lock = threading.Lock()
+        # Speculatively generated personalities by role (see prewarm_personalities)
+        self.prewarm_ttl = float(os.getenv('AGENT_PREWARM_TTL', '600'))
+        self.prewarm_max_pending = int(os.getenv('AGENT_PREWARM_MAX_PENDING', '5'))
+        self.prewarm_max_waste = float(os.getenv('AGENT_PREWARM_MAX_WASTE', '0.5'))
+        self._prewarmed = {}
+        self._prewarm_lock = threading.Lock()
+        self.prewarm_stats = {'started': 0, 'claimed': 0, 'expired': 0, 'skipped': 0}
         
     def create_agent(self, role: str, expertise: str, personality_traits: List[str] = None) -> Dict:
         """
         Create a new agent with specified role, expertise, and personality traits
         """
-        agent_id = f"agent_{self.agent_counter}"
-        self.agent_counter += 1
+        agent_id = self._next_agent_id()
         
         # Create agent personality
         personality = self._create_agent_personality(role, expertise, personality_traits)
         
+        return self._register_agent(agent_id, role, expertise, personality)
+    
+    def _next_agent_id(self) -> str:
+        with self._counter_lock:
+            agent_id = f"agent_{self.agent_counter}"
+            self.agent_counter += 1
+        return agent_id
+    
+    def _register_agent(self, agent_id: str, role: str, expertise: str, personality: str,
+                        personality_status: str = 'ready') -> Dict:
         # Create agent instance
         agent = {
             'id': agent_id,
             'role': role,
             'expertise': expertise,
             'personality': personality,
+            'personality_status': personality_status,
             'conversation_context': [],
             'created_at': datetime.now().isoformat(),
             'status': 'active'
         }
         
-        self.agents[agent_id] = agent
+        # Background personality upgrades update self.agents from other threads
+        with self._agents_lock:
+            self.agents[agent_id] = agent
         return agent
     
     def _create_agent_personality(self, role: str, expertise: str, personality_traits: List[str] = None) -> str:
         """
         Generate a personality for the agent using XAI API
         """
+        try:
+            response = self._call_xai_api(self._build_personality_prompt(role, expertise, personality_traits),
+                                          prompt_type='personality')
+            return response.strip()
+        except Exception as e:
+            return self._fallback_personality(role, expertise)
+    
+    def _build_personality_prompt(self, role: str, expertise: str, personality_traits: List[str] = None) -> str:
         if personality_traits is None:
             personality_traits = []
         
-        prompt = f"""Create a professional personality for an AI agent with the following specifications:
+        return f"""Create a professional personality for an AI agent with the following specifications:
 
 Role: {role}
 Expertise: {expertise}
@@ -68,44 +151,235 @@ Please create a detailed personality description that includes:
 5. Their role in team discussions and decision-making
 
 Make it realistic, professional, and suitable for workplace conversations. Keep it concise but comprehensive."""
-
-        try:
-            response = self._call_xai_api(prompt)
-            return response.strip()
-        except Exception as e:
-            # Enhanced fallback personality if API call fails
-            fallback_personalities = {
-                'Product Manager': f"A seasoned Product Manager with expertise in {expertise}. Known for strategic thinking, excellent communication skills, and ability to bridge technical and business requirements. Collaborative leader who focuses on user needs and market opportunities.",
-                'Developer': f"A skilled Developer specializing in {expertise}. Technical problem-solver with attention to detail and passion for clean, efficient code. Values collaboration and enjoys explaining complex technical concepts in accessible terms.",
-                'Designer': f"A creative Designer with expertise in {expertise}. User-centered approach with strong visual and interaction design skills. Collaborative team player who advocates for user experience and design consistency.",
-                'Marketing Manager': f"A strategic Marketing Manager with expertise in {expertise}. Data-driven decision maker with strong analytical skills and creative thinking. Excellent communicator who understands both customer needs and business objectives.",
-                'Data Analyst': f"A detail-oriented Data Analyst specializing in {expertise}. Strong analytical and statistical skills with ability to translate complex data into actionable insights. Collaborative team member who helps drive data-informed decisions.",
-                'Project Manager': f"An experienced Project Manager with expertise in {expertise}. Organized and methodical approach with strong leadership and communication skills. Focuses on delivering results while maintaining team collaboration and stakeholder satisfaction."
-            }
-            
-            # Try to find a matching personality
-            for key, personality in fallback_personalities.items():
-                if key.lower() in role.lower():
-                    return personality
-            
-            # Generic fallback
-            return f"A professional {role} with expertise in {expertise}. Collaborative, knowledgeable, and focused on achieving results through effective communication and problem-solving. Brings valuable perspective to team discussions and decision-making processes."
+    
+    def _fallback_personality(self, role: str, expertise: str) -> str:
+        """
+        Role-based personality used when the XAI API call fails
+        """
+        # Enhanced fallback personality if API call fails
+        fallback_personalities = {
+            'Product Manager': f"A seasoned Product Manager with expertise in {expertise}. Known for strategic thinking, excellent communication skills, and ability to bridge technical and business requirements. Collaborative leader who focuses on user needs and market opportunities.",
+            'Developer': f"A skilled Developer specializing in {expertise}. Technical problem-solver with attention to detail and passion for clean, efficient code. Values collaboration and enjoys explaining complex technical concepts in accessible terms.",
+            'Designer': f"A creative Designer with expertise in {expertise}. User-centered approach with strong visual and interaction design skills. Collaborative team player who advocates for user experience and design consistency.",
+            'Marketing Manager': f"A strategic Marketing Manager with expertise in {expertise}. Data-driven decision maker with strong analytical skills and creative thinking. Excellent communicator who understands both customer needs and business objectives.",
+            'Data Analyst': f"A detail-oriented Data Analyst specializing in {expertise}. Strong analytical and statistical skills with ability to translate complex data into actionable insights. Collaborative team member who helps drive data-informed decisions.",
+            'Project Manager': f"An experienced Project Manager with expertise in {expertise}. Organized and methodical approach with strong leadership and communication skills. Focuses on delivering results while maintaining team collaboration and stakeholder satisfaction."
+        }
+        
+        # Try to find a matching personality
+        for key, personality in fallback_personalities.items():
+            if key.lower() in role.lower():
+                return personality
+        
+        # Generic fallback
+        return f"A professional {role} with expertise in {expertise}. Collaborative, knowledgeable, and focused on achieving results through effective communication and problem-solving. Brings valuable perspective to team discussions and decision-making processes."
     
     def create_multiple_agents(self, agent_specifications: List[Dict]) -> List[Dict]:
         """
-        Create multiple agents based on specifications
+        Create multiple agents based on specifications.
+        All personalities are generated first (in one batched call when possible), then agents
+        get their IDs in specification order. In lazy mode agents are returned at once with
+        their fallback personality and personality_status 'pending'.
         """
+        specs = [
+            self._adopt_prewarmed((spec.get('role', 'Team Member'), spec.get('expertise', 'General'),
+                                   spec.get('personality_traits', [])))
+            for spec in agent_specifications
+        ]
+        if self.lazy_personalities:
+            return self._create_agents_lazily(specs)
+        personalities = self._create_agent_personalities(specs)
+        
         created_agents = []
-        for spec in agent_specifications:
-            agent = self.create_agent(
-                role=spec.get('role', 'Team Member'),
-                expertise=spec.get('expertise', 'General'),
-                personality_traits=spec.get('personality_traits', [])
-            )
-            created_agents.append(agent)
+        for (role, expertise, _), personality in zip(specs, personalities):
+            created_agents.append(self._register_agent(self._next_agent_id(), role, expertise, personality))
         
         return created_agents
     
+    def _create_agents_lazily(self, specs: List[Tuple[str, str, List[str]]]) -> List[Dict]:
+        created_agents = [
+            self._register_agent(self._next_agent_id(), role, expertise,
+                                 self._fallback_personality(role, expertise), personality_status='pending')
+            for role, expertise, _ in specs
+        ]
+        self._start_upgrade(created_agents, specs)
+        return created_agents
+    
+    def _start_upgrade(self, agents: List[Dict], specs: List[Tuple[str, str, List[str]]]):
+        # A plain thread rather than the creation pool: the upgrade itself fans out on that pool
+        threading.Thread(target=self._upgrade_personalities, args=(agents, specs),
+                         name="agent-personalities", daemon=True).start()
+    
+    def _upgrade_personalities(self, agents: List[Dict], specs: List[Tuple[str, str, List[str]]]):
+        """
+        Generate the rich personalities and swap them into the pending agents
+        """
+        try:
+            personalities = self._create_agent_personalities(specs)
+        except Exception as e:
+            print(f"Warning: background personality generation failed: {e}")
+            personalities = [agent['personality'] for agent in agents]
+        
+        for agent, (role, expertise, _), personality in zip(agents, specs, personalities):
+            status = 'fallback' if personality == self._fallback_personality(role, expertise) else 'ready'
+            with self._agents_lock:
+                if self.agents.get(agent['id']) is not agent or agent.get('personality_status') != 'pending':
+                    # Deleted or replaced meanwhile
+                    continue
+                # One dict.update so readers never see the new personality with the old status; updating
+                # in place keeps every reference to the record (e.g. the broker's active agents) current
+                agent.update({'personality': personality, 'personality_status': status})
+            if self.personality_listener is not None:
+                try:
+                    self.personality_listener(agent)
+                except Exception as e:
+                    print(f"Warning: personality listener failed: {e}")
+    
+    def _create_agent_personalities(self, specs: List[Tuple[str, str, List[str]]]) -> List[str]:
+        """
+        Generate one personality per (role, expertise, traits) spec, in order.
+        Uses one structured completion for the whole team; entries missing from a malformed
+        batch (or every entry, with batching off) are generated with individual calls fanned out
+        across the bounded creation pool.
+        """
+        personalities = [self._claim_prewarmed(role, expertise) for role, expertise, _ in specs]
+        pending = [i for i, personality in enumerate(personalities) if personality is None]
+        if len(pending) >= 2 and os.getenv('AGENT_PERSONALITY_BATCH', '1') != '0':
+            batched = self._batch_agent_personalities([specs[i] for i in pending])
+            for i, personality in zip(pending, batched):
+                personalities[i] = personality
+        
+        missing = [i for i, personality in enumerate(personalities) if personality is None]
+        if len(missing) == 1:
+            personalities[missing[0]] = self._create_agent_personality(*specs[missing[0]])
+        elif missing:
+            # map() yields results in submission order
+            generated = _shared_creation_executor().map(lambda i: self._create_agent_personality(*specs[i]), missing)
+            for i, personality in zip(missing, generated):
+                personalities[i] = personality
+        return personalities
+    
+    def prewarm_personalities(self, suggestions: List[Dict]):
+        """
+        Speculatively generate personalities for suggested roles on the creation pool, so that
+        creating those roles later is near-instant. Unclaimed results expire after prewarm_ttl;
+        at most prewarm_max_pending are outstanding, and speculation pauses while more than
+        prewarm_max_waste of it has expired unclaimed.
+        """
+        with self._prewarm_lock:
+            self._expire_prewarmed()
+            for suggestion in suggestions:
+                role = suggestion.get('role') if isinstance(suggestion, dict) else None
+                if not role:
+                    continue
+                expertise = suggestion.get('expertise', 'General')
+                key = self._prewarm_key(role)
+                if key in self._prewarmed:
+                    continue
+                started = self.prewarm_stats['started']
+                wasted = started >= 10 and self.prewarm_stats['expired'] > self.prewarm_max_waste * started
+                if len(self._prewarmed) >= self.prewarm_max_pending or wasted:
+                    self.prewarm_stats['skipped'] += 1
+                    continue
+                future = _shared_creation_executor().submit(self._create_agent_personality, role, expertise,
+                                                          suggestion.get('personality_traits', []))
+                self._prewarmed[key] = (future, expertise, time.time() + self.prewarm_ttl)
+                self.prewarm_stats['started'] += 1
+    
+    def _adopt_prewarmed(self, spec: Tuple[str, str, List[str]]) -> Tuple[str, str, List[str]]:
+        """
+        The spec with the expertise of the personality prewarmed for its role, if there is one.
+        Parsed specifications never reproduce a suggestion's wording, so prewarms are matched by role
+        alone and the agent takes the suggestion's expertise, which its personality describes.
+        """
+        role, expertise, traits = spec
+        with self._prewarm_lock:
+            self._expire_prewarmed()
+            entry = self._prewarmed.get(self._prewarm_key(role))
+        return (role, entry[1], traits) if entry is not None else spec
+    
+    def _claim_prewarmed(self, role: str, expertise: str) -> Optional[str]:
+        """
+        Take the speculative personality for this role, waiting for it if it is still being generated.
+        Only used when it was prewarmed for the same expertise (see _adopt_prewarmed): it states that expertise.
+        """
+        with self._prewarm_lock:
+            self._expire_prewarmed()
+            entry = self._prewarmed.get(self._prewarm_key(role))
+            if entry is None or self._normalize(entry[1]) != self._normalize(expertise):
+                return None
+            del self._prewarmed[self._prewarm_key(role)]
+            self.prewarm_stats['claimed'] += 1
+        future, prewarmed_expertise, _ = entry
+        personality = future.result()
+        if personality == self._fallback_personality(role, prewarmed_expertise):
+            # The speculative call failed; let the caller try the LLM again
+            return None
+        return personality
+    
+    def _expire_prewarmed(self):
+        now = time.time()
+        for key, (future, _, expires_at) in list(self._prewarmed.items()):
+            if expires_at <= now:
+                del self._prewarmed[key]
+                future.cancel()
+                self.prewarm_stats['expired'] += 1
+    
+    def _prewarm_key(self, role: str) -> str:
+        return self._normalize(role)
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(str(text).lower().split())
+    
+    def get_prewarm_stats(self) -> Dict:
+        with self._prewarm_lock:
+            self._expire_prewarmed()
+            stats = dict(self.prewarm_stats)
+            stats['pending'] = len(self._prewarmed)
+        return stats
+    
+    def _batch_agent_personalities(self, specs: List[Tuple[str, str, List[str]]]) -> List[Optional[str]]:
+        """
+        Ask for every personality in one call; returns None for entries the response does not provide
+        """
+        agents_text = "\n".join(
+            f"{i}. Role: {role}; Expertise: {expertise}; Personality Traits: "
+            f"{', '.join(traits) if traits else 'Professional, collaborative, knowledgeable'}"
+            for i, (role, expertise, traits) in enumerate(specs, 1)
+        )
+        example = ", ".join(f'"{i}": "..."' for i in range(1, len(specs) + 1))
+        prompt = f"""Create a professional personality for each of the following AI agents:
+
+{agents_text}
+
+Each personality description should include:
+1. Professional background and experience
+2. Communication style and approach
+3. Key strengths and areas of expertise
+4. How they typically approach problems and collaboration
+5. Their role in team discussions and decision-making
+
+Make them realistic, professional, distinct from one another and suitable for workplace conversations. Keep each concise but comprehensive.
+
+Return only a JSON object keyed by agent number:
+{{{example}}}"""
+        
+        personalities = [None] * len(specs)
+        try:
+            data = self.client.structured_completion(
+                prompt, PERSONALITY_BATCH_SCHEMA,
+                max_tokens=self.client.budgeter.output_budget('personality') * len(specs),
+                prompt_type='personality_batch')
+        except Exception as e:
+            return personalities
+        
+        for i in range(len(specs)):
+            personality = data.get(str(i + 1))
+            if isinstance(personality, str) and personality.strip():
+                personalities[i] = personality.strip()
+        return personalities
+    
     def get_agent(self, agent_id: str) -> Optional[Dict]:
         """
         Get agent by ID
@@ -114,9 +388,10 @@ Make it realistic, professional, and suitable for workplace conversations. Keep
     
     def get_all_agents(self) -> List[Dict]:
         """
-        Get all created agents
+        Get all created agents, as copies that are safe to read while the agents are being updated
         """
-        return list(self.agents.values())
+        with self._agents_lock:
+            return [dict(agent) for agent in self.agents.values()]
     
     def update_agent(self, agent_id: str, updates: Dict) -> bool:
         """
@@ -137,93 +412,190 @@ Make it realistic, professional, and suitable for workplace conversations. Keep
         return False
     
     def generate_agent_response(self, agent_id: str, topic: str, context: str, 
-                               other_agents_messages: List[str] = None) -> str:
+                               other_agents_messages: List[str] = None,
+                               on_delta: Callable[[str], None] = None) -> str:
         """
-        Generate a response from a specific agent
+        Generate a response from a specific agent.
+        With on_delta (or a delta_listener), the completion is streamed and each delta is passed on as it arrives.
         """
         agent = self.get_agent(agent_id)
         if not agent:
             return "Agent not found."
         
-        # Build context for the agent
-        context_parts = [
-            f"You are {agent['role']} with expertise in {agent['expertise']}.",
-            f"Your personality: {agent['personality']}",
-            f"Current topic: {topic}",
-            f"Context: {context}"
-        ]
-        
-        if other_agents_messages:
-            context_parts.append("Recent messages from other team members:")
-            for i, msg in enumerate(other_agents_messages[-3:], 1):  # Last 3 messages
-                context_parts.append(f"{i}. {msg}")
+        prompt = self._build_response_prompt(agent, topic, context, other_agents_messages)
+        on_delta = on_delta or self._listener_for(agent_id)
         
-        context_parts.append("\nPlease provide your professional perspective on this topic, considering your role and expertise.")
+        try:
+            if on_delta:
+                response = "".join(self._stream_xai_api(prompt, on_delta))
+            else:
+                # Conversation turns must stay fresh even when the prompt repeats
+                response = self._call_xai_api(prompt, cache=False, prompt_type='agent_response')
+            return response.strip()
+        except Exception as e:
+            return self._fallback_agent_response(agent, topic)
+    
+    async def async_generate_agent_response(self, agent_id: str, topic: str, context: str,
+                                            other_agents_messages: List[str] = None,
+                                            on_delta: Callable[[str], None] = None) -> str:
+        """
+        Async counterpart of generate_agent_response
+        """
+        agent = self.get_agent(agent_id)
+        if not agent:
+            return "Agent not found."
         
-        prompt = "\n".join(context_parts)
+        prompt = self._build_response_prompt(agent, topic, context, other_agents_messages)
+        on_delta = on_delta or self._listener_for(agent_id)
         
         try:
-            response = self._call_xai_api(prompt)
+            if on_delta:
+                parts = []
+                async for delta in self.client.async_stream_chat_completion(prompt, prompt_type='agent_response'):
+                    parts.append(delta)
+                    on_delta(delta)
+                response = "".join(parts)
+            else:
+                response = await self._async_call_xai_api(prompt, cache=False, prompt_type='agent_response')
             return response.strip()
         except Exception as e:
-            # Enhanced fallback responses based on agent role
-            role = agent['role'].lower()
-            expertise = agent['expertise'].lower()
-            
-            if 'product' in role or 'manager' in role:
-                return f"As a {agent['role']}, I believe we should approach this {topic} systematically. From my expertise in {expertise}, I see several key considerations we need to address. We should focus on user needs, market opportunities, and ensuring our solution aligns with business objectives. What are your thoughts on the technical feasibility and timeline?"
+            return self._fallback_agent_response(agent, topic)
+    
+    def _listener_for(self, agent_id: str) -> Optional[Callable[[str], None]]:
+        if self.delta_listener is None:
+            return None
+        return lambda delta: self.delta_listener(agent_id, delta)
+    
+    def _stream_xai_api(self, prompt: str, on_delta: Callable[[str], None], max_tokens: int = None,
+                        prompt_type: str = 'agent_response') -> Iterator[str]:
+        """
+        Stream a completion, forwarding each delta to on_delta
+        """
+        for delta in self.client.stream_chat_completion(prompt, max_tokens=max_tokens, prompt_type=prompt_type):
+            on_delta(delta)
+            yield delta
+    
+    def _build_response_prompt(self, agent: Dict, topic: str, context: str,
+                               other_agents_messages: List[str] = None) -> str:
+        """
+        Build the prompt for one agent turn, trimmed to the agent_response input budget:
+        a long personality is compressed first, then the oldest messages of this round, the relevant
+        earlier messages and the recent conversation messages are dropped, then the memory summary
+        and the context are shortened
+        """
+        memory = agent.get('conversation_context') or []
+        summary = next((entry['content'] for entry in memory if entry['type'] == 'summary'), "")
+        state = {'personality': agent['personality'], 'context': context, 'summary': summary}
+        relevant = [entry for entry in memory if entry['type'] == 'relevant']
+        history = [entry for entry in memory if entry['type'] == 'message']
+        # The round's messages most relevant to this agent rather than simply the last few
+        messages = [text for _, text in select_relevant(f"{agent['role']} {agent['expertise']} {topic}",
+                                                        other_agents_messages or [],
+                                                        ROUND_CONTEXT_MESSAGES, ROUND_CONTEXT_TOKENS)]
+        
+        def render() -> str:
+            # Build context for the agent
+            context_parts = [
+                f"You are {agent['role']} with expertise in {agent['expertise']}.",
+                f"Your personality: {state['personality']}",
+                f"Current topic: {topic}",
+                f"Context: {state['context']}"
+            ]
             
-            elif 'developer' in role or 'technical' in role or 'engineer' in role:
-                return f"From a technical perspective on {topic}, I can see both opportunities and challenges. My expertise in {expertise} suggests we need to consider implementation complexity, scalability, and maintainability. I'd recommend we start with a proof of concept to validate our approach. How does this align with your strategic vision?"
+            if state['summary']:
+                context_parts.append(f"Conversation so far: {state['summary']}")
+            if relevant:
+                context_parts.append("Earlier points relevant to you:")
+                for entry in relevant:
+                    context_parts.append(f"- {entry['agent_role']} (exchange {entry['exchange_number']}): {entry['content']}")
+            if history:
+                context_parts.append("Latest messages in this conversation:")
+                for entry in history:
+                    context_parts.append(f"- {entry['agent_role']} (exchange {entry['exchange_number']}): {entry['content']}")
             
-            elif 'designer' in role or 'ux' in role or 'creative' in role:
-                return f"As a {agent['role']}, I'm excited about the {topic} opportunity. My expertise in {expertise} tells me we need to prioritize user experience and design consistency. I suggest we conduct user research to understand pain points and create intuitive solutions. How can we balance user needs with technical constraints?"
+            if messages:
+                context_parts.append("Recent messages from other team members:")
+                for i, msg in enumerate(messages, 1):
+                    context_parts.append(f"{i}. {msg}")
             
-            elif 'marketing' in role or 'analyst' in role or 'data' in role:
-                return f"Looking at {topic} through the lens of {expertise}, I see several data points we should consider. We need to understand our target audience, measure performance metrics, and optimize based on results. I recommend we establish clear KPIs and track progress systematically. What are your thoughts on the strategic direction?"
+            context_parts.append("\nPlease provide your professional perspective on this topic, considering your role and expertise.")
             
-            else:
-                return f"As a {agent['role']} with expertise in {expertise}, I have some valuable insights on {topic}. I believe we should consider multiple perspectives and ensure our approach is well-rounded. Collaboration will be key to success here. What aspects should we prioritize first?"
+            return "\n".join(context_parts)
+        
+        return self.client.budgeter.fit('agent_response', render, [
+            shrink_field(state, 'personality', PERSONALITY_PROMPT_TOKENS),
+            drop_item(messages),
+            drop_item(relevant),
+            drop_item(history),
+            shrink_field(state, 'summary'),
+            shrink_field(state, 'context')
+        ])
     
-    def _call_xai_api(self, prompt: str, max_tokens: int = 500) -> str:
+    def _fallback_agent_response(self, agent: Dict, topic: str) -> str:
         """
-        Make API call to XAI
+        Role-based response used when the XAI API call fails
         """
-        headers = {
-            "Authorization": f"Bearer {self.xai_api_token}",
-            "Content-Type": "application/json"
-        }
+        # Enhanced fallback responses based on agent role
+        role = agent['role'].lower()
+        expertise = agent['expertise'].lower()
         
-        # Try different model names
-        models_to_try = ["x-1", "x-2", "x-3", "grok-beta"]
+        if 'product' in role or 'manager' in role:
+            return f"As a {agent['role']}, I believe we should approach this {topic} systematically. From my expertise in {expertise}, I see several key considerations we need to address. We should focus on user needs, market opportunities, and ensuring our solution aligns with business objectives. What are your thoughts on the technical feasibility and timeline?"
         
-        for model in models_to_try:
-            try:
-                data = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": max_tokens,
-                    "temperature": 0.7
-                }
-                
-                response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=data)
-                
-                if response.status_code == 200:
-                    return response.json()["choices"][0]["message"]["content"]
-                elif response.status_code == 404:
-                    # Model not found, try next one
-                    continue
-                else:
-                    raise Exception(f"XAI API error: {response.status_code} - {response.text}")
-                    
-            except Exception as e:
-                if "404" in str(e) and "model" in str(e).lower():
-                    continue
-                else:
-                    raise e
+        elif 'developer' in role or 'technical' in role or 'engineer' in role:
+            return f"From a technical perspective on {topic}, I can see both opportunities and challenges. My expertise in {expertise} suggests we need to consider implementation complexity, scalability, and maintainability. I'd recommend we start with a proof of concept to validate our approach. How does this align with your strategic vision?"
+        
+        elif 'designer' in role or 'ux' in role or 'creative' in role:
+            return f"As a {agent['role']}, I'm excited about the {topic} opportunity. My expertise in {expertise} tells me we need to prioritize user experience and design consistency. I suggest we conduct user research to understand pain points and create intuitive solutions. How can we balance user needs with technical constraints?"
         
-        # If all models fail, raise an exception to trigger fallback responses
-        raise Exception("XAI API not available - using fallback responses")
+        elif 'marketing' in role or 'analyst' in role or 'data' in role:
+            return f"Looking at {topic} through the lens of {expertise}, I see several data points we should consider. We need to understand our target audience, measure performance metrics, and optimize based on results. I recommend we establish clear KPIs and track progress systematically. What are your thoughts on the strategic direction?"
+        
+        else:
+            return f"As a {agent['role']} with expertise in {expertise}, I have some valuable insights on {topic}. I believe we should consider multiple perspectives and ensure our approach is well-rounded. Collaboration will be key to success here. What aspects should we prioritize first?"
+    
+    def _call_xai_api(self, prompt: str, max_tokens: int = None, cache: bool = True,
+                      prompt_type: str = 'general') -> str:
+        """
+        Make API call to XAI through the shared pooled client
+        """
+        return self.client.chat_completion(prompt, max_tokens=max_tokens, cache=cache, prompt_type=prompt_type)
+    
+    async def _async_call_xai_api(self, prompt: str, max_tokens: int = None, cache: bool = True,
+                                  prompt_type: str = 'general') -> str:
+        """
+        Async API call to XAI through the shared client
+        """
+        return await self.client.async_chat_completion(prompt, max_tokens=max_tokens, cache=cache,
+                                                       prompt_type=prompt_type)
+    
+    def export_state(self) -> Dict:
+        """
+        JSON-serialisable agents and counter, for saving a conversation session
+        """
+        with self._agents_lock:
+            return {'agents': dict(self.agents), 'agent_counter': self.agent_counter}
+    
+    def restore_state(self, state: Dict):
+        """
+        Restore a state saved by export_state. Agents saved while their personalities were still
+        being generated (the session was evicted meanwhile) have them generated again.
+        """
+        self.agents = state.get('agents', {})
+        self.agent_counter = state.get('agent_counter', 0)
+        pending = [agent for agent in self.agents.values() if agent.get('personality_status') == 'pending']
+        if pending:
+            self._start_upgrade(pending, [(agent['role'], agent['expertise'], []) for agent in pending])
+    
+    def close(self):
+        """
+        Drop pending prewarmed personalities, cancelling those that have not started.
+        The creation pool is shared by every manager and stays up.
+        """
+        with self._prewarm_lock:
+            for future, _, _ in self._prewarmed.values():
+                future.cancel()
+            self._prewarmed.clear()
     
     def save_agents_to_file(self, filename: str = None) -> str:
         """
@@ -266,7 +638,8 @@ class AgentSpecificationHelper:
     
     def __init__(self, xai_api_token: str):
         self.xai_api_token = xai_api_token
-        self.base_url = "https://api.x.ai/v1"
+        self.base_url = configured_base_url()
+        self.client = get_xai_client(self.xai_api_token, self.base_url)
     
     def suggest_agent_roles(self, topic: str, context: str) -> List[Dict]:
         """
@@ -285,12 +658,9 @@ For each role, provide:
 Format your response as a JSON array of objects with 'role', 'expertise', and 'reasoning' fields."""
 
         try:
-            response = self._call_xai_api(prompt, max_tokens=800)
-            # Try to parse JSON response
             try:
-                suggestions = json.loads(response)
-                return suggestions
-            except json.JSONDecodeError:
+                return self.client.structured_completion(prompt, SUGGESTION_SCHEMA, models=["x-1"], prompt_type='suggest')
+            except StructuredOutputError:
                 # If JSON parsing fails, return a default suggestion
                 return [
                     {
@@ -326,11 +696,9 @@ Provide feedback on:
 Format as JSON with 'is_valid', 'suggestions', 'enhanced_role', 'enhanced_expertise', and 'personality_traits' fields."""
 
         try:
-            response = self._call_xai_api(prompt, max_tokens=600)
             try:
-                validation = json.loads(response)
-                return validation
-            except json.JSONDecodeError:
+                return self.client.structured_completion(prompt, VALIDATION_SCHEMA, models=["x-1"], prompt_type='validate')
+            except StructuredOutputError:
                 return {
                     'is_valid': True,
                     'suggestions': 'Specification looks good',
@@ -347,28 +715,11 @@ Format as JSON with 'is_valid', 'suggestions', 'enhanced_role', 'enhanced_expert
                 'personality_traits': ['Professional', 'Collaborative']
             }
     
-    def _call_xai_api(self, prompt: str, max_tokens: int = 500) -> str:
+    def _call_xai_api(self, prompt: str, max_tokens: int = None, prompt_type: str = 'general') -> str:
         """
-        Make API call to XAI
+        Make API call to XAI through the shared pooled client
         """
-        headers = {
-            "Authorization": f"Bearer {self.xai_api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "x-1",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=data)
-        
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"XAI API error: {response.status_code} - {response.text}")
+        return self.client.chat_completion(prompt, max_tokens=max_tokens, models=["x-1"], prompt_type=prompt_type)
 
 # Example usage and testing
 if __name__ == "__main__":
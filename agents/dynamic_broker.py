@@ -5,23 +5,105 @@ Handles conversations with any number of dynamically created agents
 """
 
 import os
-import json
-import time
+import uuid
+import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import requests
+from typing import Dict, List, Optional, Any, Tuple
 from dotenv import load_dotenv
 
-from .dynamic_agent_manager import DynamicAgentManager, AgentSpecificationHelper
+from .xai_client import get_xai_client, configured_api_token, configured_base_url
+from .async_runtime import run_sync
+from .agent_spec_parser import parse_agent_specification
+from .keyword_matcher import KeywordMatcher
+from .structured_output import StructuredOutputError
+from .conversation_memory import ConversationMemory
+from .token_budget import shrink_field, shrink_longest, drop_item, compress_text
+from .dynamic_agent_manager import DynamicAgentManager, AgentSpecificationHelper, PERSONALITY_PROMPT_TOKENS
 
 load_dotenv()
 
+# Few-shot examples for the specification parser, long ones last; trimmed from the end when over budget
+PARSE_EXAMPLES = [
+    """User: "Create 3 agents: Product Manager, Developer, and Designer"
+Output: [
+    {"role": "Product Manager", "expertise": "Product strategy and project management"},
+    {"role": "Developer", "expertise": "Technical implementation and coding"},
+    {"role": "Designer", "expertise": "User interface and user experience design"}
+]""",
+    """User: "I want a Marketing Manager and Data Analyst"
+Output: [
+    {"role": "Marketing Manager", "expertise": "Marketing strategy and campaign management"},
+    {"role": "Data Analyst", "expertise": "Data analysis and insights"}
+]""",
+    """User: "Just create 2 agents for strategy and technical"
+Output: [
+    {"role": "Strategy Specialist", "expertise": "Strategic planning and business analysis"},
+    {"role": "Technical Specialist", "expertise": "Technical implementation and feasibility"}
+]""",
+    """User: "I would like 3 employees working for me. I would like one to be in charge of my workouts and then another to be in charge of my nutrition I am eating/drinking, and then another to make sure that the workouts align with my nutrients and my nutrients aligns with my workouts"
+Output: [
+    {"role": "Workout Specialist", "expertise": "Fitness training and exercise program design"},
+    {"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"},
+    {"role": "Fitness Coordinator", "expertise": "Integration of workouts and nutrition for optimal performance"}
+]""",
+    """User: "Build me agents for myself I would like these agents to be like employees corresponding with one another. I would like an agent for nutrition, making sure all my dietary needs are met, and the way that this agent will do that will be corresponding with the other agents, and then another agent for in charge of my martial arts training another agent for my sprinting training and then another for my strength training, so four total agents"
+Output: [
+    {"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"},
+    {"role": "Martial Arts Specialist", "expertise": "Martial arts training and technique development"},
+    {"role": "Sprinting Specialist", "expertise": "Sprint training and speed development"},
+    {"role": "Strength Training Specialist", "expertise": "Strength training and muscle development"}
+]"""
+]
+
+# Expected shapes of the structured completions
+PARSE_SCHEMA = {
+    'type': 'array',
+    'minItems': 1,
+    'items': {
+        'type': 'object',
+        'required': ['role', 'expertise'],
+        'properties': {'role': {'type': 'string', 'minLength': 1}, 'expertise': {'type': 'string'}}
+    }
+}
+BATCHED_EXCHANGE_SCHEMA = {
+    'type': 'object',
+    'required': ['responses'],
+    'properties': {'responses': {'type': 'object'}, 'analysis': {'type': 'string'}}
+}
+
+# Keyword rules for _extract_agents_from_fallback; roles are listed in this order when matched
+FALLBACK_ROLES = [
+    ('strength', {"role": "Strength Training Specialist", "expertise": "Strength training and muscle development"}),
+    ('martial_arts', {"role": "Martial Arts Specialist", "expertise": "Martial arts training and technique development"}),
+    ('sprinting', {"role": "Sprinting Specialist", "expertise": "Sprint training and speed development"}),
+    ('nutrition', {"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"}),
+    ('coordination', {"role": "Fitness Coordinator", "expertise": "Integration of workouts and nutrition for optimal performance"}),
+    ('product_manager', {"role": "Product Manager", "expertise": "Product strategy and project management"}),
+    ('developer', {"role": "Developer", "expertise": "Technical implementation and coding"}),
+    ('designer', {"role": "Designer", "expertise": "User interface and user experience design"}),
+    ('marketing', {"role": "Marketing Manager", "expertise": "Marketing strategy and campaign management"}),
+    ('data_analyst', {"role": "Data Analyst", "expertise": "Data analysis and insights"}),
+]
+FALLBACK_ROLE_KEYWORDS = KeywordMatcher({
+    'strength': ['workout*', 'fitness', 'strength training'],
+    'martial_arts': ['martial'],
+    'sprinting': ['sprint*'],
+    'nutrition': ['nutrition', 'eating', 'drinking', 'dietary'],
+    'coordination': ['align*', 'coordinate*', 'coordination'],
+    'product_manager': ['product manager*'],
+    'developer': ['developer*', 'technical'],
+    'designer': ['design*'],
+    'marketing': ['marketing'],
+    'data_analyst': ['data analyst*'],
+})
+
 class DynamicBrokerAgent:
     def __init__(self):
-        self.xai_api_token = os.getenv('XAI_API_TOKEN')
+        self.xai_api_token = configured_api_token()
         if not self.xai_api_token:
             raise ValueError("XAI_API_TOKEN not found in environment variables")
-        self.base_url = "https://api.x.ai/v1"
+        self.base_url = configured_base_url()
+        self.client = get_xai_client(self.xai_api_token, self.base_url)
         
         # Initialize dynamic agent manager
         self.agent_manager = DynamicAgentManager()
@@ -34,6 +116,14 @@ class DynamicBrokerAgent:
         self.max_exchanges = 6
         self.conversation_goals = []
         self.active_agents = []
+        # Rolling summary plus recent messages of the current conversation, shared with the agents
+        self.memory = None
+        # 'sequential': one LLM call per agent plus one for the analysis
+        # 'parallel': every agent answers the previous exchange concurrently (see _async_parallel_round)
+        # 'batched': every agent and the analysis in one structured call (see _async_batched_exchange)
+        self.exchange_mode = os.getenv('BROKER_EXCHANGE_MODE', 'sequential')
+        # Specifications the local parser reads with at least this confidence skip the LLM
+        self.spec_parser_min_confidence = float(os.getenv('SPEC_PARSER_MIN_CONFIDENCE', '0.8'))
         
         # Broker personality
         self.broker_personality = """You are an intelligent conversation broker and facilitator. Your role is to:
@@ -60,9 +150,10 @@ You are professional, helpful, and focused on creating valuable multi-agent conv
         """
         Start a new conversation with specified or dynamically created agents
         """
-        conversation_id = f"conv_{int(time.time())}"
+        conversation_id = f"conv_{uuid.uuid4().hex}"
         self.current_conversation_id = conversation_id
         self.exchange_count = 0
+        self.memory = ConversationMemory(self.client)
         
         # Set conversation goals
         self.conversation_goals = [
@@ -113,6 +204,10 @@ You are professional, helpful, and focused on creating valuable multi-agent conv
         # Get suggestions for appropriate agents
         suggestions = self.helper.suggest_agent_roles(topic, context)
         
+        # Users usually pick the suggested roles; start on their personalities while they decide
+        if os.getenv('AGENT_PREWARM', '1') != '0':
+            self.agent_manager.prewarm_personalities(suggestions)
+        
         # Create a detailed prompt for the user
         prompt = f"""I'd be happy to help you start a conversation about "{topic}". 
 
@@ -164,11 +259,7 @@ What would you prefer?"""
             # Parse user specification using AI
             agent_specs = self._parse_user_agent_specification(user_specification, topic, context)
             
-            # Create the agents
-            created_agents = self.agent_manager.create_multiple_agents(agent_specs)
-            self.active_agents = created_agents
-            
-            # Now start the actual conversation
+            # start_conversation creates the agents (personalities are generated concurrently)
             return self.start_conversation(topic, context, agent_specs)
             
         except Exception as e:
@@ -179,64 +270,50 @@ What would you prefer?"""
     
     def _parse_user_agent_specification(self, user_spec: str, topic: str, context: str) -> List[Dict]:
         """
-        Parse user specification to extract agent roles and expertise
+        Parse user specification to extract agent roles and expertise.
+        Simple role lists are parsed locally; the LLM is only asked when the local parse is unsure.
         """
-        prompt = f"""Parse the following user specification to extract agent roles and expertise. Return a JSON array of agent specifications.
+        parsed = parse_agent_specification(user_spec)
+        if parsed['confidence'] >= self.spec_parser_min_confidence:
+            return parsed['agents']
+        
+        prompt = self._build_parse_prompt(user_spec, topic, context)
+
+        try:
+            return self.client.structured_completion(prompt, PARSE_SCHEMA, prompt_type='parse')
+        except StructuredOutputError:
+            # Fallback: try to extract number of agents from user spec
+            return self._extract_agents_from_fallback(user_spec, topic, context)
+        except Exception as e:
+            # Fallback: try to extract number of agents from user spec
+            return self._extract_agents_from_fallback(user_spec, topic, context)
+    
+    def _build_parse_prompt(self, user_spec: str, topic: str, context: str) -> str:
+        """
+        Build the specification-parsing prompt within the parse input budget:
+        the context is shortened first, then the longest few-shot examples are dropped (at least one is kept)
+        """
+        state = {'context': context}
+        examples = list(PARSE_EXAMPLES)
+        
+        def render() -> str:
+            examples_text = "\n\n".join(examples)
+            return f"""Parse the following user specification to extract agent roles and expertise. Return a JSON array of agent specifications.
 
 User specification: "{user_spec}"
 Topic: {topic}
-Context: {context}
+Context: {state['context']}
 
 Examples:
 
-User: "Create 3 agents: Product Manager, Developer, and Designer"
-Output: [
-    {{"role": "Product Manager", "expertise": "Product strategy and project management"}},
-    {{"role": "Developer", "expertise": "Technical implementation and coding"}},
-    {{"role": "Designer", "expertise": "User interface and user experience design"}}
-]
-
-User: "I want a Marketing Manager and Data Analyst"
-Output: [
-    {{"role": "Marketing Manager", "expertise": "Marketing strategy and campaign management"}},
-    {{"role": "Data Analyst", "expertise": "Data analysis and insights"}}
-]
-
-User: "Just create 2 agents for strategy and technical"
-Output: [
-    {{"role": "Strategy Specialist", "expertise": "Strategic planning and business analysis"}},
-    {{"role": "Technical Specialist", "expertise": "Technical implementation and feasibility"}}
-]
-
-User: "I would like 3 employees working for me. I would like one to be in charge of my workouts and then another to be in charge of my nutrition I am eating/drinking, and then another to make sure that the workouts align with my nutrients and my nutrients aligns with my workouts"
-Output: [
-    {{"role": "Workout Specialist", "expertise": "Fitness training and exercise program design"}},
-    {{"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"}},
-    {{"role": "Fitness Coordinator", "expertise": "Integration of workouts and nutrition for optimal performance"}}
-]
-
-User: "Build me agents for myself I would like these agents to be like employees corresponding with one another. I would like an agent for nutrition, making sure all my dietary needs are met, and the way that this agent will do that will be corresponding with the other agents, and then another agent for in charge of my martial arts training another agent for my sprinting training and then another for my strength training, so four total agents"
-Output: [
-    {{"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"}},
-    {{"role": "Martial Arts Specialist", "expertise": "Martial arts training and technique development"}},
-    {{"role": "Sprinting Specialist", "expertise": "Sprint training and speed development"}},
-    {{"role": "Strength Training Specialist", "expertise": "Strength training and muscle development"}}
-]
+{examples_text}
 
 Please parse the user specification and return only the JSON array."""
-
-        try:
-            response = self._call_xai_api(prompt, max_tokens=800)
-            # Try to parse JSON response
-            try:
-                agent_specs = json.loads(response)
-                return agent_specs
-            except json.JSONDecodeError:
-                # Fallback: try to extract number of agents from user spec
-                return self._extract_agents_from_fallback(user_spec, topic, context)
-        except Exception as e:
-            # Fallback: try to extract number of agents from user spec
-            return self._extract_agents_from_fallback(user_spec, topic, context)
+        
+        return self.client.budgeter.fit('parse', render, [
+            shrink_field(state, 'context'),
+            drop_item(examples, index=-1, keep=1)
+        ])
     
     def _extract_agents_from_fallback(self, user_spec: str, topic: str, context: str) -> List[Dict]:
         """
@@ -244,49 +321,17 @@ Please parse the user specification and return only the JSON array."""
         """
         user_spec_lower = user_spec.lower()
         
-        # Try to extract number of agents
-        agent_count = 2  # default
-        if "3 employees" in user_spec_lower or "3 agents" in user_spec_lower:
-            agent_count = 3
-        elif "4 employees" in user_spec_lower or "4 agents" in user_spec_lower or "four total" in user_spec_lower:
-            agent_count = 4
-        elif "5 employees" in user_spec_lower or "5 agents" in user_spec_lower:
-            agent_count = 5
-        
-        # Try to extract specific roles from the text
-        agents = []
-        
-        # Check for fitness/nutrition related roles
-        if "workout" in user_spec_lower or "fitness" in user_spec_lower or "strength training" in user_spec_lower:
-            agents.append({"role": "Strength Training Specialist", "expertise": "Strength training and muscle development"})
+        # A role list the local parser is reasonably sure about beats the keyword heuristics below
+        parsed = parse_agent_specification(user_spec)
+        if parsed['confidence'] >= 0.5:
+            return parsed['agents']
         
-        if "martial arts" in user_spec_lower or "martial" in user_spec_lower:
-            agents.append({"role": "Martial Arts Specialist", "expertise": "Martial arts training and technique development"})
+        # Try to extract number of agents ("3 agents", "four total", "six employees", ...)
+        agent_count = parsed['count'] or 2  # default
         
-        if "sprinting" in user_spec_lower or "sprint" in user_spec_lower or "sprint training" in user_spec_lower:
-            agents.append({"role": "Sprinting Specialist", "expertise": "Sprint training and speed development"})
-        
-        if "nutrition" in user_spec_lower or "eating" in user_spec_lower or "drinking" in user_spec_lower or "dietary" in user_spec_lower:
-            agents.append({"role": "Nutrition Specialist", "expertise": "Nutrition planning and dietary optimization"})
-        
-        if "align" in user_spec_lower or "coordinate" in user_spec_lower or "coordination" in user_spec_lower:
-            agents.append({"role": "Fitness Coordinator", "expertise": "Integration of workouts and nutrition for optimal performance"})
-        
-        # Check for business/technical roles
-        if "product" in user_spec_lower and "manager" in user_spec_lower:
-            agents.append({"role": "Product Manager", "expertise": "Product strategy and project management"})
-        
-        if "developer" in user_spec_lower or "technical" in user_spec_lower:
-            agents.append({"role": "Developer", "expertise": "Technical implementation and coding"})
-        
-        if "designer" in user_spec_lower or "design" in user_spec_lower:
-            agents.append({"role": "Designer", "expertise": "User interface and user experience design"})
-        
-        if "marketing" in user_spec_lower:
-            agents.append({"role": "Marketing Manager", "expertise": "Marketing strategy and campaign management"})
-        
-        if "data" in user_spec_lower and "analyst" in user_spec_lower:
-            agents.append({"role": "Data Analyst", "expertise": "Data analysis and insights"})
+        # Try to extract specific roles from the text
+        matched = FALLBACK_ROLE_KEYWORDS.match(user_spec)
+        agents = [dict(spec) for category, spec in FALLBACK_ROLES if category in matched]
         
         # If we found specific roles, use them
         if agents:
@@ -310,13 +355,18 @@ Please parse the user specification and return only the JSON array."""
             return agents[:agent_count]  # Limit to requested number
         
         # Otherwise create generic agents
-        generic_roles = ["Team Member 1", "Team Member 2", "Team Member 3", "Team Member 4", "Team Member 5"]
-        return [{"role": generic_roles[i], "expertise": "General expertise"} for i in range(agent_count)]
+        return [{"role": f"Team Member {i + 1}", "expertise": "General expertise"} for i in range(agent_count)]
     
     def conduct_exchange(self) -> Dict:
         """
         Conduct one exchange between all active agents
         """
+        return run_sync(self.async_conduct_exchange())
+    
+    async def async_conduct_exchange(self) -> Dict:
+        """
+        Conduct one exchange between all active agents without blocking a thread on the LLM calls
+        """
         if not self.active_agents:
             return {
                 'status': 'error',
@@ -324,32 +374,60 @@ Please parse the user specification and return only the JSON array."""
             }
         
         if self.exchange_count >= self.max_exchanges:
-            return self._force_conclusion()
+            return await self._async_force_conclusion()
         
         self.exchange_count += 1
+        exchange_data = await self._async_exchange_turns()
+        return await self._async_finish_exchange(exchange_data)
+    
+    async def async_conduct_exchanges(self, count: int) -> List[Dict]:
+        """
+        Results of `count` consecutive async_conduct_exchange calls, pipelined: the broker analysis of
+        exchange k runs while the agents take the turns of exchange k+1 (the turns never read the analysis),
+        and a conclusion due after the final exchange runs alongside that exchange's analysis.
+        The memory refresh of exchange k still completes before exchange k+1 starts, since its prompts
+        (and the conclusion's) are built from the memory, so every prompt is the one the sequential calls would build.
+        """
+        if not self.active_agents:
+            return [await self.async_conduct_exchange()]
         
-        # Collect responses from all agents
-        agent_responses = []
-        for agent in self.active_agents:
-            # Get recent messages from other agents for context
-            other_messages = [resp['message'] for resp in agent_responses]
-            
-            response = self.agent_manager.generate_agent_response(
-                agent['id'],
-                self.conversation_history[-1]['topic'],
-                self.conversation_history[-1]['context'],
-                other_messages
-            )
+        results = []
+        analysis_task = None
+        conclusion_task = None
+        try:
+            exchanges = 0
+            while exchanges < count and self.exchange_count < self.max_exchanges:
+                exchanges += 1
+                self.exchange_count += 1
+                exchange_data = await self._async_exchange_turns()
+                if analysis_task is not None:
+                    results.append(await analysis_task)
+                analysis_task = asyncio.ensure_future(self._async_finish_exchange(exchange_data, refresh_memory=False))
+                await self._async_refresh_memory()
             
-            agent_responses.append({
-                'agent_id': agent['id'],
-                'agent_role': agent['role'],
-                'message': response,
-                'timestamp': datetime.now().isoformat()
-            })
-        
-        # Generate broker analysis
-        broker_analysis = self._analyze_exchange(agent_responses)
+            if exchanges < count:
+                conclusion_task = asyncio.ensure_future(self._async_force_conclusion())
+            for task in (analysis_task, conclusion_task):
+                if task is not None:
+                    results.append(await task)
+            analysis_task = conclusion_task = None
+            return results
+        finally:
+            for task in (analysis_task, conclusion_task):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    async def _async_exchange_turns(self) -> Dict:
+        """
+        Run the agent turns of the current exchange and add it to the conversation history.
+        The broker analysis is left as None unless the batched call already produced it.
+        """
+        if self.exchange_mode == 'batched':
+            agent_responses, broker_analysis = await self._async_batched_exchange()
+        elif self.exchange_mode == 'parallel':
+            agent_responses, broker_analysis = await self._async_parallel_round(), None
+        else:
+            agent_responses, broker_analysis = await self._async_collect_responses({}), None
         
         # Add to conversation history
         exchange_data = {
@@ -363,14 +441,178 @@ Please parse the user specification and return only the JSON array."""
             self.conversation_history[-1]['exchanges'] = []
         self.conversation_history[-1]['exchanges'].append(exchange_data)
         
+        self.memory.add_exchange(self.exchange_count, agent_responses)
+        self._share_memory()
+        return exchange_data
+    
+    async def _async_finish_exchange(self, exchange_data: Dict, refresh_memory: bool = True) -> Dict:
+        """
+        Fill in the exchange's broker analysis and build its result.
+        With refresh_memory, the conversation memory is refreshed alongside the analysis.
+        """
+        exchange_number = exchange_data['exchange_number']
+        steps = [self._async_refresh_memory()] if refresh_memory else []
+        if exchange_data['broker_analysis'] is None:
+            steps.append(self._async_analyze_exchange(exchange_data['agent_responses'], exchange_number))
+        results = await asyncio.gather(*steps)
+        if exchange_data['broker_analysis'] is None:
+            exchange_data['broker_analysis'] = results[-1]
+        
         return {
-            'exchange_number': self.exchange_count,
-            'agent_responses': agent_responses,
-            'broker_analysis': broker_analysis,
-            'progress': self._calculate_progress(),
+            'exchange_number': exchange_number,
+            'agent_responses': exchange_data['agent_responses'],
+            'broker_analysis': exchange_data['broker_analysis'],
+            'progress': self._calculate_progress(exchange_number),
             'status': 'exchange_completed'
         }
     
+    async def _async_refresh_memory(self):
+        """
+        Fold older messages into the memory summary and share the refreshed memory with the agents
+        """
+        if await self.memory.async_refresh():
+            self._share_memory()
+    
+    async def _async_collect_responses(self, batched: Dict[str, str]) -> List[Dict]:
+        """
+        Collect one response per active agent, in order. Agents with an entry in batched use it;
+        the others get their own LLM call, seeing the responses before theirs.
+        """
+        agent_responses = []
+        for agent in self.active_agents:
+            response = batched.get(agent['id'])
+            if response is None:
+                # Get recent messages from other agents for context
+                other_messages = [resp['message'] for resp in agent_responses]
+                
+                response = await self.agent_manager.async_generate_agent_response(
+                    agent['id'],
+                    self.conversation_history[-1]['topic'],
+                    self.conversation_history[-1]['context'],
+                    other_messages
+                )
+            
+            agent_responses.append({
+                'agent_id': agent['id'],
+                'agent_role': agent['role'],
+                'message': response,
+                'timestamp': datetime.now().isoformat()
+            })
+        return agent_responses
+    
+    async def _async_parallel_round(self) -> List[Dict]:
+        """
+        Ask every active agent at once. Agents see the conversation memory, which ends with the previous
+        exchange, but not each other's messages in this one, so the round costs about one LLM latency;
+        responses keep the active agents' order.
+        """
+        async def respond(agent: Dict) -> Dict:
+            response = await self.agent_manager.async_generate_agent_response(
+                agent['id'],
+                self.conversation_history[-1]['topic'],
+                self.conversation_history[-1]['context']
+            )
+            return {
+                'agent_id': agent['id'],
+                'agent_role': agent['role'],
+                'message': response,
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        return list(await asyncio.gather(*(respond(agent) for agent in self.active_agents)))
+    
+    async def _async_batched_exchange(self) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Ask for every agent's response and the broker analysis in one structured call.
+        Agents missing from the result fall back to their own call; a missing analysis is returned
+        as None and left to the separate analysis call. Batched responses are not streamed.
+        """
+        max_tokens = (self.client.budgeter.output_budget('agent_response') * len(self.active_agents)
+                      + self.client.budgeter.output_budget('analysis'))
+        try:
+            data = await self.client.async_structured_completion(self._build_batched_prompt(), BATCHED_EXCHANGE_SCHEMA,
+                                                                 max_tokens=max_tokens, cache=False,
+                                                                 prompt_type='batched_exchange')
+            batched, analysis = self._parse_batched_response(data)
+        except Exception as e:
+            batched, analysis = {}, None
+        
+        agent_responses = await self._async_collect_responses(batched)
+        return agent_responses, analysis
+    
+    def _build_batched_prompt(self) -> str:
+        """
+        One prompt with every agent's persona and the conversation memory, trimmed to the batched_exchange input budget
+        """
+        topic = self.conversation_history[-1]['topic']
+        state = {'context': self.conversation_history[-1]['context'], 'summary': self.memory.summary}
+        history = list(self.memory.messages)
+        personas = [compress_text(agent['personality'], PERSONALITY_PROMPT_TOKENS) for agent in self.active_agents]
+        
+        def render() -> str:
+            memory_text = ""
+            if state['summary']:
+                memory_text += f"\nConversation so far: {state['summary']}\n"
+            if history:
+                memory_text += "\nLatest messages:\n" + "\n".join(
+                    f"- {message['agent_role']} (exchange {message['exchange_number']}): {message['message']}"
+                    for message in history
+                ) + "\n"
+            agents_text = "\n\n".join([
+                f"- agent_id: {agent['id']}\n  Role: {agent['role']}\n  Expertise: {agent['expertise']}\n  Personality: {persona}"
+                for agent, persona in zip(self.active_agents, personas)
+            ])
+            example = ", ".join(f'"{agent["id"]}": "..."' for agent in self.active_agents)
+            return f"""You are facilitating exchange #{self.exchange_count} of a team discussion.
+
+Current topic: {topic}
+Context: {state['context']}
+{memory_text}
+Team members:
+
+{agents_text}
+
+Write each team member's professional perspective on the topic, in character, in the order listed; later members may respond to earlier ones. Then, as the conversation broker, write a brief analysis covering key points, agreement or disagreement, progress and next steps.
+
+Return only a JSON object of this form:
+{{"responses": {{{example}}}, "analysis": "..."}}"""
+        
+        return self.client.budgeter.fit('batched_exchange', render, [
+            drop_item(history),
+            shrink_field(state, 'summary'),
+            shrink_field(state, 'context'),
+            shrink_longest(personas)
+        ])
+    
+    def _parse_batched_response(self, data: Dict) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Read a schema-checked batched exchange result; keep only non-empty responses for active agents
+        """
+        responses = data['responses']
+        active_ids = {agent['id'] for agent in self.active_agents}
+        batched = {
+            agent_id: message.strip()
+            for agent_id, message in responses.items()
+            if agent_id in active_ids and isinstance(message, str) and message.strip()
+        }
+        
+        analysis = data.get('analysis')
+        if not isinstance(analysis, str) or not analysis.strip():
+            analysis = None
+        else:
+            analysis = analysis.strip()
+        return batched, analysis
+    
+    def _share_memory(self):
+        """
+        Copy the conversation memory into each active agent's conversation_context, with the earlier
+        messages most relevant to that agent's role and the topic
+        """
+        topic = self.conversation_history[-1]['topic']
+        for agent in self.active_agents:
+            query = f"{agent['role']} {agent['expertise']} {topic}"
+            self.agent_manager.update_agent(agent['id'], {'conversation_context': self.memory.context(query)})
+    
     def _generate_initial_message(self, topic: str, context: str, agents: List[Dict]) -> str:
         """
         Generate initial broker message
@@ -379,18 +621,40 @@ Please parse the user specification and return only the JSON array."""
         agent_names = [agent['role'] for agent in agents]
         return f"Agents created successfully: {', '.join(agent_names)}. Ready to begin conversation."
     
-    def _analyze_exchange(self, agent_responses: List[Dict]) -> str:
+    async def _async_analyze_exchange(self, agent_responses: List[Dict], exchange_number: int = None) -> str:
         """
         Analyze the exchange and provide broker insights
         """
-        responses_text = "\n\n".join([
-            f"{resp['agent_role']}: {resp['message']}" 
-            for resp in agent_responses
-        ])
+        prompt = self._build_analysis_prompt(agent_responses, exchange_number)
         
-        prompt = f"""As a conversation broker, analyze this exchange between agents and provide insights:
+        try:
+            response = await self._async_call_xai_api(prompt, cache=False, prompt_type='analysis')
+            return response.strip()
+        except Exception as e:
+            return self._fallback_analysis(agent_responses)
+    
+    def _build_analysis_prompt(self, agent_responses: List[Dict], exchange_number: int = None) -> str:
+        """
+        Build the analysis prompt within the analysis input budget by halving the longest agent messages.
+        exchange_number defaults to the current exchange; pipelined analyses pass their own.
+        """
+        messages = [resp['message'] for resp in agent_responses]
+        if exchange_number is None:
+            exchange_number = self.exchange_count
+        
+        def render() -> str:
+            responses_text = "\n\n".join([
+                f"{resp['agent_role']}: {message}" 
+                for resp, message in zip(agent_responses, messages)
+            ])
+            return self._analysis_prompt_template(responses_text, exchange_number)
+        
+        return self.client.budgeter.fit('analysis', render, [shrink_longest(messages)])
+    
+    def _analysis_prompt_template(self, responses_text: str, exchange_number: int) -> str:
+        return f"""As a conversation broker, analyze this exchange between agents and provide insights:
 
-**Exchange #{self.exchange_count}**
+**Exchange #{exchange_number}**
 
 {responses_text}
 
@@ -401,32 +665,55 @@ Please provide a brief analysis that includes:
 4. Suggestions for next steps
 
 Keep it concise and actionable."""
-
-        try:
-            response = self._call_xai_api(prompt, max_tokens=400)
-            return response.strip()
-        except Exception as e:
-            # Fallback analysis
-            agent_names = [resp['agent_role'] for resp in agent_responses]
-            return f"Excellent exchange! {', '.join(agent_names)} have provided valuable perspectives. I see good collaboration and thoughtful insights. Let's continue building on these ideas in our next exchange."
     
-    def _calculate_progress(self) -> Dict:
+    def _fallback_analysis(self, agent_responses: List[Dict]) -> str:
+        # Fallback analysis
+        agent_names = [resp['agent_role'] for resp in agent_responses]
+        return f"Excellent exchange! {', '.join(agent_names)} have provided valuable perspectives. I see good collaboration and thoughtful insights. Let's continue building on these ideas in our next exchange."
+    
+    def _calculate_progress(self, exchange_number: int = None) -> Dict:
         """
-        Calculate conversation progress
+        Calculate conversation progress as of exchange_number (the current exchange by default)
         """
-        progress_percentage = (self.exchange_count / self.max_exchanges) * 100
+        if exchange_number is None:
+            exchange_number = self.exchange_count
+        progress_percentage = (exchange_number / self.max_exchanges) * 100
         return {
-            'exchanges_completed': self.exchange_count,
+            'exchanges_completed': exchange_number,
             'max_exchanges': self.max_exchanges,
             'progress_percentage': progress_percentage,
-            'remaining_exchanges': self.max_exchanges - self.exchange_count
+            'remaining_exchanges': self.max_exchanges - exchange_number
         }
     
-    def _force_conclusion(self) -> Dict:
+    async def _async_force_conclusion(self) -> Dict:
         """
         Force conversation conclusion when max exchanges reached
         """
-        prompt = f"""The conversation has reached the maximum number of exchanges ({self.max_exchanges}). 
+        prompt = self._build_conclusion_prompt()
+        try:
+            conclusion = await self._async_call_xai_api(prompt, cache=False, prompt_type='conclusion')
+        except Exception as e:
+            conclusion = None
+        return self._record_conclusion(conclusion)
+    
+    def _build_conclusion_prompt(self) -> str:
+        """
+        Build the conclusion prompt from the conversation memory, within the conclusion input budget:
+        the oldest recent messages are dropped first, then the summary is shortened
+        """
+        state = {'summary': self.memory.summary if self.memory else ""}
+        history = list(self.memory.messages) if self.memory else []
+        
+        def render() -> str:
+            memory_text = ""
+            if state['summary']:
+                memory_text += f"\nConversation so far: {state['summary']}\n"
+            if history:
+                memory_text += "\nLatest messages:\n" + "\n".join(
+                    f"- {message['agent_role']} (exchange {message['exchange_number']}): {message['message']}"
+                    for message in history
+                ) + "\n"
+            return f"""The conversation has reached the maximum number of exchanges ({self.max_exchanges}). 
 
 Please provide a comprehensive conclusion that includes:
 1. Summary of key points discussed
@@ -434,29 +721,37 @@ Please provide a comprehensive conclusion that includes:
 3. Action items or next steps
 4. Overall assessment of the conversation's effectiveness
 
-Topic: {self.conversation_history[-1]['topic']}"""
-
-        try:
-            conclusion = self._call_xai_api(prompt, max_tokens=500)
-            
-            # Update conversation status
-            self.conversation_history[-1]['status'] = 'completed'
-            self.conversation_history[-1]['conclusion'] = conclusion
-            self.conversation_history[-1]['end_time'] = datetime.now().isoformat()
-            
-            return {
-                'status': 'concluded',
-                'conclusion': conclusion,
-                'total_exchanges': self.exchange_count,
-                'agents_participated': len(self.active_agents)
-            }
-        except Exception as e:
+Topic: {self.conversation_history[-1]['topic']}
+{memory_text}"""
+        
+        return self.client.budgeter.fit('conclusion', render, [
+            drop_item(history),
+            shrink_field(state, 'summary')
+        ])
+    
+    def _record_conclusion(self, conclusion: Optional[str]) -> Dict:
+        """
+        Build the concluded result; a None conclusion means the API call failed
+        """
+        if conclusion is None:
             return {
                 'status': 'concluded',
                 'conclusion': 'Conversation concluded. Thank you all for your participation.',
                 'total_exchanges': self.exchange_count,
                 'agents_participated': len(self.active_agents)
             }
+        
+        # Update conversation status
+        self.conversation_history[-1]['status'] = 'completed'
+        self.conversation_history[-1]['conclusion'] = conclusion
+        self.conversation_history[-1]['end_time'] = datetime.now().isoformat()
+        
+        return {
+            'status': 'concluded',
+            'conclusion': conclusion,
+            'total_exchanges': self.exchange_count,
+            'agents_participated': len(self.active_agents)
+        }
     
     def get_conversation_summary(self) -> Dict:
         """
@@ -466,16 +761,53 @@ Topic: {self.conversation_history[-1]['topic']}"""
             return {'status': 'no_conversation'}
         
         current_conv = self.conversation_history[-1]
+        # Copies, since status requests read the summary while an exchange may be updating the agents
+        active_agents = [dict(agent) for agent in self.active_agents]
         return {
             'conversation_id': current_conv['conversation_id'],
             'topic': current_conv['topic'],
             'status': current_conv['status'],
-            'agents_count': len(self.active_agents),
+            'agents_count': len(active_agents),
             'exchanges_completed': self.exchange_count,
             'max_exchanges': self.max_exchanges,
-            'agents': self.active_agents
+            'agents': active_agents,
+            'memory': self.memory.get_stats() if self.memory else None
+        }
+    
+    def export_state(self) -> Dict:
+        """
+        JSON-serialisable conversation state, including the agents and the conversation memory
+        """
+        return {
+            'conversation_history': self.conversation_history,
+            'current_conversation_id': self.current_conversation_id,
+            'exchange_count': self.exchange_count,
+            'max_exchanges': self.max_exchanges,
+            'conversation_goals': self.conversation_goals,
+            'active_agent_ids': [agent['id'] for agent in self.active_agents],
+            'memory': self.memory.export_state() if self.memory else None,
+            'agent_manager': self.agent_manager.export_state()
         }
     
+    def restore_state(self, state: Dict):
+        """
+        Restore a state saved by export_state; active agents are the agent manager's records again
+        """
+        self.agent_manager.restore_state(state.get('agent_manager', {}))
+        agents = self.agent_manager.agents
+        self.active_agents = [agents[agent_id] for agent_id in state.get('active_agent_ids', []) if agent_id in agents]
+        self.conversation_history = state.get('conversation_history', [])
+        if self.conversation_history:
+            self.conversation_history[-1]['agents'] = self.active_agents
+        self.current_conversation_id = state.get('current_conversation_id')
+        self.exchange_count = state.get('exchange_count', 0)
+        self.max_exchanges = state.get('max_exchanges', self.max_exchanges)
+        self.conversation_goals = state.get('conversation_goals', [])
+        self.memory = None
+        if state.get('memory') is not None:
+            self.memory = ConversationMemory(self.client)
+            self.memory.restore_state(state['memory'])
+    
     def reset_conversation(self):
         """
         Reset conversation state
@@ -484,46 +816,22 @@ Topic: {self.conversation_history[-1]['topic']}"""
         self.current_conversation_id = None
         self.exchange_count = 0
         self.active_agents = []
+        self.memory = None
     
-    def _call_xai_api(self, prompt: str, max_tokens: int = 500) -> str:
+    def _call_xai_api(self, prompt: str, max_tokens: int = None, cache: bool = True,
+                      prompt_type: str = 'general') -> str:
         """
-        Make API call to XAI
+        Make API call to XAI through the shared pooled client
         """
-        headers = {
-            "Authorization": f"Bearer {self.xai_api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        # Try different model names
-        models_to_try = ["x-1", "x-2", "x-3", "grok-beta"]
-        
-        for model in models_to_try:
-            try:
-                data = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": max_tokens,
-                    "temperature": 0.7
-                }
-                
-                response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=data)
-                
-                if response.status_code == 200:
-                    return response.json()["choices"][0]["message"]["content"]
-                elif response.status_code == 404:
-                    # Model not found, try next one
-                    continue
-                else:
-                    raise Exception(f"XAI API error: {response.status_code} - {response.text}")
-                    
-            except Exception as e:
-                if "404" in str(e) and "model" in str(e).lower():
-                    continue
-                else:
-                    raise e
-        
-        # If all models fail, raise an exception to trigger fallback responses
-        raise Exception("XAI API not available - using fallback responses")
+        return self.client.chat_completion(prompt, max_tokens=max_tokens, cache=cache, prompt_type=prompt_type)
+
+    async def _async_call_xai_api(self, prompt: str, max_tokens: int = None, cache: bool = True,
+                                  prompt_type: str = 'general') -> str:
+        """
+        Async API call to XAI through the shared client
+        """
+        return await self.client.async_chat_completion(prompt, max_tokens=max_tokens, cache=cache,
+                                                       prompt_type=prompt_type)
 
 # Example usage and testing
 if __name__ == "__main__":
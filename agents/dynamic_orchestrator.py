@@ -7,19 +7,21 @@ Orchestrates conversations with any number of dynamically created agents
 import os
 import json
 import time
+import asyncio
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
 
+from .async_runtime import run_sync
 from .dynamic_broker import DynamicBrokerAgent
-from .dynamic_agent_manager import DynamicAgentManager
 
 load_dotenv()
 
 class DynamicAgentOrchestrator:
     def __init__(self):
         self.broker = DynamicBrokerAgent()
-        self.agent_manager = DynamicAgentManager()
+        # The broker's manager holds the conversation's agents
+        self.agent_manager = self.broker.agent_manager
         self.current_conversation = None
         self.conversation_log = []
         
@@ -80,6 +82,12 @@ class DynamicAgentOrchestrator:
         """
         Conduct one exchange between all active agents
         """
+        return run_sync(self.async_conduct_exchange())
+    
+    async def async_conduct_exchange(self) -> Dict:
+        """
+        Async counterpart of conduct_exchange
+        """
         if not self.current_conversation:
             return {
                 'status': 'error',
@@ -87,16 +95,11 @@ class DynamicAgentOrchestrator:
             }
         
         try:
-            result = self.broker.conduct_exchange()
+            result = await self.broker.async_conduct_exchange()
             
             # Log the exchange
             if result['status'] == 'exchange_completed':
-                self.conversation_log.append({
-                    'timestamp': datetime.now().isoformat(),
-                    'exchange_number': result['exchange_number'],
-                    'agent_responses': result['agent_responses'],
-                    'broker_analysis': result['broker_analysis']
-                })
+                self._log_exchange(result)
             
             return result
             
@@ -106,15 +109,31 @@ class DynamicAgentOrchestrator:
                 'message': f"Error conducting exchange: {str(e)}"
             }
     
+    def _log_exchange(self, result: Dict):
+        self.conversation_log.append({
+            'timestamp': datetime.now().isoformat(),
+            'exchange_number': result['exchange_number'],
+            'agent_responses': result['agent_responses'],
+            'broker_analysis': result['broker_analysis']
+        })
+    
     def conduct_full_conversation(self, topic: str, context: str = "", 
                                 agent_specifications: List[Dict] = None, 
                                 max_exchanges: int = 6) -> Dict:
         """
         Conduct a full conversation from start to finish
         """
+        return run_sync(self.async_conduct_full_conversation(topic, context, agent_specifications, max_exchanges))
+    
+    async def async_conduct_full_conversation(self, topic: str, context: str = "",
+                                              agent_specifications: List[Dict] = None,
+                                              max_exchanges: int = 6) -> Dict:
+        """
+        Async counterpart of conduct_full_conversation
+        """
         try:
-            # Start conversation
-            start_result = self.start_conversation(topic, context, agent_specifications)
+            # Agent creation is still blocking, so keep it off the event loop
+            start_result = await asyncio.to_thread(self.start_conversation, topic, context, agent_specifications)
             
             if start_result['status'] == 'needs_agents':
                 return start_result
@@ -125,29 +144,27 @@ class DynamicAgentOrchestrator:
             # Set max exchanges
             self.broker.max_exchanges = max_exchanges
             
-            # Conduct exchanges
+            # Conduct the exchanges and the conclusion; each analysis overlaps the next exchange's turns
+            print(f"Conducting {max_exchanges} exchanges...")
             exchanges = []
-            for i in range(max_exchanges):
-                print(f"Conducting exchange {i+1}/{max_exchanges}...")
-                
-                exchange_result = self.conduct_exchange()
-                
+            for exchange_result in await self.broker.async_conduct_exchanges(max_exchanges + 1):
                 if exchange_result['status'] == 'concluded':
                     exchanges.append(exchange_result)
                     break
                 elif exchange_result['status'] == 'exchange_completed':
+                    self._log_exchange(exchange_result)
                     exchanges.append(exchange_result)
                 else:
                     return exchange_result
             
             # Save conversation log
-            self.save_conversation_log()
+            await asyncio.to_thread(self.save_conversation_log)
             
             return {
                 'status': 'completed',
                 'topic': topic,
                 'context': context,
-                'total_exchanges': len(exchanges),
+                'total_exchanges': self.broker.exchange_count,
                 'exchanges': exchanges,
                 'agents': self.broker.active_agents
             }
@@ -211,6 +228,27 @@ class DynamicAgentOrchestrator:
         
         return filename
     
+    def export_state(self) -> Dict:
+        """
+        JSON-serialisable state of this orchestrator's conversation (see ConversationRegistry)
+        """
+        return {
+            'broker': self.broker.export_state(),
+            'current_conversation': self.current_conversation,
+            'conversation_log': self.conversation_log
+        }
+    
+    def restore_state(self, state: Dict):
+        self.broker.restore_state(state.get('broker', {}))
+        self.current_conversation = state.get('current_conversation')
+        self.conversation_log = state.get('conversation_log', [])
+    
+    def close(self):
+        """
+        Release the worker threads held for agent creation
+        """
+        self.agent_manager.close()
+    
     def reset_conversation(self):
         """
         Reset conversation state
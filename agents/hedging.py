@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Hedging Policy
+Decides when a slow LLM call should get a duplicate request, based on rolling latency per prompt type
+"""
+
+import os
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Optional
+
+
+class HedgingPolicy:
+    """
+    A request that has not answered within the rolling quantile (p90 by default) of recent latencies
+    for its prompt type gets one duplicate request. Hedges are capped at a fraction of all requests
+    so the extra spend stays bounded. Streamed calls are hedged on time to first token, which is
+    sampled separately from whole-call latency.
+    """
+
+    def __init__(self, prompt_types: Iterable[str] = None, quantile: float = None, window: int = None,
+                 min_samples: int = None, max_extra_ratio: float = None):
+        if prompt_types is None:
+            prompt_types = [t.strip() for t in os.getenv('XAI_HEDGE_PROMPT_TYPES', 'agent_response').split(',') if t.strip()]
+        self.prompt_types = set(prompt_types)
+        self.quantile = quantile if quantile is not None else float(os.getenv('XAI_HEDGE_QUANTILE', '0.9'))
+        self.window = window if window is not None else int(os.getenv('XAI_HEDGE_WINDOW', '200'))
+        self.min_samples = min_samples if min_samples is not None else int(os.getenv('XAI_HEDGE_MIN_SAMPLES', '20'))
+        self.max_extra_ratio = max_extra_ratio if max_extra_ratio is not None else float(os.getenv('XAI_HEDGE_MAX_EXTRA', '0.1'))
+
+        self._latencies = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_denied': 0}
+
+    def enabled_for(self, prompt_type: str) -> bool:
+        return prompt_type in self.prompt_types
+
+    def record_latency(self, prompt_type: str, seconds: float, first_token: bool = False):
+        with self._lock:
+            self._latencies[self._sample_key(prompt_type, first_token)].append(seconds)
+
+    def hedge_delay(self, prompt_type: str, first_token: bool = False) -> Optional[float]:
+        """
+        Seconds to wait before hedging, or None when this call should not be hedged.
+        With first_token, the delay is the rolling quantile of time to first streamed token.
+        """
+        if not self.enabled_for(prompt_type):
+            return None
+        with self._lock:
+            self.stats['requests'] += 1
+            return self._quantile(self._latencies[self._sample_key(prompt_type, first_token)])
+
+    def try_spend(self) -> bool:
+        """
+        Claim budget for one duplicate request
+        """
+        with self._lock:
+            if self.stats['hedged'] + 1 > self.max_extra_ratio * self.stats['requests']:
+                self.stats['budget_denied'] += 1
+                return False
+            self.stats['hedged'] += 1
+            return True
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.stats['hedge_wins'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['prompt_types'] = sorted(self.prompt_types)
+            stats['delays'] = {}
+            for prompt_type, samples in self._latencies.items():
+                delay = self._quantile(samples)
+                if delay is not None:
+                    stats['delays'][prompt_type] = delay
+        return stats
+
+    @staticmethod
+    def _sample_key(prompt_type: str, first_token: bool) -> str:
+        return f"{prompt_type}:first_token" if first_token else prompt_type
+
+    def _quantile(self, samples: Iterable[float]) -> Optional[float]:
+        ordered = sorted(samples)
+        if len(ordered) < self.min_samples:
+            return None
+        index = min(len(ordered) - 1, max(0, math.ceil(self.quantile * len(ordered)) - 1))
+        return ordered[index]
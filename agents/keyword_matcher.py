@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher
+Compiled word-boundary multi-keyword matcher (Aho-Corasick) shared by the keyword routers
+
+Usage:
+    ROUTER = KeywordMatcher({'help': ['help', 'what can you do'], 'agents': ['agent*', 'team*']})
+    ROUTER.match("Create a team of agents")   # {'agents'}
+
+    python -m agents.keyword_matcher          # routing benchmark
+"""
+
+import time
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    Matches every keyword of every category in one pass over the text, however many keywords there are.
+    Keywords are case-insensitive and may span several words; a match must start and end on a word
+    boundary, so "new" does not match "news" and "how" does not match "show". A trailing '*' lets a
+    keyword match as a word prefix ("agent*" matches "agents").
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = {category: list(keywords) for category, keywords in categories.items()}
+
+        # Trie states: goto transitions, failure links and (length, prefix, categories) outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, bool, FrozenSet[str]]]] = [[]]
+
+        outputs = {}
+        for category, keywords in self.categories.items():
+            for keyword in keywords:
+                prefix = keyword.endswith('*')
+                word = " ".join(keyword.rstrip('*').lower().split())
+                if word:
+                    outputs.setdefault((word, prefix), set()).add(category)
+        for (word, prefix), matched in outputs.items():
+            self._add(word, prefix, frozenset(matched))
+        self._link()
+
+    def _add(self, word: str, prefix: bool, categories: FrozenSet[str]):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(word), prefix, categories))
+
+    def _link(self):
+        # Breadth-first failure links; each state also inherits the outputs of its failure state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def match(self, text: str) -> Set[str]:
+        """
+        All categories with at least one keyword in text
+        """
+        text = " ".join(text.lower().split())
+        goto, fail, out = self._goto, self._fail, self._out
+        length = len(text)
+        matched = set()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            end_boundary = index + 1 == length or not text[index + 1].isalnum()
+            for size, prefix, categories in out[state]:
+                start = index - size + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (prefix or end_boundary):
+                    matched |= categories
+        return matched
+
+    def first(self, text: str, order: Iterable[str], default: Optional[str] = None) -> Optional[str]:
+        """
+        The first category in order that matches text, or default
+        """
+        matched = self.match(text)
+        return next((category for category in order if category in matched), default)
+
+
+def _benchmark(messages: int = 2000):
+    """
+    Per-message routing cost for growing keyword sets, against the substring any() chains
+    """
+    import random
+    rng = random.Random(7)
+    vocabulary = ["create", "team", "news", "show", "agents", "please", "project", "status", "the",
+                  "continue", "nutrition", "discussion", "we", "need", "launch", "plan", "help"]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 40))) for _ in range(messages)]
+
+    print(f"{'keywords':>8} {'matcher us/msg':>15} {'any() us/msg':>13}")
+    for size in (10, 100, 1000):
+        keywords = [f"kw{i}x" for i in range(size - 4)] + ['create', 'agent*', 'help', 'status']
+        groups = {f"c{i}": keywords[i::10] for i in range(10)}
+        matcher = KeywordMatcher(groups)
+
+        started = time.perf_counter()
+        for text in texts:
+            matcher.match(text)
+        matcher_cost = (time.perf_counter() - started) / messages * 1e6
+
+        plain = {category: [k.rstrip('*') for k in words] for category, words in groups.items()}
+        started = time.perf_counter()
+        for text in texts:
+            lower = text.lower()
+            {category for category, words in plain.items() if any(word in lower for word in words)}
+        substring_cost = (time.perf_counter() - started) / messages * 1e6
+
+        print(f"{size:>8} {matcher_cost:>15.1f} {substring_cost:>13.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Local XAI Server
+XAI-compatible stand-in for /v1/chat/completions, for offline load tests and profiling
+
+Usage:
+    python -m agents.local_xai_server --port 8089 --latency lognormal:-0.5,0.6 --error-rate 0.02
+    XAI_BASE_URL=http://127.0.0.1:8089/v1 python frontend/server.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+WORDS = ("we should align on scope, validate assumptions with users, estimate the effort, "
+         "and agree on clear next steps so the team can deliver incrementally and measure results").split()
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Build a sampler (seconds) from 'fixed:S', 'uniform:LO,HI', 'exponential:MEAN' or 'lognormal:MU,SIGMA'
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v.strip()]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'exponential':
+        return lambda: random.expovariate(1.0 / values[0])
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class LocalXAIConfig:
+    """
+    Behaviour of the stand-in server; attributes may be changed while it is running
+    """
+
+    def __init__(self, models: List[str] = None, latency: str = "fixed:0.2", error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, tokens_per_second: float = 80.0, seed: int = None):
+        self.models = models or ["grok-beta"]
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.tokens_per_second = tokens_per_second
+        self.stats = {'requests': 0, 'not_found': 0, 'errors': 0, 'rate_limited': 0, 'streamed': 0}
+        self.lock = threading.Lock()
+        if seed is not None:
+            random.seed(seed)
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def _completion_words(prompt: str, max_tokens: int) -> List[str]:
+    # Deterministic per prompt so repeated runs produce comparable output sizes
+    rng = random.Random(prompt)
+    length = min(max_tokens, rng.randint(60, 180))
+    return [rng.choice(WORDS) for _ in range(length)]
+
+
+class LocalXAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: LocalXAIConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': m, 'object': 'model'} for m in self.config.models]})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid JSON'})
+            return
+
+        config = self.config
+        config.count('requests')
+        model = body.get('model')
+        if model not in config.models:
+            config.count('not_found')
+            self._send_json(404, {'error': f"The model {model} does not exist"})
+            return
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            config.count('rate_limited')
+            self._send_json(429, {'error': 'rate limit exceeded'}, {'Retry-After': '1'})
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            time.sleep(config.latency())
+            config.count('errors')
+            self._send_json(500, {'error': 'internal server error'})
+            return
+
+        prompt = " ".join(m.get('content', '') for m in body.get('messages', []))
+        words = _completion_words(prompt, int(body.get('max_tokens', 500)))
+        usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(words),
+                 'total_tokens': len(prompt) // 4 + len(words)}
+
+        # Time to first token
+        time.sleep(config.latency())
+
+        if body.get('stream'):
+            config.count('streamed')
+            self._stream(model, words)
+            return
+
+        time.sleep(len(words) / config.tokens_per_second)
+        self._send_json(200, {
+            'id': f"chatcmpl-local-{random.getrandbits(32):08x}",
+            'object': 'chat.completion',
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': " ".join(words)}, 'finish_reason': 'stop'}],
+            'usage': usage
+        })
+
+    def _stream(self, model: str, words: List[str]):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for i, word in enumerate(words):
+                chunk = {'model': model, 'choices': [{'index': 0, 'delta': {'content': word if i == 0 else " " + word}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(1.0 / self.config.tokens_per_second)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled (e.g. a losing hedged request)
+            pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict[str, str] = None):
+        data = json.dumps(payload).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_local_server(host: str = '127.0.0.1', port: int = 0,
+                       config: LocalXAIConfig = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the stand-in server on a daemon thread and return (server, base_url).
+    Port 0 picks a free port.
+    """
+    handler = type('ConfiguredLocalXAIHandler', (LocalXAIHandler,), {'config': config or LocalXAIConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="local-xai-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local XAI-compatible server for offline benchmarking")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--models', default='grok-beta',
+                        help="Comma-separated model names that exist; any other name returns 404")
+    parser.add_argument('--latency', default='fixed:0.2',
+                        help="Time to first token: fixed:S, uniform:LO,HI, exponential:MEAN or lognormal:MU,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = LocalXAIConfig(
+        models=[m.strip() for m in args.models.split(',') if m.strip()],
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed
+    )
+    handler = type('ConfiguredLocalXAIHandler', (LocalXAIHandler,), {'config': config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"🧪 Local XAI server listening on http://{args.host}:{args.port}/v1")
+    print(f"Set XAI_BASE_URL=http://{args.host}:{args.port}/v1 to point the agents at it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping local XAI server")
+        server.server_close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Model Resolver
+Remembers which XAI model name works so calls stop probing the candidate list every time
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from typing import List, Optional
+
+
+class ModelResolver:
+    """
+    Per-process memory of the working model, persisted to a small JSON file with a TTL
+    so new gunicorn workers start warm.
+    """
+
+    def __init__(self, base_url: str, candidates: List[str], cache_path: str = None, ttl: float = None):
+        self.base_url = base_url
+        self.candidates = list(candidates)
+        self.cache_path = cache_path or os.getenv(
+            'XAI_MODEL_CACHE', os.path.join(tempfile.gettempdir(), 'click2lead_xai_model.json'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('XAI_MODEL_CACHE_TTL', '86400'))
+        self._model = None
+        self._lock = threading.Lock()
+        # Held while probing so concurrent callers wait for one probe instead of each running their own
+        self.probe_lock = threading.Lock()
+
+    def get(self) -> Optional[str]:
+        """
+        Return the resolved model, loading it from disk if this process has not resolved one yet
+        """
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def remember(self, model: str):
+        """
+        Record a model that just answered successfully
+        """
+        with self._lock:
+            if self._model == model:
+                return
+            self._model = model
+        self._save(model)
+
+    def invalidate(self, model: str):
+        """
+        Forget the model after it returned 404 so the next call re-probes
+        """
+        with self._lock:
+            if self._model != model:
+                return
+            self._model = None
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
+
+    def _load(self) -> Optional[str]:
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        entry = data.get(self.base_url)
+        if not entry or time.time() - entry.get('resolved_at', 0) > self.ttl:
+            return None
+        if entry.get('model') not in self.candidates:
+            return None
+        return entry['model']
+
+    def _save(self, model: str):
+        try:
+            try:
+                with open(self.cache_path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            data[self.base_url] = {'model': model, 'resolved_at': time.time()}
+
+            # Write-then-rename so other workers never read a half-written file
+            directory = os.path.dirname(self.cache_path) or '.'
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.xai_model_')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not persist resolved XAI model: {e}")
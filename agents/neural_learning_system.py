@@ -15,6 +15,8 @@ from collections import defaultdict
 import threading
 import time
 
+from .keyword_matcher import KeywordMatcher
+
 # Neural network imports
 try:
     import torch
@@ -56,6 +58,22 @@ if not TORCH_AVAILABLE:
         def mean(tensor, dim=None):
             return 0.0
 
+# Keyword routers, compiled once (see keyword_matcher.py)
+TOPIC_KEYWORDS = KeywordMatcher({
+    'fitness': ['fitness', 'workout*'],
+    'nutrition': ['nutrition', 'diet*'],
+    'business': ['business', 'project*'],
+    'technology': ['technology', 'development']
+})
+
+INTENT_KEYWORDS = KeywordMatcher({
+    'agent_creation': ['create', 'creating', 'agent*', 'team*', 'build', 'building'],
+    'conversation_management': ['exchange', 'next', 'continue'],
+    'help_request': ['help', 'what can you do'],
+    'status_check': ['status', 'system', 'health']
+})
+INTENT_PRIORITY = ['agent_creation', 'conversation_management', 'help_request', 'status_check']
+
 class UserInteractionData:
     """Data structure for storing user interaction data"""
     
@@ -134,20 +152,12 @@ class UserInteractionData:
     
     def _extract_common_topics(self) -> List[str]:
         """Extract common topics from user interactions"""
-        topics = []
+        topics = set()
         for interaction in self.interactions:
-            prompt = interaction['prompt'].lower()
             # Extract potential topics
-            if 'fitness' in prompt or 'workout' in prompt:
-                topics.append('fitness')
-            if 'nutrition' in prompt or 'diet' in prompt:
-                topics.append('nutrition')
-            if 'business' in prompt or 'project' in prompt:
-                topics.append('business')
-            if 'technology' in prompt or 'development' in prompt:
-                topics.append('technology')
+            topics |= TOPIC_KEYWORDS.match(interaction['prompt'])
                 
-        return list(set(topics))
+        return list(topics)
     
     def _analyze_patterns(self) -> Dict[str, Any]:
         """Analyze interaction patterns"""
@@ -362,18 +372,7 @@ class NeuralLearningSystem:
     
     def _rule_based_intent(self, prompt: str) -> str:
         """Rule-based intent classification as fallback"""
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ['create', 'agent', 'team', 'build']):
-            return 'agent_creation'
-        elif any(word in prompt_lower for word in ['exchange', 'next', 'continue']):
-            return 'conversation_management'
-        elif any(word in prompt_lower for word in ['help', 'what can you do']):
-            return 'help_request'
-        elif any(word in prompt_lower for word in ['status', 'system', 'health']):
-            return 'status_check'
-        else:
-            return 'general_conversation'
+        return INTENT_KEYWORDS.first(prompt, INTENT_PRIORITY, default='general_conversation')
     
     def optimize_response(self, prompt: str, intent: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Optimize response based on learned patterns"""
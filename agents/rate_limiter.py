@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter
+Process- and worker-wide token buckets plus an in-flight cap for XAI calls, coordinated through SQLite
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from .token_budget import estimate_tokens
+
+
+def estimate_request_tokens(prompt: str, max_tokens: int) -> int:
+    """
+    Upper-bound token cost of a request: the estimated prompt tokens plus the full output budget
+    """
+    return estimate_tokens(prompt) + max_tokens
+
+
+class RateLimiter:
+    """
+    Requests-per-second and tokens-per-minute buckets plus a max-in-flight cap.
+    State lives in a SQLite file so every gunicorn worker on the host draws from the same buckets.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(self, requests_per_second: float = None, tokens_per_minute: float = None,
+                 max_in_flight: int = None, path: str = None, lease_ttl: float = None):
+        self.requests_per_second = requests_per_second if requests_per_second is not None else float(os.getenv('XAI_RATE_LIMIT_RPS', '10'))
+        self.tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else float(os.getenv('XAI_RATE_LIMIT_TPM', '120000'))
+        self.max_in_flight = max_in_flight if max_in_flight is not None else int(os.getenv('XAI_MAX_IN_FLIGHT', '16'))
+        self.path = path or os.getenv(
+            'XAI_RATE_LIMIT_PATH', os.path.join(tempfile.gettempdir(), 'click2lead_rate_limit.db'))
+        # In-flight leases older than this are assumed to belong to a crashed worker
+        self.lease_ttl = lease_ttl if lease_ttl is not None else float(os.getenv('XAI_LEASE_TTL', '300'))
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {'granted': 0, 'throttled_waits': 0, 'wait_seconds': 0.0, 'backoffs': 0}
+        self.enabled = True
+
+        try:
+            db = self._connection()
+            db.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+            db.execute("""CREATE TABLE IF NOT EXISTS leases (
+                lease_id TEXT PRIMARY KEY,
+                started_at REAL NOT NULL
+            )""")
+        except sqlite3.Error as e:
+            print(f"Warning: XAI rate limiter disabled: {e}")
+            self.enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def try_acquire(self, cost: int) -> Tuple[Optional[str], float]:
+        """
+        Take one request and `cost` tokens if available.
+        Returns (lease_id, 0) on success or (None, seconds_to_wait) when throttled.
+        """
+        if not self.enabled:
+            return "disabled", 0.0
+
+        now = time.time()
+        try:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                blocked_until = self._read_bucket(db, 'blocked_until', 0.0, now)[0]
+                if blocked_until > now:
+                    db.execute("COMMIT")
+                    return None, blocked_until - now
+
+                if self.max_in_flight > 0:
+                    db.execute("DELETE FROM leases WHERE started_at < ?", (now - self.lease_ttl,))
+                    in_flight = db.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+                    if in_flight >= self.max_in_flight:
+                        db.execute("COMMIT")
+                        return None, 0.05
+
+                request_tokens = self._refill(db, 'requests', self.requests_per_second, self.requests_per_second, now)
+                if self.requests_per_second > 0 and request_tokens < 1:
+                    db.execute("COMMIT")
+                    return None, (1 - request_tokens) / self.requests_per_second
+
+                # A single request larger than the whole bucket would otherwise wait forever
+                cost = min(cost, self.tokens_per_minute) if self.tokens_per_minute > 0 else cost
+                llm_tokens = self._refill(db, 'tokens', self.tokens_per_minute, self.tokens_per_minute / 60.0, now)
+                if self.tokens_per_minute > 0 and llm_tokens < cost:
+                    db.execute("COMMIT")
+                    return None, (cost - llm_tokens) / (self.tokens_per_minute / 60.0)
+
+                if self.requests_per_second > 0:
+                    self._write_bucket(db, 'requests', request_tokens - 1, now)
+                if self.tokens_per_minute > 0:
+                    self._write_bucket(db, 'tokens', llm_tokens - cost, now)
+                lease_id = f"{os.getpid()}:{uuid.uuid4().hex}"
+                if self.max_in_flight > 0:
+                    db.execute("INSERT INTO leases (lease_id, started_at) VALUES (?, ?)", (lease_id, now))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the agents down with it
+            print(f"Warning: XAI rate limiter error: {e}")
+            return "unlimited", 0.0
+
+        with self._stats_lock:
+            self.stats['granted'] += 1
+        return lease_id, 0.0
+
+    def acquire(self, cost: int) -> str:
+        """
+        Block until a request slot and token budget are available
+        """
+        while True:
+            lease_id, wait = self.try_acquire(cost)
+            if lease_id is not None:
+                return lease_id
+            self._record_wait(wait)
+            time.sleep(wait)
+
+    async def async_acquire(self, cost: int) -> str:
+        """
+        Async counterpart of acquire; waits without blocking the event loop.
+        The SQLite transaction runs in a worker thread so a lock held by another worker
+        stalls only this call, not every coroutine on the loop.
+        """
+        while True:
+            lease_id, wait = await asyncio.to_thread(self.try_acquire, cost)
+            if lease_id is not None:
+                return lease_id
+            self._record_wait(wait)
+            await asyncio.sleep(wait)
+
+    def release(self, lease_id: str, cost: int = 0, actual_tokens: Optional[int] = None):
+        """
+        Free the in-flight slot and refund the part of the token estimate that was not used
+        """
+        if not self.enabled or lease_id in ("disabled", "unlimited"):
+            return
+        try:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM leases WHERE lease_id = ?", (lease_id,))
+                if actual_tokens is not None and self.tokens_per_minute > 0 and actual_tokens < cost:
+                    now = time.time()
+                    tokens = self._refill(db, 'tokens', self.tokens_per_minute, self.tokens_per_minute / 60.0, now)
+                    self._write_bucket(db, 'tokens', min(self.tokens_per_minute, tokens + cost - actual_tokens), now)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Warning: XAI rate limiter error: {e}")
+
+    def backoff(self, seconds: float):
+        """
+        Pause every worker after the provider answers 429
+        """
+        if not self.enabled:
+            return
+        with self._stats_lock:
+            self.stats['backoffs'] += 1
+        try:
+            db = self._connection()
+            until = time.time() + seconds
+            db.execute("BEGIN IMMEDIATE")
+            current = self._read_bucket(db, 'blocked_until', 0.0, until)[0]
+            self._write_bucket(db, 'blocked_until', max(current, until), until)
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Warning: XAI rate limiter error: {e}")
+
+    async def async_backoff(self, seconds: float):
+        """
+        Async counterpart of backoff
+        """
+        await asyncio.to_thread(self.backoff, seconds)
+
+    @contextmanager
+    def slot(self, cost: int):
+        lease_id = self.acquire(cost)
+        usage = {'actual_tokens': None}
+        try:
+            yield usage
+        finally:
+            self.release(lease_id, cost, usage['actual_tokens'])
+
+    @asynccontextmanager
+    async def async_slot(self, cost: int):
+        lease_id = await self.async_acquire(cost)
+        usage = {'actual_tokens': None}
+        try:
+            yield usage
+        finally:
+            await asyncio.to_thread(self.release, lease_id, cost, usage['actual_tokens'])
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            'requests_per_second': self.requests_per_second,
+            'tokens_per_minute': self.tokens_per_minute,
+            'max_in_flight': self.max_in_flight,
+            'enabled': self.enabled
+        })
+        return stats
+
+    def _record_wait(self, wait: float):
+        with self._stats_lock:
+            self.stats['throttled_waits'] += 1
+            self.stats['wait_seconds'] += wait
+
+    def _read_bucket(self, db: sqlite3.Connection, name: str, default: float, now: float) -> Tuple[float, float]:
+        row = db.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+        return row if row is not None else (default, now)
+
+    def _write_bucket(self, db: sqlite3.Connection, name: str, tokens: float, now: float):
+        db.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)", (name, tokens, now))
+
+    def _refill(self, db: sqlite3.Connection, name: str, capacity: float, rate: float, now: float) -> float:
+        tokens, updated_at = self._read_bucket(db, name, capacity, now)
+        return min(capacity, tokens + max(0.0, now - updated_at) * rate)
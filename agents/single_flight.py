@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Single Flight
+Coalesces identical in-flight LLM requests so concurrent callers share one underlying call
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+
+# Result a cancelled async leader leaves its followers, telling them to retry
+_LEADER_CANCELLED = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) runs the request; callers arriving with the same
+    key while it is in flight wait for the leader and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['hits'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['misses'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def async_do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of do; requests are coalesced per event loop. A cancelled leader does not
+        cancel its followers: one of them retries the request as the new leader.
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._async_calls.get(loop_key)
+                if future is None:
+                    future = self._async_calls[loop_key] = loop.create_future()
+                    self.stats['misses'] += 1
+                    break
+                self.stats['hits'] += 1
+
+            # shield: a cancelled follower must not cancel the shared call
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Hedge losers and abandoned calls are cancelled on purpose; hand the request over instead
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls) + len(self._async_calls)
+        total = stats['hits'] + stats['misses']
+        stats['coalesced_ratio'] = stats['hits'] / total if total else 0.0
+        return stats
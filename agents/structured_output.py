@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Structured Output
+Tolerant JSON extraction and schema validation for LLM completions, with success counters
+"""
+
+import re
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+MAX_EMBEDDED_CANDIDATES = 8
+
+_JSON_TYPES = {
+    'object': dict, 'array': list, 'string': str, 'boolean': bool,
+    'number': (int, float), 'integer': int, 'null': type(None)
+}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a completion holds no JSON value matching the expected schema"""
+
+
+def _candidates(text: str) -> Iterator[str]:
+    """
+    Plausible JSON snippets in a completion, most likely first
+    """
+    stripped = text.strip()
+    yield stripped
+    for fenced in _FENCE_PATTERN.findall(text):
+        yield fenced.strip()
+    # Leading or trailing prose: try the first few balanced {...} or [...] spans
+    tried = 0
+    for start, char in enumerate(text):
+        if char in '[{':
+            end = _balanced_end(text, start)
+            if end is not None:
+                yield text[start:end]
+                tried += 1
+                if tried >= MAX_EMBEDDED_CANDIDATES:
+                    return
+
+
+def _balanced_end(text: str, start: int) -> Optional[int]:
+    closing = {'{': '}', '[': ']'}
+    stack = []
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in closing:
+            stack.append(closing[char])
+        elif char in '}]':
+            if not stack or stack.pop() != char:
+                return None
+            if not stack:
+                return index + 1
+    return None
+
+
+def _remove_trailing_commas(snippet: str) -> str:
+    # Only outside strings: split on string literals and fix the code parts
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', snippet)
+    return "".join(part if i % 2 else _TRAILING_COMMA_PATTERN.sub(r"\1", part) for i, part in enumerate(parts))
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse the JSON value in a completion, tolerating code fences, surrounding prose and trailing commas
+    """
+    for snippet in _candidates(text or ""):
+        for attempt in (snippet, _remove_trailing_commas(snippet)):
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                continue
+    raise StructuredOutputError("No JSON value found in completion")
+
+
+def schema_errors(value: Any, schema: Dict, path: str = "$") -> List[str]:
+    """
+    Validate against a JSON Schema subset: type, properties, required, items, minItems, minLength
+    """
+    errors = []
+    expected = schema.get('type')
+    if expected:
+        python_type = _JSON_TYPES[expected]
+        if not isinstance(value, python_type) or (expected in ('number', 'integer') and isinstance(value, bool)):
+            return [f"{path}: expected {expected}"]
+
+    if isinstance(value, dict):
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append(f"{path}: missing '{key}'")
+        for key, subschema in schema.get('properties', {}).items():
+            if key in value:
+                errors.extend(schema_errors(value[key], subschema, f"{path}.{key}"))
+    elif isinstance(value, list):
+        if len(value) < schema.get('minItems', 0):
+            errors.append(f"{path}: fewer than {schema['minItems']} items")
+        if 'items' in schema:
+            for index, item in enumerate(value):
+                errors.extend(schema_errors(item, schema['items'], f"{path}[{index}]"))
+    elif isinstance(value, str) and len(value.strip()) < schema.get('minLength', 0):
+        errors.append(f"{path}: shorter than {schema['minLength']} characters")
+    return errors
+
+
+class StructuredOutputParser:
+    """
+    Extracts and validates JSON from completions, counting outcomes per prompt type:
+    direct (plain json.loads would have worked), repaired, invalid_json, schema_mismatch
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'calls': 0, 'direct': 0, 'repaired': 0, 'invalid_json': 0, 'schema_mismatch': 0})
+
+    def parse(self, text: str, schema: Dict = None, name: str = 'general') -> Any:
+        try:
+            value = json.loads(text)
+            outcome = 'direct'
+        except (ValueError, TypeError):
+            try:
+                value = extract_json(text)
+                outcome = 'repaired'
+            except StructuredOutputError:
+                self._count(name, 'invalid_json')
+                raise
+
+        if schema and schema.get('type') == 'array' and isinstance(value, dict):
+            # JSON response mode forces an object root; unwrap {"agents": [...]}
+            lists = [item for item in value.values() if isinstance(item, list)]
+            if len(lists) == 1:
+                value, outcome = lists[0], 'repaired'
+
+        errors = schema_errors(value, schema) if schema else []
+        if errors:
+            self._count(name, 'schema_mismatch')
+            raise StructuredOutputError("; ".join(errors[:5]))
+        self._count(name, outcome)
+        return value
+
+    def _count(self, name: str, outcome: str):
+        with self._lock:
+            self.stats[name]['calls'] += 1
+            self.stats[name][outcome] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = {name: dict(counts) for name, counts in self.stats.items()}
+        for counts in stats.values():
+            counts['success_rate'] = (counts['direct'] + counts['repaired']) / counts['calls'] if counts['calls'] else 0.0
+        return stats
@@ -0,0 +1,76 @@
+"""
+Tests for the deterministic agent specification parser
+"""
+
+from agents.agent_spec_parser import parse_agent_specification, parse_count
+
+SKIP_LLM_CONFIDENCE = 0.8
+FALLBACK_CONFIDENCE = 0.5
+
+
+def roles(parsed):
+    return [agent['role'] for agent in parsed['agents']]
+
+
+def test_plain_role_list_is_trusted():
+    parsed = parse_agent_specification("Create 3 agents: Product Manager, Developer, and Designer")
+    assert roles(parsed) == ["Product Manager", "Developer", "Designer"]
+    assert parsed['count'] == 3
+    assert parsed['confidence'] == 1.0
+    assert parsed['agents'][0]['expertise'] == "Product strategy and project management"
+
+
+def test_list_without_count_is_trusted_when_every_item_is_a_known_title():
+    parsed = parse_agent_specification("Developer and Designer")
+    assert roles(parsed) == ["Developer", "Designer"]
+    assert parsed['confidence'] == 1.0
+
+
+def test_count_words():
+    assert parse_count("I need four employees") == 4
+    assert parse_count("a team of 6") == 6
+    assert parse_count("five total") == 5
+    assert parse_count("Developer and Designer") is None
+
+
+def test_count_mismatch_lowers_confidence():
+    parsed = parse_agent_specification("Create 4 agents: Developer and Designer")
+    assert parsed['confidence'] < FALLBACK_CONFIDENCE
+
+
+def test_role_noun_inside_prose_is_not_trusted():
+    parsed = parse_agent_specification("I want a Developer who knows Python")
+    assert parsed['confidence'] < FALLBACK_CONFIDENCE
+
+
+def test_unknown_title_goes_to_the_llm():
+    parsed = parse_agent_specification("I need 2 agents: Growth Marketer and Data Analyst")
+    assert roles(parsed) == ["Growth Marketer", "Data Analyst"]
+    assert FALLBACK_CONFIDENCE <= parsed['confidence'] < SKIP_LLM_CONFIDENCE
+
+
+def test_synthesized_specialists_never_skip_the_llm():
+    parsed = parse_agent_specification("Create 3 agents: chef, sommelier, host")
+    assert roles(parsed) == ["Chef Specialist", "Sommelier Specialist", "Host Specialist"]
+    assert parsed['confidence'] < SKIP_LLM_CONFIDENCE
+
+
+def test_stopword_and_pronoun_items_are_rejected():
+    assert parse_agent_specification("yes") == {'agents': [], 'count': None, 'confidence': 0.0}
+    assert parse_agent_specification("it")['agents'] == []
+    assert parse_agent_specification("my startup")['confidence'] < FALLBACK_CONFIDENCE
+
+
+def test_duplicate_roles_lower_confidence():
+    parsed = parse_agent_specification("Create 2 agents: Developer and developer")
+    assert parsed['confidence'] < SKIP_LLM_CONFIDENCE
+
+
+def test_group_phrase_is_not_part_of_the_role():
+    parsed = parse_agent_specification("create a team with a developer")
+    assert roles(parsed) == ["Developer"]
+
+    parsed = parse_agent_specification("Create a team of 3 with Developer, Designer and Data Analyst")
+    assert roles(parsed) == ["Developer", "Designer", "Data Analyst"]
+    assert parsed['count'] == 3
+    assert parsed['confidence'] == 1.0
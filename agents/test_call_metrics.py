@@ -0,0 +1,44 @@
+"""
+Tests for per-call LLM metrics and the call log
+"""
+
+import json
+import threading
+from logging.handlers import RotatingFileHandler
+
+from agents.call_metrics import CallMetrics
+
+
+def test_records_are_aggregated_by_prompt_type(monkeypatch):
+    monkeypatch.setenv('XAI_CALL_LOG_ENABLED', '0')
+    metrics = CallMetrics()
+    metrics.record('analysis', 'ok', 0.2, model='x-1', prompt_tokens=10, completion_tokens=5)
+    metrics.record('analysis', 'error', 1.5, http_status=503, attempts=2)
+    metrics.record('analysis', 'cache_hit', 0.0)
+
+    stats = metrics.get_stats()['by_prompt_type']['analysis']
+    assert (stats['calls'], stats['ok'], stats['errors'], stats['cache_hits']) == (3, 1, 1, 1)
+    assert (stats['fallbacks'], stats['retries']) == (1, 1)
+    assert stats['statuses'] == {'ok': 1, '503': 1, 'cache_hit': 1}
+    buckets = stats['latency']['buckets']
+    assert (buckets['le_0.1'], buckets['le_0.25'], buckets['le_2.5']) == (1, 1, 1)
+
+
+def test_log_lines_are_written_off_the_calling_thread(tmp_path, monkeypatch):
+    writers = []
+    emit = RotatingFileHandler.emit
+    monkeypatch.setattr(RotatingFileHandler, 'emit',
+                        lambda handler, record: (writers.append(threading.current_thread()), emit(handler, record)))
+    metrics = CallMetrics(log_path=str(tmp_path / 'calls.{pid}.log'))
+    metrics.record('summary', 'ok', 0.3)
+    metrics.close()
+
+    assert writers and threading.current_thread() not in writers
+    with open(metrics.log_path) as f:
+        [line] = f.read().splitlines()
+    assert json.loads(line)['prompt_type'] == 'summary'
+    assert '{pid}' not in metrics.log_path
+
+    # Recording after close still aggregates
+    metrics.record('summary', 'ok', 0.3)
+    assert metrics.get_stats()['by_prompt_type']['summary']['calls'] == 2
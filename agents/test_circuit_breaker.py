@@ -0,0 +1,84 @@
+"""
+Tests for the XAI circuit breaker state machine
+"""
+
+import pytest
+
+from agents import circuit_breaker
+from agents.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', fake)
+    return fake
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure(RuntimeError("boom"))
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, max_reset_timeout=300)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == 'open'
+    assert not breaker.allow_request()
+    state = breaker.get_state()
+    assert (state['rejected'], state['opened'], state['last_error']) == (1, 1, "boom")
+
+
+def test_half_open_lets_exactly_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, max_reset_timeout=300)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow_request()
+
+
+def test_failed_probe_doubles_the_reset_timeout_up_to_the_cap(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, max_reset_timeout=100)
+    open_breaker(breaker)
+    for expected in (60, 100, 100):
+        clock.now += breaker.reset_timeout
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == 'open'
+        assert breaker.reset_timeout == expected
+
+    clock.now += breaker.reset_timeout
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.reset_timeout == 30
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, max_reset_timeout=300)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()
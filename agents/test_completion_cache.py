@@ -0,0 +1,84 @@
+"""
+Tests for the two-tier completion cache: LRU memory tier, SQLite promotion, TTL and disk eviction
+"""
+
+import pytest
+
+from agents import completion_cache
+from agents.completion_cache import CompletionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(completion_cache, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'completions.db')
+
+
+def test_disk_hit_is_promoted_to_memory(path, clock):
+    CompletionCache(path, memory_entries=8, ttl=60).set('k', 'cached reply')
+
+    # A fresh worker has an empty memory tier but shares the SQLite file
+    cache = CompletionCache(path, memory_entries=8, ttl=60)
+    assert cache.peek('k') is None
+    assert cache.get('k') == 'cached reply'
+    assert cache.peek('k') == 'cached reply'
+
+    stats = cache.get_stats()
+    assert stats['disk_hits'] == 1
+    assert stats['memory_hits'] == 1
+    assert stats['memory_entries'] == 1
+
+
+def test_memory_tier_evicts_least_recently_used(path, clock):
+    cache = CompletionCache(path, memory_entries=2, ttl=60)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.peek('a') == 'A'
+    cache.set('c', 'C')
+
+    assert cache.peek('b') is None
+    assert cache.peek('a') == 'A'
+    assert cache.peek('c') == 'C'
+    # The evicted entry is still served from disk
+    assert cache.get('b') == 'B'
+    assert cache.get_stats()['disk_hits'] == 1
+
+
+def test_expired_entries_are_dropped_from_both_tiers(path, clock):
+    cache = CompletionCache(path, memory_entries=8, ttl=60)
+    cache.set('k', 'stale reply')
+
+    clock.now += 61
+    assert cache.get('k') is None
+    assert cache.get_stats()['misses'] == 1
+    assert CompletionCache(path, memory_entries=8, ttl=3600).get('k') is None
+
+
+def test_disk_tier_evicts_least_recently_accessed_rows_over_budget(path, clock):
+    cache = CompletionCache(path, memory_entries=0, disk_max_bytes=20, ttl=60)
+    cache.set('a', 'x' * 8)
+    clock.now += 1
+    cache.set('b', 'y' * 8)
+    clock.now += 1
+    assert cache.get('a') == 'x' * 8
+    clock.now += 1
+    cache.set('c', 'z' * 8)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 8
+    assert cache.get('c') == 'z' * 8
+    assert cache.get_stats()['evictions'] == 1
@@ -0,0 +1,55 @@
+"""
+Tests for relevance-ranked context selection
+"""
+
+import math
+
+from agents.context_selection import message_vector, select_relevant
+from agents.token_budget import estimate_tokens
+
+
+def test_message_vector_is_unit_length_and_skips_stop_words():
+    vector = message_vector("We think the pricing strategies and pricing strategy matter")
+    assert set(vector) == {'pric', 'strategy', 'matter'}
+    assert math.isclose(sum(weight * weight for weight in vector.values()), 1.0)
+    assert message_vector("the and with") == {}
+
+
+def test_selects_most_relevant_messages_in_original_order():
+    texts = [
+        "Launch budget covers paid advertising channels.",
+        "Hiring plan needs two engineers.",
+        "Advertising creative should target students.",
+        "Office lease renews next month.",
+    ]
+    selected = select_relevant("How should advertising spend be split?", texts, k=2, max_tokens=200)
+    assert [index for index, _ in selected] == [0, 2]
+    assert [text for _, text in selected] == [texts[0], texts[2]]
+
+
+def test_shared_topic_words_count_for_little():
+    texts = [
+        "Marketing marketing marketing plan overview.",
+        "Marketing pricing tiers for enterprise.",
+        "Marketing channels and events.",
+    ]
+    selected = select_relevant("marketing pricing", texts, k=1, max_tokens=100)
+    assert [index for index, _ in selected] == [1]
+
+
+def test_ties_prefer_recent_messages():
+    texts = ["alpha one.", "beta two.", "gamma three."]
+    selected = select_relevant("unrelated query", texts, k=2, max_tokens=100)
+    assert [index for index, _ in selected] == [1, 2]
+
+
+def test_selection_fits_the_token_budget():
+    long_text = " ".join(f"Advertising sentence number {i} is here." for i in range(40))
+    selected = select_relevant("advertising", [long_text, long_text + " More."], k=2, max_tokens=40)
+    assert len(selected) == 2
+    assert all(estimate_tokens(text) <= 20 for _, text in selected)
+
+
+def test_empty_inputs_select_nothing():
+    assert select_relevant("query", [], k=3, max_tokens=100) == []
+    assert select_relevant("query", ["text here"], k=0, max_tokens=100) == []
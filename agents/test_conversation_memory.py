@@ -0,0 +1,114 @@
+"""
+Tests for the rolling conversation memory: summary refresh, fallback summary, archive bounds and relevance
+"""
+
+import asyncio
+
+import pytest
+
+from agents.conversation_memory import ConversationMemory
+from agents.token_budget import TokenBudgeter, estimate_tokens
+
+
+class StubClient:
+    """
+    Numbers each summary and records the summary prompts; fails every call when `fail` is set
+    """
+
+    def __init__(self, fail=False):
+        self.budgeter = TokenBudgeter()
+        self.fail = fail
+        self.prompts = []
+
+    async def async_chat_completion(self, prompt, cache=True, prompt_type='general', **kwargs):
+        assert (cache, prompt_type) == (False, 'summary')
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("XAI API not available")
+        return f"Summary {len(self.prompts)}"
+
+
+def responses(*messages):
+    return [{'agent_id': f"agent_{i}", 'agent_role': role, 'message': text}
+            for i, (role, text) in enumerate(messages)]
+
+
+@pytest.fixture
+def memory():
+    return ConversationMemory(StubClient(), recent_messages=2, summary_tokens=40,
+                              relevant_messages=1, relevant_tokens=100, archive_size=10)
+
+
+def test_refresh_folds_messages_beyond_the_recent_window(memory):
+    memory.add_exchange(1, responses(("Developer", "We need an API first."), ("Designer", "Mockups come first.")))
+    assert asyncio.run(memory.async_refresh()) is False
+
+    memory.add_exchange(2, responses(("Developer", "Fine, mockups then API."), ("Designer", "Agreed.")))
+    assert asyncio.run(memory.async_refresh()) is True
+
+    assert memory.summary == "Summary 1"
+    assert memory.summarized_count == 2
+    assert [m['message'] for m in memory.messages] == ["Fine, mockups then API.", "Agreed."]
+    # Only the folded messages go into the summary prompt
+    prompt = memory.client.prompts[0]
+    assert "We need an API first." in prompt and "Agreed." not in prompt
+
+    memory.add_exchange(3, responses(("Developer", "Shipping Friday.")))
+    asyncio.run(memory.async_refresh())
+    assert memory.summary == "Summary 2"
+    assert "Summary 1" in memory.client.prompts[1]
+    assert memory.summarized_count == 3
+
+
+def test_failed_refresh_falls_back_to_a_bounded_extract():
+    memory = ConversationMemory(StubClient(fail=True), recent_messages=1, summary_tokens=40, archive_size=10)
+    long_message = "We should launch in the spring. " * 30
+    memory.add_exchange(1, responses(("Developer", long_message), ("Designer", "Agreed.")))
+
+    assert asyncio.run(memory.async_refresh()) is True
+    assert memory.summary.startswith("Developer: We should launch in the spring.")
+    assert estimate_tokens(memory.summary) <= 40
+    assert memory.get_stats()['fallbacks'] == 1
+    assert [m['message'] for m in memory.messages] == ["Agreed."]
+
+
+def test_archive_is_bounded_but_keeps_the_raw_tail():
+    memory = ConversationMemory(StubClient(), recent_messages=2, archive_size=3)
+    for exchange in range(1, 4):
+        memory.add_exchange(exchange, responses(("Developer", f"Point {exchange}a"), ("Designer", f"Point {exchange}b")))
+
+    # Nothing has been folded yet, so the archive may not drop unsummarized messages
+    assert len(memory.archive) == 6
+    asyncio.run(memory.async_refresh())
+
+    memory.add_exchange(4, responses(("Developer", "Point 4a")))
+    assert len(memory.archive) == 3
+    assert memory.archive[-len(memory.messages):] == memory.messages
+
+
+def test_context_adds_the_folded_messages_relevant_to_the_query(memory):
+    memory.add_exchange(1, responses(("Developer", "The database schema needs an index on orders."),
+                                     ("Designer", "The onboarding colours feel too dark.")))
+    memory.add_exchange(2, responses(("Developer", "Next steps?"), ("Designer", "Let's vote.")))
+    asyncio.run(memory.async_refresh())
+
+    entries = memory.context("database schema indexing")
+    assert [e['type'] for e in entries] == ['summary', 'relevant', 'message', 'message']
+    assert entries[1]['content'] == "The database schema needs an index on orders."
+    assert entries[1]['agent_role'] == "Developer"
+    # Without a query only the summary and the raw messages are returned
+    assert [e['type'] for e in memory.context()] == ['summary', 'message', 'message']
+
+
+def test_export_and_restore_round_trip(memory):
+    memory.add_exchange(1, responses(("Developer", "One."), ("Designer", "Two."), ("Tester", "Three.")))
+    asyncio.run(memory.async_refresh())
+
+    restored = ConversationMemory(StubClient(), recent_messages=2, archive_size=10)
+    restored.restore_state(memory.export_state())
+
+    assert restored.summary == memory.summary
+    assert restored.messages == memory.messages
+    assert restored.archive == memory.archive
+    assert restored.get_stats()['summarized_messages'] == 1
+    assert restored.context("anything") == memory.context("anything")
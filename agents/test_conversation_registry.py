@@ -0,0 +1,128 @@
+"""
+Tests for the session registry: eviction, the persisted conversation index and read-only requests
+"""
+
+import threading
+
+import pytest
+
+from agents.conversation_registry import ConversationRegistry, SessionNotFoundError
+
+
+class FakeOrchestrator:
+    def __init__(self):
+        self.history = []
+        self.exports = 0
+        self.closed = False
+
+    def start(self, conversation_id):
+        self.history.append({'conversation_id': conversation_id})
+
+    def export_state(self):
+        self.exports += 1
+        return {'broker': {'conversation_history': list(self.history)}}
+
+    def restore_state(self, state):
+        self.history = state['broker']['conversation_history']
+
+    def close(self):
+        self.closed = True
+
+
+def make_registry(directory, **kwargs):
+    return ConversationRegistry(FakeOrchestrator, directory=str(directory), **kwargs)
+
+
+def test_conversation_id_resolves_to_its_session(tmp_path):
+    registry = make_registry(tmp_path)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+    assert registry.resolve(conversation_id='c1') == 's1'
+    with pytest.raises(SessionNotFoundError):
+        registry.resolve(conversation_id='unknown')
+
+
+def test_conversation_index_survives_a_new_process(tmp_path):
+    with make_registry(tmp_path).session('s1') as orchestrator:
+        orchestrator.start('c1')
+
+    # A second registry on the same directory stands in for another worker or a restart
+    registry = make_registry(tmp_path)
+    assert registry.resolve(conversation_id='c1') == 's1'
+
+
+def test_evicted_session_is_saved_and_reloaded(tmp_path):
+    evicted = []
+    registry = make_registry(tmp_path, max_sessions=1, on_evict=evicted.append)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+    with registry.session('s2'):
+        pass
+    assert evicted == ['s1']
+    assert orchestrator.closed
+
+    with registry.session('s1') as reloaded:
+        assert reloaded.history == [{'conversation_id': 'c1'}]
+    assert registry.get_stats()['loaded'] == 1
+
+
+def test_read_only_requests_do_not_serialise_state(tmp_path):
+    registry = make_registry(tmp_path)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+    exports = orchestrator.exports
+    for _ in range(3):
+        with registry.session('s1', read_only=True):
+            pass
+    assert orchestrator.exports == exports
+
+
+def test_delete_forgets_the_conversation_index(tmp_path):
+    registry = make_registry(tmp_path)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+    assert registry.delete('s1')
+    with pytest.raises(SessionNotFoundError):
+        make_registry(tmp_path).resolve(conversation_id='c1')
+
+
+def test_read_only_requests_do_not_wait_for_the_session_lock(tmp_path):
+    registry = make_registry(tmp_path)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+
+    holding, release = threading.Event(), threading.Event()
+
+    def long_request():
+        with registry.session('s1'):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=long_request)
+    thread.start()
+    holding.wait(5)
+    try:
+        done = threading.Event()
+
+        def read():
+            with registry.session('s1', read_only=True) as reader:
+                assert reader is orchestrator
+            done.set()
+
+        threading.Thread(target=read).start()
+        assert done.wait(2)
+    finally:
+        release.set()
+        thread.join(5)
+
+
+def test_read_only_request_loads_an_evicted_session(tmp_path):
+    registry = make_registry(tmp_path, max_sessions=1)
+    with registry.session('s1') as orchestrator:
+        orchestrator.start('c1')
+    with registry.session('s2'):
+        pass
+
+    with registry.session('s1', read_only=True) as reloaded:
+        assert reloaded.history == [{'conversation_id': 'c1'}]
+    assert registry.resolve(conversation_id='c1') == 's1'
@@ -0,0 +1,193 @@
+"""
+Tests for agent creation: batched, concurrent, prewarmed and lazily upgraded personalities
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents import dynamic_agent_manager
+from agents.agent_spec_parser import parse_agent_specification
+from agents.dynamic_agent_manager import DynamicAgentManager
+from agents.structured_output import StructuredOutputError
+from agents.token_budget import TokenBudgeter
+
+TEAM = [{'role': 'Product Manager', 'expertise': 'Roadmaps'}, {'role': 'Developer', 'expertise': 'APIs'},
+        {'role': 'Designer', 'expertise': 'Visual design'}]
+
+
+class StubClient:
+    """
+    Answers personality prompts with "Personality of <role> (<expertise>)"; structured calls
+    return batch_reply, or fail to parse when it is None
+    """
+
+    def __init__(self, batch_reply=None):
+        self.budgeter = TokenBudgeter()
+        self.batch_reply = batch_reply
+        self.calls = []
+        # Cleared to hold personality calls until the test sets it
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def chat_completion(self, prompt, max_tokens=None, cache=True, prompt_type='general', **kwargs):
+        self.calls.append(prompt_type)
+        self.gate.wait(5)
+        role = re.search(r"Role: (.*)", prompt).group(1)
+        expertise = re.search(r"Expertise: (.*)", prompt).group(1)
+        return f"Personality of {role} ({expertise})"
+
+    def structured_completion(self, prompt, schema, max_tokens=None, prompt_type='general', **kwargs):
+        self.calls.append(prompt_type)
+        if self.batch_reply is None:
+            raise StructuredOutputError("no JSON found")
+        return self.batch_reply
+
+
+@pytest.fixture
+def make_manager(monkeypatch):
+    monkeypatch.setenv('XAI_API_TOKEN', 'test-token')
+    monkeypatch.delenv('AGENT_LAZY_PERSONALITIES', raising=False)
+
+    def make(client=None):
+        client = client or StubClient()
+        monkeypatch.setattr(dynamic_agent_manager, 'get_xai_client', lambda *args: client)
+        return DynamicAgentManager()
+    return make
+
+
+def test_prewarmed_suggestions_are_claimed_by_a_parsed_specification(make_manager):
+    manager = make_manager()
+    manager.prewarm_personalities([
+        {'role': 'Product Manager', 'expertise': 'Product strategy, roadmap planning and prioritisation'},
+        {'role': 'Developer', 'expertise': 'Full-stack implementation and technical feasibility'},
+    ])
+
+    specs = parse_agent_specification("Create 2 agents: Product Manager and Developer")['agents']
+    agents = manager.create_multiple_agents(specs)
+
+    assert manager.get_prewarm_stats() == {'started': 2, 'claimed': 2, 'expired': 0, 'skipped': 0, 'pending': 0}
+    assert manager.client.calls == ['personality', 'personality']
+    # The agents take the suggestion's expertise, which their personalities describe
+    assert [agent['expertise'] for agent in agents] == [
+        'Product strategy, roadmap planning and prioritisation',
+        'Full-stack implementation and technical feasibility',
+    ]
+    assert agents[1]['personality'] == "Personality of Developer (Full-stack implementation and technical feasibility)"
+
+
+def test_roles_without_a_prewarm_keep_their_expertise(make_manager):
+    manager = make_manager()
+    manager.prewarm_personalities([{'role': 'Designer', 'expertise': 'Visual design'}])
+
+    agents = manager.create_multiple_agents([{'role': 'Developer', 'expertise': 'APIs'}])
+
+    assert agents[0]['expertise'] == 'APIs'
+    assert manager.get_prewarm_stats()['pending'] == 1
+
+
+def test_restored_pending_agents_are_upgraded(make_manager):
+    saved = make_manager().export_state()
+    saved['agents'] = {'agent_0': {'id': 'agent_0', 'role': 'Developer', 'expertise': 'APIs',
+                                   'personality': 'fallback', 'personality_status': 'pending'}}
+    manager = make_manager()
+    upgraded = threading.Event()
+    manager.personality_listener = lambda agent: upgraded.set()
+
+    manager.restore_state(saved)
+
+    assert upgraded.wait(5)
+    agent = manager.get_agent('agent_0')
+    assert (agent['personality'], agent['personality_status']) == ("Personality of Developer (APIs)", 'ready')
+
+
+def test_lazy_agents_start_pending_and_are_upgraded(make_manager, monkeypatch):
+    monkeypatch.setenv('AGENT_LAZY_PERSONALITIES', '1')
+    manager = make_manager()
+    upgraded = []
+    done = threading.Event()
+
+    def listener(agent):
+        upgraded.append(agent['id'])
+        if len(upgraded) == 2:
+            done.set()
+
+    manager.personality_listener = listener
+    manager.client.gate.clear()
+    agents = manager.create_multiple_agents([{'role': 'Developer', 'expertise': 'APIs'},
+                                             {'role': 'Designer', 'expertise': 'Visual design'}])
+
+    assert [agent['personality_status'] for agent in agents] == ['pending', 'pending']
+    assert agents[0]['personality'] == manager._fallback_personality('Developer', 'APIs')
+    manager.client.gate.set()
+    assert done.wait(5)
+    assert sorted(upgraded) == ['agent_0', 'agent_1']
+    # Upgraded in place, so every holder of the record sees the new personality
+    assert agents[1]['personality'] == "Personality of Designer (Visual design)"
+    assert [agent['personality_status'] for agent in manager.get_all_agents()] == ['ready', 'ready']
+
+
+def test_team_personalities_come_from_one_batched_call(make_manager):
+    manager = make_manager(StubClient({'1': " Batched PM ", '2': "Batched dev", '3': "Batched designer"}))
+    agents = manager.create_multiple_agents(TEAM)
+
+    assert manager.client.calls == ['personality_batch']
+    assert [agent['personality'] for agent in agents] == ["Batched PM", "Batched dev", "Batched designer"]
+    assert [agent['id'] for agent in agents] == ['agent_0', 'agent_1', 'agent_2']
+
+
+def test_entries_missing_from_the_batch_get_their_own_call(make_manager):
+    manager = make_manager(StubClient({'1': "Batched PM", '2': {'text': "not a string"}, '3': "  "}))
+    agents = manager.create_multiple_agents(TEAM)
+
+    assert sorted(manager.client.calls) == ['personality', 'personality', 'personality_batch']
+    assert [agent['personality'] for agent in agents] == [
+        "Batched PM", "Personality of Developer (APIs)", "Personality of Designer (Visual design)"]
+
+
+def test_malformed_batch_falls_back_to_one_call_per_agent(make_manager):
+    manager = make_manager(StubClient(None))
+    agents = manager.create_multiple_agents(TEAM)
+
+    assert sorted(manager.client.calls) == ['personality'] * 3 + ['personality_batch']
+    assert agents[0]['personality'] == "Personality of Product Manager (Roadmaps)"
+
+
+def test_batching_can_be_turned_off(make_manager, monkeypatch):
+    monkeypatch.setenv('AGENT_PERSONALITY_BATCH', '0')
+    manager = make_manager(StubClient({'1': "unused"}))
+    manager.create_multiple_agents(TEAM)
+    assert manager.client.calls == ['personality'] * 3
+
+
+class BarrierClient(StubClient):
+    """
+    Personality calls only answer once `parties` of them are in flight together
+    """
+
+    def __init__(self, parties):
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.threads = []
+
+    def chat_completion(self, prompt, *args, **kwargs):
+        self.threads.append(threading.current_thread().name)
+        self.barrier.wait()
+        return super().chat_completion(prompt, *args, **kwargs)
+
+
+def test_individual_personalities_are_generated_concurrently_on_the_shared_pool(make_manager, monkeypatch):
+    monkeypatch.setenv('AGENT_PERSONALITY_BATCH', '0')
+    manager = make_manager(BarrierClient(len(TEAM)))
+    other = make_manager()
+
+    agents = manager.create_multiple_agents(TEAM)
+
+    # A failed barrier would have left the fallback personalities
+    assert [agent['personality'] for agent in agents] == [
+        f"Personality of {spec['role']} ({spec['expertise']})" for spec in TEAM]
+    assert all(name.startswith('agent-creation') for name in manager.client.threads)
+    # One process-wide pool rather than one per manager
+    assert not any(isinstance(value, ThreadPoolExecutor) for owner in (manager, other) for value in vars(owner).values())
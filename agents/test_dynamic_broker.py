@@ -0,0 +1,204 @@
+"""
+Tests for the broker's exchange pipeline against a stub LLM client
+"""
+
+import asyncio
+import re
+import json
+
+import pytest
+
+from agents import dynamic_agent_manager, dynamic_broker
+from agents.dynamic_broker import DynamicBrokerAgent
+from agents.dynamic_orchestrator import DynamicAgentOrchestrator
+from agents.structured_output import StructuredOutputError
+from agents.token_budget import TokenBudgeter
+
+AGENTS = [{'role': 'Product Manager', 'expertise': 'Roadmaps'}, {'role': 'Developer', 'expertise': 'APIs'}]
+
+
+class StubClient:
+    """
+    Answers every prompt type after a short delay, recording (prompt_type, prompt) per call.
+    Summaries are numbered and slower than other calls, so overlapping work would show.
+    """
+
+    def __init__(self):
+        self.budgeter = TokenBudgeter()
+        self.calls = []
+        self.summaries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Reply to batched exchange calls; None fails to parse
+        self.batched_reply = None
+
+    def chat_completion(self, prompt, max_tokens=None, cache=True, prompt_type='general', **kwargs):
+        self.calls.append((prompt_type, prompt))
+        return "A thoughtful colleague."
+
+    async def async_chat_completion(self, prompt, max_tokens=None, cache=True, prompt_type='general', **kwargs):
+        self.calls.append((prompt_type, prompt))
+        if prompt_type == 'summary':
+            await asyncio.sleep(0.05)
+            self.summaries += 1
+            return f"Summary {self.summaries}"
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if prompt_type == 'analysis':
+            return "Analysis of exchange " + re.search(r"Exchange #(\d+)", prompt).group(1)
+        if prompt_type == 'conclusion':
+            return "Conclusion"
+        return f"Reply {len(self.calls)}"
+
+    def structured_completion(self, *args, **kwargs):
+        raise StructuredOutputError("no JSON found")
+
+    async def async_structured_completion(self, prompt, schema, max_tokens=None, prompt_type='general', **kwargs):
+        self.calls.append((prompt_type, prompt))
+        if self.batched_reply is None:
+            raise StructuredOutputError("no JSON found")
+        return self.batched_reply
+
+    def prompts(self, prompt_type):
+        return [prompt for kind, prompt in self.calls if kind == prompt_type]
+
+
+@pytest.fixture
+def stub_client(monkeypatch):
+    """
+    Every broker and agent manager created in the test talks to one fresh StubClient
+    """
+    monkeypatch.setenv('XAI_API_TOKEN', 'test-token')
+    monkeypatch.setenv('AGENT_LAZY_PERSONALITIES', '0')
+    monkeypatch.setenv('BROKER_EXCHANGE_MODE', 'sequential')
+    clients = []
+
+    def get_client(*args):
+        if not clients:
+            clients.append(StubClient())
+        return clients[-1]
+
+    monkeypatch.setattr(dynamic_broker, 'get_xai_client', get_client)
+    monkeypatch.setattr(dynamic_agent_manager, 'get_xai_client', get_client)
+    return clients
+
+
+def make_broker(clients):
+    clients.clear()
+    broker = DynamicBrokerAgent()
+    broker.start_conversation("Launch plan", "New product", AGENTS)
+    # Fold everything but the latest message into the summary after every exchange
+    broker.memory.recent_messages = 1
+    return broker
+
+
+@pytest.fixture
+def broker(stub_client):
+    return make_broker(stub_client)
+
+
+def test_pipelined_turns_see_the_previous_exchange_memory(broker):
+    asyncio.run(broker.async_conduct_exchanges(3))
+
+    responses = broker.client.prompts('agent_response')
+    # Two agents per exchange: the turns of exchange k+1 see the summary refreshed after exchange k
+    assert "Summary 1" in responses[2] and "Summary 1" in responses[3]
+    assert "Summary 2" in responses[4] and "Summary 2" in responses[5]
+
+
+def test_conclusion_summarises_the_final_exchange(broker):
+    broker.max_exchanges = 2
+    results = asyncio.run(broker.async_conduct_exchanges(3))
+
+    assert [result['status'] for result in results] == ['exchange_completed', 'exchange_completed', 'concluded']
+    assert results[2]['conclusion'] == "Conclusion"
+    final_reply = broker.conversation_history[-1]['exchanges'][-1]['agent_responses'][-1]['message']
+    [prompt] = broker.client.prompts('conclusion')
+    assert "Summary 2" in prompt and final_reply in prompt
+
+
+def test_sync_conduct_exchange_returns_the_exchange_result(broker):
+    result = broker.conduct_exchange()
+
+    assert set(result) == {'exchange_number', 'agent_responses', 'broker_analysis', 'progress', 'status'}
+    assert result['status'] == 'exchange_completed'
+    assert [resp['agent_role'] for resp in result['agent_responses']] == ['Product Manager', 'Developer']
+    assert result['broker_analysis'] == "Analysis of exchange 1"
+    assert result['progress']['exchanges_completed'] == 1
+    # Sequential turns: the second agent sees the first agent's message
+    first_message = result['agent_responses'][0]['message']
+    assert first_message in broker.client.prompts('agent_response')[1]
+
+
+def test_pipelined_results_match_sequential_calls(stub_client):
+    sequential = make_broker(stub_client)
+    sequential.max_exchanges = 3
+    expected = [sequential.conduct_exchange() for _ in range(4)]
+
+    pipelined = make_broker(stub_client)
+    pipelined.max_exchanges = 3
+    results = asyncio.run(pipelined.async_conduct_exchanges(4))
+
+    def shape(result):
+        return (result['status'], sorted(result), result.get('exchange_number'), result.get('broker_analysis'),
+                result.get('progress'), [resp['agent_role'] for resp in result.get('agent_responses', [])])
+
+    assert [shape(result) for result in results] == [shape(result) for result in expected]
+    assert [result['status'] for result in results] == ['exchange_completed'] * 3 + ['concluded']
+
+
+def test_sync_full_conversation_wrapper(stub_client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The conversation log is saved to the working directory
+    stub_client.clear()
+    orchestrator = DynamicAgentOrchestrator()
+
+    result = orchestrator.conduct_full_conversation("Launch plan", "New product", AGENTS, max_exchanges=2)
+
+    assert result['status'] == 'completed'
+    assert result['total_exchanges'] == 2
+    assert [exchange['status'] for exchange in result['exchanges']] == ['exchange_completed'] * 2 + ['concluded']
+    assert [entry['exchange_number'] for entry in orchestrator.conversation_log] == [1, 2]
+    [log_file] = tmp_path.glob('conversation_log_*.json')
+    assert len(json.loads(log_file.read_text())['conversation_log']) == 2
+
+
+def test_parallel_round_asks_every_agent_at_once(broker):
+    broker.exchange_mode = 'parallel'
+    first = broker.conduct_exchange()
+    broker.client.max_in_flight = 0
+    second = broker.conduct_exchange()
+
+    # Both agents' calls overlap; the analysis only starts after the round
+    assert broker.client.max_in_flight == 2
+    assert [resp['agent_id'] for resp in second['agent_responses']] == [agent['id'] for agent in broker.active_agents]
+    prompts = broker.client.prompts('agent_response')
+    # Agents do not see each other's messages from the same round, but do see the previous exchange
+    assert second['agent_responses'][0]['message'] not in prompts[3]
+    assert "Summary 1" in prompts[2] and first['agent_responses'][1]['message'] in prompts[2]
+
+
+def test_batched_exchange_answers_in_one_call(broker):
+    broker.exchange_mode = 'batched'
+    ids = [agent['id'] for agent in broker.active_agents]
+    broker.client.batched_reply = {'responses': {ids[0]: " PM view ", ids[1]: ""}, 'analysis': "Batched analysis"}
+
+    result = broker.conduct_exchange()
+
+    # The empty response gets its own call; the batched analysis replaces the analysis call
+    assert [resp['message'] for resp in result['agent_responses']][0] == "PM view"
+    assert len(broker.client.prompts('agent_response')) == 1
+    assert result['broker_analysis'] == "Batched analysis"
+    assert broker.client.prompts('analysis') == []
+
+
+def test_malformed_batched_exchange_falls_back_to_separate_calls(broker):
+    broker.exchange_mode = 'batched'
+    result = broker.conduct_exchange()
+
+    assert len(broker.client.prompts('batched_exchange')) == 1
+    assert len(broker.client.prompts('agent_response')) == 2
+    assert result['broker_analysis'] == "Analysis of exchange 1"
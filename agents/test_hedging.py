@@ -0,0 +1,137 @@
+"""
+Tests for hedged requests: a slow primary gets a backup, the loser is closed and its rate-limit slot released
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agents.hedging import HedgingPolicy
+from agents.xai_client import XAIClient
+
+P90 = 0.2
+SLOW = 0.6
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('XAI_CACHE_PATH', str(tmp_path / 'completions.db'))
+    monkeypatch.setenv('XAI_MODEL_CACHE', str(tmp_path / 'model.json'))
+    monkeypatch.setenv('XAI_RATE_LIMIT_PATH', str(tmp_path / 'rate_limit.db'))
+    monkeypatch.setenv('XAI_CALL_LOG_ENABLED', '0')
+    client = XAIClient('test-token', 'http://127.0.0.1:9/v1')
+    client.hedging = HedgingPolicy(prompt_types=['agent_response'], min_samples=5, max_extra_ratio=1.0)
+    for _ in range(10):
+        client.hedging.record_latency('agent_response', P90)
+        client.hedging.record_latency('agent_response', P90, first_token=True)
+    yield client
+    client.close()
+
+
+def leases(client):
+    return client.limiter._connection().execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class Attempts:
+    """
+    Stand-in streams: the first attempt (the primary) waits `primary_delay` before its first delta.
+    Each attempt holds a rate-limit slot, and records whether it was closed.
+    """
+
+    def __init__(self, client, primary_delay):
+        self.client = client
+        self.primary_delay = primary_delay
+        self.closed = []
+
+    def stream(self, *args):
+        number = len(self.closed)
+        self.closed.append(False)
+        with self.client._rate_limited(10):
+            try:
+                if number == 0:
+                    time.sleep(self.primary_delay)
+                yield f"attempt {number}"
+                yield "."
+            finally:
+                self.closed[number] = True
+
+    async def async_stream(self, *args):
+        number = len(self.closed)
+        self.closed.append(False)
+        async with self.client._async_rate_limited(10):
+            try:
+                if number == 0:
+                    await asyncio.sleep(self.primary_delay)
+                yield f"attempt {number}"
+                yield "."
+            finally:
+                self.closed[number] = True
+
+
+def test_slow_call_is_hedged_and_the_backup_wins(client):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(SLOW)
+            return "primary"
+        return "backup"
+
+    assert client._hedged(call, 'agent_response') == "backup"
+    assert client.hedging.get_stats()['hedge_wins'] == 1
+
+
+def test_call_faster_than_p90_is_not_hedged(client):
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "primary"
+
+    assert client._hedged(call, 'agent_response') == "primary"
+    assert len(calls) == 1
+    assert client.hedging.get_stats()['hedged'] == 0
+
+
+def test_hedged_stream_closes_the_loser_and_releases_its_slot(client):
+    attempts = Attempts(client, SLOW)
+    client._stream = attempts.stream
+
+    assert "".join(client.stream_chat_completion("hi", prompt_type='agent_response')) == "attempt 1."
+    assert client.hedging.get_stats()['hedge_wins'] == 1
+    # The primary is closed once its late first delta arrives
+    wait_for(lambda: all(attempts.closed) and leases(client) == 0)
+    assert client.metrics.get_stats()['by_prompt_type']['agent_response']['hedged'] == 1
+
+
+def test_fast_stream_is_not_hedged(client):
+    attempts = Attempts(client, 0)
+    client._stream = attempts.stream
+
+    assert "".join(client.stream_chat_completion("hi", prompt_type='agent_response')) == "attempt 0."
+    assert attempts.closed == [True]
+    assert leases(client) == 0
+
+
+def test_async_hedged_stream_cancels_the_loser_and_releases_its_slot(client):
+    attempts = Attempts(client, SLOW)
+    client._async_stream = attempts.async_stream
+
+    async def run():
+        return "".join([delta async for delta in client.async_stream_chat_completion("hi", prompt_type='agent_response')])
+
+    started = time.monotonic()
+    assert asyncio.run(run()) == "attempt 1."
+    # Answered by the backup, without waiting out the slow primary
+    assert time.monotonic() - started < SLOW
+    assert attempts.closed == [True, True]
+    assert leases(client) == 0
@@ -0,0 +1,41 @@
+"""
+Tests for the word-boundary multi-keyword matcher
+"""
+
+from agents.keyword_matcher import KeywordMatcher
+
+
+def test_matches_on_word_boundaries_only():
+    matcher = KeywordMatcher({'new': ['new'], 'how': ['how']})
+    assert matcher.match("Any news? Show me") == set()
+    assert matcher.match("How is the new plan") == {'new', 'how'}
+
+
+def test_prefix_keywords_and_case_insensitivity():
+    matcher = KeywordMatcher({'agents': ['agent*', 'team*']})
+    assert matcher.match("Create a TEAM of Agents") == {'agents'}
+    assert matcher.match("reagents") == set()
+
+
+def test_multi_word_keywords_ignore_extra_whitespace():
+    matcher = KeywordMatcher({'help': ['what can you do']})
+    assert matcher.match("So,  what can\nyou   do?") == {'help'}
+    assert matcher.match("what can you doodle") == set()
+
+
+def test_overlapping_keywords_found_via_failure_links():
+    matcher = KeywordMatcher({'a': ['she'], 'b': ['he'], 'c': ['hers']})
+    assert matcher.match("ushers") == set()
+    assert matcher.match("she said hers") == {'a', 'c'}
+    assert matcher.match("he") == {'b'}
+
+
+def test_shared_keyword_reports_every_category():
+    matcher = KeywordMatcher({'x': ['status'], 'y': ['Status']})
+    assert matcher.match("project status") == {'x', 'y'}
+
+
+def test_first_respects_order_and_default():
+    matcher = KeywordMatcher({'help': ['help'], 'agents': ['agent*']})
+    assert matcher.first("help me with agents", ['agents', 'help']) == 'agents'
+    assert matcher.first("nothing here", ['agents', 'help'], default='chat') == 'chat'
@@ -0,0 +1,85 @@
+"""
+Tests for the local XAI stand-in server: known models answer, unknown models return 404
+"""
+
+import json
+
+import pytest
+import requests
+
+from agents.local_xai_server import LocalXAIConfig, parse_latency, start_local_server
+from agents.xai_client import XAIClient
+
+
+@pytest.fixture
+def server():
+    config = LocalXAIConfig(models=['x-2'], latency='fixed:0', tokens_per_second=10000)
+    httpd, base_url = start_local_server(config=config)
+    yield config, base_url
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(base_url, model, **extra):
+    body = {'model': model, 'messages': [{'role': 'user', 'content': 'hello'}], 'max_tokens': 20}
+    body.update(extra)
+    return requests.post(f"{base_url}/chat/completions", json=body, timeout=5)
+
+
+def test_known_model_returns_a_completion(server):
+    config, base_url = server
+    response = post(base_url, 'x-2')
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload['model'] == 'x-2'
+    assert payload['choices'][0]['message']['content']
+    assert payload['usage']['completion_tokens'] <= 20
+    assert config.stats['requests'] == 1
+
+
+def test_unknown_model_returns_404(server):
+    config, base_url = server
+    response = post(base_url, 'grok-beta')
+
+    assert response.status_code == 404
+    assert 'grok-beta' in response.json()['error']
+    assert config.stats['not_found'] == 1
+
+
+def test_models_endpoint_lists_the_configured_models(server):
+    _, base_url = server
+    response = requests.get(f"{base_url}/models", timeout=5)
+    assert [m['id'] for m in response.json()['data']] == ['x-2']
+
+
+def test_stream_ends_with_done(server):
+    config, base_url = server
+    response = post(base_url, 'x-2', stream=True)
+
+    lines = [line for line in response.iter_lines(decode_unicode=True) if line]
+    assert lines[-1] == 'data: [DONE]'
+    assert json.loads(lines[0][len('data: '):])['model'] == 'x-2'
+    assert config.stats['streamed'] == 1
+
+
+def test_client_probes_past_unknown_models(server, tmp_path, monkeypatch):
+    config, base_url = server
+    monkeypatch.setenv('XAI_CACHE_ENABLED', '0')
+    monkeypatch.setenv('XAI_MODEL_CACHE', str(tmp_path / 'model.json'))
+    monkeypatch.setenv('XAI_RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('XAI_CALL_LOG_ENABLED', '0')
+    client = XAIClient('test-token', base_url)
+    try:
+        assert client.chat_completion("hello", max_tokens=20)
+        assert client.resolver.get() == 'x-2'
+        assert config.stats['not_found'] == 1
+    finally:
+        client.close()
+
+
+def test_parse_latency_rejects_unknown_distributions():
+    assert parse_latency('fixed:0.5')() == 0.5
+    assert 0.1 <= parse_latency('uniform:0.1,0.2')() <= 0.2
+    with pytest.raises(ValueError):
+        parse_latency('normal:1,2')
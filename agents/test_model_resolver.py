@@ -0,0 +1,131 @@
+"""
+Tests for the model resolver: persistence, TTL, and re-probing after the resolved model returns 404
+"""
+
+import os
+
+import pytest
+
+from agents import model_resolver
+from agents.model_resolver import ModelResolver
+from agents.xai_client import XAIClient
+
+BASE_URL = 'http://127.0.0.1:9/v1'
+CANDIDATES = ['x-1', 'x-2', 'grok-beta']
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=''):
+        self.status_code = status_code
+        self.text = content
+
+    def json(self):
+        return {'choices': [{'message': {'content': self.text}}], 'usage': {}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(model_resolver, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'model.json')
+
+
+def test_remembered_model_is_shared_with_new_instances(cache_path, clock):
+    ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).remember('x-2')
+
+    assert ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).get() == 'x-2'
+    # Entries are keyed on the base URL
+    assert ModelResolver('http://other/v1', CANDIDATES, cache_path, ttl=60).get() is None
+
+
+def test_persisted_model_expires_after_ttl(cache_path, clock):
+    ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).remember('x-2')
+
+    clock.now += 59
+    assert ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).get() == 'x-2'
+    clock.now += 2
+    assert ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).get() is None
+
+
+def test_persisted_model_outside_candidates_is_ignored(cache_path, clock):
+    ModelResolver(BASE_URL, ['retired-model'], cache_path, ttl=60).remember('retired-model')
+
+    assert ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60).get() is None
+
+
+def test_invalidate_only_drops_the_current_model(cache_path, clock):
+    resolver = ModelResolver(BASE_URL, CANDIDATES, cache_path, ttl=60)
+    resolver.remember('x-2')
+
+    resolver.invalidate('x-1')
+    assert resolver.get() == 'x-2'
+    assert os.path.exists(cache_path)
+
+    resolver.invalidate('x-2')
+    assert resolver.get() is None
+    assert not os.path.exists(cache_path)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('XAI_CACHE_PATH', str(tmp_path / 'completions.db'))
+    monkeypatch.setenv('XAI_MODEL_CACHE', str(tmp_path / 'model.json'))
+    monkeypatch.setenv('XAI_RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('XAI_CALL_LOG_ENABLED', '0')
+    client = XAIClient('test-token', BASE_URL)
+    yield client
+    client.close()
+
+
+def serve_models(client, available):
+    """
+    Answer 200 for the available models and 404 for the rest, recording which models were tried
+    """
+    tried = []
+
+    def post(model, prompt, *args, **kwargs):
+        tried.append(model)
+        if model in available:
+            return FakeResponse(200, f"reply from {model}")
+        return FakeResponse(404, f"The model {model} does not exist")
+
+    client.post_chat_completion = post
+    return tried
+
+
+def test_resolved_model_is_reused_without_probing(client):
+    client.resolver.remember('x-3')
+    tried = serve_models(client, {'x-3'})
+
+    assert client.chat_completion("hello", cache=False) == "reply from x-3"
+    assert client.chat_completion("hello again", cache=False) == "reply from x-3"
+    assert tried == ['x-3', 'x-3']
+
+
+def test_resolved_model_returning_404_triggers_a_reprobe(client):
+    client.resolver.remember('x-1')
+    tried = serve_models(client, {'x-2'})
+
+    assert client.chat_completion("hello", cache=False) == "reply from x-2"
+    # The stale model is tried once, then the candidates are probed in order
+    assert tried == ['x-1', 'x-1', 'x-2']
+    assert client.resolver.get() == 'x-2'
+    assert ModelResolver(client.base_url, CANDIDATES, client.resolver.cache_path).get() == 'x-2'
+
+    # The next call goes straight to the newly resolved model
+    tried.clear()
+    assert client.chat_completion("hello again", cache=False) == "reply from x-2"
+    assert tried == ['x-2']
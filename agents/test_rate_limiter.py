@@ -0,0 +1,105 @@
+"""
+Tests for the SQLite-backed token buckets and in-flight leases shared by every worker
+"""
+
+import multiprocessing
+
+import pytest
+
+from agents import rate_limiter
+from agents.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    return fake
+
+
+def make_limiter(tmp_path, **kwargs):
+    limits = {'requests_per_second': 0, 'tokens_per_minute': 0, 'max_in_flight': 0, 'lease_ttl': 300}
+    limits.update(kwargs)
+    return RateLimiter(path=str(tmp_path / 'rate_limit.db'), **limits)
+
+
+def test_request_bucket_refills_over_time(tmp_path, clock):
+    limiter = make_limiter(tmp_path, requests_per_second=2)
+    assert limiter.try_acquire(0)[0] is not None
+    assert limiter.try_acquire(0)[0] is not None
+    lease_id, wait = limiter.try_acquire(0)
+    assert lease_id is None and wait == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert limiter.try_acquire(0)[0] is not None
+
+
+def test_token_bucket_charges_cost_and_refunds_unused_tokens(tmp_path, clock):
+    limiter = make_limiter(tmp_path, tokens_per_minute=600, max_in_flight=10)
+    lease_id, _ = limiter.try_acquire(600)
+    lease, wait = limiter.try_acquire(60)
+    assert lease is None and wait == pytest.approx(6.0)
+
+    # Only 60 of the 600 estimated tokens were used: the rest goes back into the bucket
+    limiter.release(lease_id, cost=600, actual_tokens=60)
+    assert limiter.try_acquire(500)[0] is not None
+
+
+def test_acquire_sleeps_until_granted(tmp_path, clock):
+    limiter = make_limiter(tmp_path, requests_per_second=1)
+    limiter.acquire(0)
+    limiter.acquire(0)
+    assert clock.now == pytest.approx(1001.0)
+    assert limiter.get_stats()['throttled_waits'] == 1
+
+
+def test_lease_of_a_crashed_holder_expires(tmp_path, clock):
+    limiter = make_limiter(tmp_path, max_in_flight=1, lease_ttl=10)
+    assert limiter.try_acquire(0)[0] is not None  # Never released, as if its worker crashed
+    assert limiter.try_acquire(0) == (None, 0.05)
+
+    clock.now += 11
+    assert limiter.try_acquire(0)[0] is not None
+
+
+def test_backoff_blocks_every_caller_until_it_ends(tmp_path, clock):
+    limiter = make_limiter(tmp_path)
+    limiter.backoff(5)
+    lease_id, wait = make_limiter(tmp_path).try_acquire(0)
+    assert lease_id is None and wait == pytest.approx(5.0)
+    clock.now += 5
+    assert limiter.try_acquire(0)[0] is not None
+
+
+def _hold_lease(path, results):
+    # Runs in another process: take the only in-flight slot and exit without releasing it
+    limiter = RateLimiter(requests_per_second=0, tokens_per_minute=0, max_in_flight=1, path=path, lease_ttl=300)
+    lease_id, _ = limiter.try_acquire(0)
+    results.put(lease_id)
+
+
+def test_processes_share_the_in_flight_cap(tmp_path):
+    path = str(tmp_path / 'rate_limit.db')
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_hold_lease, args=(path, results))
+    process.start()
+    lease_id = results.get(timeout=30)
+    process.join(30)
+    assert lease_id.startswith(f"{process.pid}:")
+
+    limiter = RateLimiter(requests_per_second=0, tokens_per_minute=0, max_in_flight=1, path=path, lease_ttl=300)
+    assert limiter.try_acquire(0) == (None, 0.05)
+    limiter.release(lease_id)
+    assert limiter.try_acquire(0)[0] is not None
@@ -0,0 +1,122 @@
+"""
+Tests for coalescing identical in-flight requests
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.get_stats()['hits'] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+    stats = flight.get_stats()
+    assert (stats['hits'], stats['misses'], stats['in_flight']) == (3, 1, 0)
+    assert stats['coalesced_ratio'] == 0.75
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def failing():
+            await gate.wait()
+            raise ValueError("bad reply")
+
+        tasks = [asyncio.ensure_future(flight.async_do("k", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.get_stats()['hits'] == 2
+
+
+def test_cancelled_follower_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flight.async_do("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.async_do("k", slow))
+        await asyncio.sleep(0)
+        follower.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(run()) == "answer"
+
+
+def test_cancelled_leader_hands_the_call_to_a_follower():
+    flight = SingleFlight()
+    calls = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def slow():
+            calls.append(1)
+            await gate.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flight.async_do("k", slow))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.async_do("k", slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        # Both followers first joined the leader, then one rejoined the follower that took over
+        while flight.get_stats()['hits'] < 3:
+            await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(run()) == ["answer", "answer"]
+    # The first follower retried as the new leader; the second joined it
+    assert len(calls) == 2
+    assert flight.get_stats()['in_flight'] == 0
@@ -0,0 +1,51 @@
+"""
+Tests for tolerant JSON extraction and schema validation
+"""
+
+import pytest
+
+from agents.structured_output import StructuredOutputError, StructuredOutputParser, extract_json, schema_errors
+
+ROLES_SCHEMA = {
+    'type': 'array', 'minItems': 1,
+    'items': {'type': 'object', 'required': ['role'], 'properties': {'role': {'type': 'string', 'minLength': 1}}}
+}
+
+
+def test_extract_json_from_fence_prose_and_trailing_commas():
+    assert extract_json('```json\n{"a": 1}\n```') == {'a': 1}
+    assert extract_json('Here you go: [1, 2, 3] Hope that helps!') == [1, 2, 3]
+    assert extract_json('{"a": [1, 2,], "b": "x,}",}') == {'a': [1, 2], 'b': "x,}"}
+
+
+def test_extract_json_without_json_raises():
+    with pytest.raises(StructuredOutputError):
+        extract_json("No JSON here {")
+
+
+def test_schema_errors():
+    assert schema_errors([{'role': "Developer"}], ROLES_SCHEMA) == []
+    assert schema_errors([], ROLES_SCHEMA) == ["$: fewer than 1 items"]
+    assert schema_errors([{'name': "x"}], ROLES_SCHEMA) == ["$[0]: missing 'role'"]
+    assert schema_errors([{'role': " "}], ROLES_SCHEMA) == ["$[0].role: shorter than 1 characters"]
+    assert schema_errors({'n': True}, {'properties': {'n': {'type': 'integer'}}}) == ["$.n: expected integer"]
+
+
+def test_parser_counts_outcomes_per_prompt_type():
+    parser = StructuredOutputParser()
+    assert parser.parse('[{"role": "Developer"}]', ROLES_SCHEMA, 'suggest') == [{'role': "Developer"}]
+    assert parser.parse('```\n[{"role": "Designer"}]\n```', ROLES_SCHEMA, 'suggest') == [{'role': "Designer"}]
+    with pytest.raises(StructuredOutputError):
+        parser.parse("Sorry, I can't help with that.", ROLES_SCHEMA, 'suggest')
+    with pytest.raises(StructuredOutputError):
+        parser.parse('[{"name": "x"}]', ROLES_SCHEMA, 'suggest')
+
+    stats = parser.get_stats()['suggest']
+    assert (stats['calls'], stats['direct'], stats['repaired'], stats['invalid_json'], stats['schema_mismatch']) == \
+        (4, 1, 1, 1, 1)
+    assert stats['success_rate'] == 0.5
+
+
+def test_parser_unwraps_single_list_from_json_object_mode():
+    parser = StructuredOutputParser()
+    assert parser.parse('{"agents": [{"role": "Developer"}]}', ROLES_SCHEMA) == [{'role': "Developer"}]
@@ -0,0 +1,67 @@
+"""
+Tests for token estimation, budgets and prompt trimming
+"""
+
+from agents.token_budget import (
+    TokenBudgeter, compress_text, drop_item, estimate_tokens, parse_budget_overrides, shrink_field
+)
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi, there!") == 5
+    assert estimate_tokens("internationalization") == 5
+
+
+def test_compress_text_keeps_whole_leading_sentences():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    assert compress_text(text, 100) == text
+    assert compress_text(text, 12) == "First sentence here. Second sentence here."
+
+
+def test_compress_text_cuts_an_overlong_first_sentence_by_words():
+    result = compress_text("one two three four five six seven eight", 5)
+    assert result == "one two three…"
+
+
+def test_parse_budget_overrides_skips_invalid_items():
+    overrides = parse_budget_overrides("analysis=1000:200, bogus, summary=x:1")
+    assert overrides == {'analysis': (1000, 200)}
+
+
+def test_env_overrides_and_unknown_types_fall_back_to_general(monkeypatch):
+    monkeypatch.setenv('XAI_TOKEN_BUDGETS', 'analysis=10:20')
+    budgeter = TokenBudgeter({'summary': (5, 6)})
+    assert (budgeter.input_budget('analysis'), budgeter.output_budget('analysis')) == (10, 20)
+    assert budgeter.input_budget('summary') == 5
+    assert budgeter.input_budget('unknown') == budgeter.input_budget('general')
+
+
+def test_fit_exhausts_reducers_in_order():
+    budgeter = TokenBudgeter({'general': (10, 100)})
+    state = {'history': ["alpha beta", "gamma delta", "epsilon zeta"], 'task': "Do the thing."}
+
+    def render():
+        return " ".join(state['history']) + " " + state['task']
+
+    prompt = budgeter.fit('general', render, [drop_item(state['history'], keep=1), shrink_field(state, 'task')])
+    assert state['history'] == ["epsilon zeta"]
+    assert state['task'] == "Do the thing."
+    assert estimate_tokens(prompt) <= 10
+    assert budgeter.get_stats()['usage']['general']['trimmed'] == 1
+
+
+def test_fit_leaves_prompts_within_budget_untouched():
+    budgeter = TokenBudgeter()
+    assert budgeter.fit('general', lambda: "short prompt", [drop_item([1, 2])]) == "short prompt"
+    assert 'general' not in budgeter.get_stats()['usage']
+
+
+def test_record_tracks_estimates_and_provider_usage():
+    budgeter = TokenBudgeter()
+    budgeter.record('analysis', "hi there", "ok", {'prompt_tokens': 7, 'completion_tokens': None})
+    budgeter.record('analysis', "hi", "ok")
+    usage = budgeter.get_stats()['usage']['analysis']
+    assert usage['calls'] == 2
+    assert usage['input_tokens_est'] == 4
+    assert (usage['prompt_tokens'], usage['completion_tokens']) == (7, 0)
@@ -0,0 +1,152 @@
+"""
+Tests for XAIClient: completion caching and the cache opt-out, and call metrics
+"""
+
+import asyncio
+
+import pytest
+
+from agents.structured_output import StructuredOutputError
+from agents.xai_client import XAIClient
+
+SCHEMA = {'type': 'array', 'minItems': 1, 'items': {'type': 'object', 'required': ['role']}}
+MALFORMED = "Sure! Here are some roles you could use."
+GOOD = '[{"role": "Developer"}]'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('XAI_CACHE_PATH', str(tmp_path / 'completions.db'))
+    monkeypatch.setenv('XAI_MODEL_CACHE', str(tmp_path / 'model.json'))
+    monkeypatch.setenv('XAI_RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('XAI_CALL_LOG_ENABLED', '0')
+    client = XAIClient('test-token', 'http://127.0.0.1:9/v1')
+    yield client
+    client.close()
+
+
+def scripted(client, replies):
+    """
+    Answer each API call with the next reply, counting the calls
+    """
+    calls = []
+
+    def complete(prompt, *args):
+        calls.append(prompt)
+        return replies[len(calls) - 1]
+
+    async def async_complete(prompt, *args):
+        return complete(prompt, *args)
+
+    client._guarded_complete = complete
+    client._async_guarded_complete = async_complete
+    return calls
+
+
+def test_malformed_reply_is_not_cached(client):
+    calls = scripted(client, [MALFORMED, GOOD])
+
+    with pytest.raises(StructuredOutputError):
+        client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest')
+    assert client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest') == [{'role': 'Developer'}]
+    assert len(calls) == 2
+
+    # The good reply is cached
+    assert client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest') == [{'role': 'Developer'}]
+    assert len(calls) == 2
+    assert client.cache.get_stats()['stores'] == 1
+
+
+def test_async_malformed_reply_is_not_cached(client):
+    calls = scripted(client, [MALFORMED, GOOD])
+
+    async def run():
+        with pytest.raises(StructuredOutputError):
+            await client.async_structured_completion("suggest roles", SCHEMA, prompt_type='suggest')
+        return await client.async_structured_completion("suggest roles", SCHEMA, prompt_type='suggest')
+
+    assert asyncio.run(run()) == [{'role': 'Developer'}]
+    assert len(calls) == 2
+
+
+def test_malformed_entry_already_in_cache_is_evicted(client):
+    calls = scripted(client, [GOOD])
+    key = client._cache_key("suggest roles", client.budgeter.output_budget('suggest'), 0.7, None, None)
+    client.cache.set(key, MALFORMED)
+
+    assert client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest') == [{'role': 'Developer'}]
+    assert len(calls) == 1
+    assert client.cache.get(key) == GOOD
+
+
+def test_structured_callers_get_their_own_copy(client):
+    scripted(client, [GOOD])
+    first = client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest')
+    first[0]['role'] = "Changed"
+    assert client.structured_completion("suggest roles", SCHEMA, prompt_type='suggest') == [{'role': 'Developer'}]
+
+
+def test_identical_prompts_are_served_from_cache(client):
+    calls = scripted(client, ["first", "second"])
+
+    assert client.chat_completion("hello") == "first"
+    assert client.chat_completion("hello") == "first"
+    assert asyncio.run(client.async_chat_completion("hello")) == "first"
+    assert len(calls) == 1
+
+
+def test_cache_opt_out_always_calls_the_api(client):
+    calls = scripted(client, ["first", "second", "third"])
+    client.chat_completion("hello")
+
+    assert client.chat_completion("hello", cache=False) == "second"
+    assert asyncio.run(client.async_chat_completion("hello", cache=False)) == "third"
+    assert len(calls) == 3
+    # Opted-out replies are neither read from nor written to the cache
+    stats = client.cache.get_stats()
+    assert stats['stores'] == 1
+    assert stats['memory_hits'] + stats['disk_hits'] == 0
+
+
+def test_closed_stream_is_recorded_as_cancelled(client):
+    def deltas(*args):
+        yield from ["Hello", " there", "!"]
+
+    client._stream = deltas
+    stream = client.stream_chat_completion("hi", prompt_type='agent_response')
+    assert next(stream) == "Hello"
+    stream.close()
+
+    stats = client.metrics.get_stats()['by_prompt_type']['agent_response']
+    assert (stats['calls'], stats['cancelled'], stats['errors'], stats['fallbacks']) == (1, 1, 0, 0)
+
+
+def test_cancelled_async_call_is_not_an_error(client):
+    async def never_answers(*args):
+        await asyncio.sleep(60)
+
+    client._async_complete = never_answers
+
+    async def run():
+        task = asyncio.ensure_future(client._async_guarded_complete("hi", 10, 0.7, prompt_type='analysis'))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    stats = client.metrics.get_stats()['by_prompt_type']['analysis']
+    assert (stats['cancelled'], stats['errors']) == (1, 0)
+    assert client.breaker.get_state()['consecutive_failures'] == 0
+
+
+def test_failed_stream_is_still_an_error(client):
+    def failing(*args):
+        yield "partial"
+        raise ValueError("connection reset")
+
+    client._stream = failing
+    with pytest.raises(ValueError):
+        list(client.stream_chat_completion("hi", prompt_type='summary'))
+    stats = client.metrics.get_stats()['by_prompt_type']['summary']
+    assert (stats['errors'], stats['cancelled']) == (1, 0)
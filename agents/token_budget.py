@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Token Budget
+Local token estimation, per-prompt-type input/output budgets and deterministic prompt trimming
+"""
+
+import os
+import re
+import math
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+# (input budget, output budget) in tokens
+DEFAULT_BUDGETS = {
+    'personality': (300, 350),
+    'agent_response': (900, 350),
+    'analysis': (1200, 300),
+    'conclusion': (600, 500),
+    'summary': (900, 350),
+    'parse': (700, 400),
+    'batched_exchange': (2400, 2000),
+    'suggest': (300, 600),
+    'validate': (200, 400),
+    'general': (2000, 500),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap BPE-like estimate: one token per punctuation mark, and one per ~4 characters of each word
+    """
+    if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def compress_text(text: str, max_tokens: int) -> str:
+    """
+    Keep whole leading sentences that fit in max_tokens; cut the first sentence by words if it alone is too long
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_PATTERN.split(text.strip()):
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+
+    words = []
+    used = 1  # room for the ellipsis
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words) + "…"
+
+
+def shrink_field(state: Dict, key: str, max_tokens: int = None, floor: int = 20) -> Callable[[], bool]:
+    """
+    Reducer that compresses state[key] to max_tokens in one step, or halves it per step when max_tokens is None
+    """
+    def reduce() -> bool:
+        tokens = estimate_tokens(state[key])
+        target = max_tokens if max_tokens is not None else max(floor, tokens // 2)
+        if tokens <= target or tokens <= floor:
+            return False
+        state[key] = compress_text(state[key], target)
+        return True
+    return reduce
+
+
+def shrink_longest(texts: List[str], floor: int = 40) -> Callable[[], bool]:
+    """
+    Reducer that halves the longest text in the list per step
+    """
+    def reduce() -> bool:
+        if not texts:
+            return False
+        index = max(range(len(texts)), key=lambda i: estimate_tokens(texts[i]))
+        tokens = estimate_tokens(texts[index])
+        if tokens <= floor:
+            return False
+        texts[index] = compress_text(texts[index], max(floor, tokens // 2))
+        return True
+    return reduce
+
+
+def drop_item(items: List, index: int = 0, keep: int = 0) -> Callable[[], bool]:
+    """
+    Reducer that removes items[index] per step (the oldest by default) while more than keep remain
+    """
+    def reduce() -> bool:
+        if len(items) <= keep:
+            return False
+        items.pop(index)
+        return True
+    return reduce
+
+
+def parse_budget_overrides(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse 'agent_response=900:350,analysis=1200:300' into budget overrides
+    """
+    overrides = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        prompt_type, _, values = item.partition('=')
+        input_budget, _, output_budget = values.partition(':')
+        try:
+            overrides[prompt_type.strip()] = (int(input_budget), int(output_budget))
+        except ValueError:
+            print(f"Warning: ignoring invalid token budget '{item}'")
+    return overrides
+
+
+class TokenBudgeter:
+    """
+    Holds per-prompt-type budgets, trims prompts to fit them and records per-call token counts
+    """
+
+    def __init__(self, budgets: Dict[str, Tuple[int, int]] = None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(parse_budget_overrides(os.getenv('XAI_TOKEN_BUDGETS', '')))
+        if budgets:
+            self.budgets.update(budgets)
+
+        self._lock = threading.Lock()
+        self.usage = defaultdict(lambda: {
+            'calls': 0, 'input_tokens_est': 0, 'output_tokens_est': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'trimmed': 0
+        })
+
+    def input_budget(self, prompt_type: str) -> int:
+        return self.budgets.get(prompt_type, self.budgets['general'])[0]
+
+    def output_budget(self, prompt_type: str) -> int:
+        return self.budgets.get(prompt_type, self.budgets['general'])[1]
+
+    def fit(self, prompt_type: str, render: Callable[[], str], reducers: List[Callable[[], bool]]) -> str:
+        """
+        Render the prompt, applying reducers in order until it fits the input budget.
+        Each reducer performs one trimming step on the caller's state and returns False once it has
+        nothing left to trim, so earlier reducers are exhausted before later ones run.
+        """
+        budget = self.input_budget(prompt_type)
+        prompt = render()
+        trimmed = False
+        for reducer in reducers:
+            while estimate_tokens(prompt) > budget and reducer():
+                prompt = render()
+                trimmed = True
+        if trimmed:
+            with self._lock:
+                self.usage[prompt_type]['trimmed'] += 1
+        return prompt
+
+    def record(self, prompt_type: str, prompt: str, completion: str, actual: Optional[Dict] = None):
+        """
+        Record one call's token counts: local estimates always, provider-reported usage when available
+        """
+        with self._lock:
+            entry = self.usage[prompt_type]
+            entry['calls'] += 1
+            entry['input_tokens_est'] += estimate_tokens(prompt)
+            entry['output_tokens_est'] += estimate_tokens(completion)
+            if actual:
+                entry['prompt_tokens'] += actual.get('prompt_tokens') or 0
+                entry['completion_tokens'] += actual.get('completion_tokens') or 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'budgets': {k: {'input': v[0], 'output': v[1]} for k, v in self.budgets.items()},
+                'usage': {k: dict(v) for k, v in self.usage.items()}
+            }
@@ -0,0 +1,1008 @@
+#!/usr/bin/env python3
+"""
+XAI Client
+Shared, thread-safe client for the XAI chat/completions API with a keep-alive connection pool
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import threading
+import weakref
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait as futures_wait
+from contextlib import nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Async HTTP client (optional - async calls run the pooled sync client in a worker thread without it)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from .model_resolver import ModelResolver
+from .completion_cache import CompletionCache
+from .rate_limiter import RateLimiter, estimate_request_tokens
+from .circuit_breaker import CircuitBreaker
+from .hedging import HedgingPolicy
+from .single_flight import SingleFlight
+from .token_budget import TokenBudgeter, estimate_tokens
+from .structured_output import StructuredOutputParser, StructuredOutputError
+from .call_metrics import CallMetrics
+
+load_dotenv()
+
+DEFAULT_BASE_URL = "https://api.x.ai/v1"
+DEFAULT_MODELS = ["x-1", "x-2", "x-3", "grok-beta"]
+
+# Provider-reported token usage of the call in progress, filled in by XAIClient._completion_text
+_call_usage: contextvars.ContextVar = contextvars.ContextVar('xai_call_usage', default=None)
+# Attempts, last model and HTTP status of the call in progress, filled in per request
+_call_trace: contextvars.ContextVar = contextvars.ContextVar('xai_call_trace', default=None)
+
+
+def configured_base_url() -> str:
+    """
+    XAI_BASE_URL points the agents at another XAI-compatible server (e.g. agents/local_xai_server.py)
+    """
+    return os.getenv('XAI_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
+
+
+def configured_api_token() -> Optional[str]:
+    """
+    The XAI token; a stand-in server does not check it, so a placeholder is used when none is set
+    """
+    token = os.getenv('XAI_API_TOKEN')
+    if not token and configured_base_url() != DEFAULT_BASE_URL:
+        token = 'local-stand-in'
+    return token
+
+
+class XAIAPIError(Exception):
+    """Raised when the XAI API returns an error or cannot be reached"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class XAICircuitOpenError(XAIAPIError):
+    """Raised without touching the network while the circuit breaker is open"""
+
+
+def is_outage_error(error: XAIAPIError) -> bool:
+    """
+    Errors that say the API is unusable right now (network, auth, missing models, overload),
+    as opposed to a problem with one particular request
+    """
+    status = error.status_code
+    return status is None or status in (401, 403, 404, 408, 429) or status >= 500
+
+
+class XAIClient:
+    """
+    Pooled HTTP client for the XAI API.
+    One instance is shared by every agent class in the process (see get_xai_client).
+    """
+
+    def __init__(self, api_token: str, base_url: str = DEFAULT_BASE_URL,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 pool_size: int = None):
+        self.api_token = api_token
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.getenv('XAI_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = read_timeout if read_timeout is not None else float(os.getenv('XAI_READ_TIMEOUT', '60'))
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv('XAI_POOL_SIZE', '10'))
+
+        # Keep-alive session; retries are handled by the callers' fallback logic
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json"
+        })
+
+        self.resolver = ModelResolver(self.base_url, DEFAULT_MODELS)
+        self.cache = CompletionCache() if os.getenv('XAI_CACHE_ENABLED', '1') != '0' else None
+        self.limiter = RateLimiter() if os.getenv('XAI_RATE_LIMIT_ENABLED', '1') != '0' else None
+        self.breaker = CircuitBreaker()
+        self.hedging = HedgingPolicy()
+        self.single_flight = SingleFlight()
+        self.budgeter = TokenBudgeter()
+        self.structured = StructuredOutputParser()
+        self.metrics = CallMetrics()
+        # Ask the provider for a JSON response format on structured calls
+        self.json_mode = os.getenv('XAI_JSON_MODE', '0') == '1'
+        self._executor = None
+        self._hedge_lock = threading.Lock()
+
+        # One httpx.AsyncClient per event loop; an AsyncClient cannot be shared across loops
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def warm_up(self, connections: int = None):
+        """
+        Pre-open pooled connections so the first real calls skip the TCP+TLS handshake
+        """
+        if connections is None:
+            connections = int(os.getenv('XAI_WARM_CONNECTIONS', '2'))
+        connections = min(connections, self.pool_size)
+
+        def _open():
+            try:
+                self.session.get(f"{self.base_url}/models", timeout=self.timeout)
+            except requests.RequestException:
+                pass
+
+        # Concurrent requests force the pool to hold several open sockets
+        threads = [threading.Thread(target=_open, daemon=True) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def post_chat_completion(self, model: str, prompt: str, max_tokens: int = 500,
+                             temperature: float = 0.7, stream: bool = False,
+                             response_format: Dict = None) -> requests.Response:
+        """
+        Send a single chat/completions request for one model
+        """
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if response_format:
+            data["response_format"] = response_format
+        if stream:
+            # Streaming callers hold the rate-limit slot for the whole body themselves
+            data["stream"] = True
+            return self._send(data, stream=True)
+
+        with self._rate_limited(estimate_request_tokens(prompt, max_tokens)) as usage:
+            response = self._send(data)
+            self._note_attempt(model, response.status_code)
+            self._record_usage(response, usage)
+            return response
+
+    def _send(self, data: Dict, stream: bool = False) -> requests.Response:
+        try:
+            return self.session.post(f"{self.base_url}/chat/completions", json=data,
+                                     timeout=self.timeout, stream=stream)
+        except requests.RequestException as e:
+            raise XAIAPIError(f"XAI API request failed: {e}")
+
+    def _note_attempt(self, model: str, status_code: int):
+        trace = _call_trace.get()
+        if trace is not None:
+            trace['attempts'] = trace.get('attempts', 0) + 1
+            trace['model'] = model
+            trace['http_status'] = status_code
+
+    def _rate_limited(self, cost: int):
+        return self.limiter.slot(cost) if self.limiter else nullcontext({})
+
+    def _async_rate_limited(self, cost: int):
+        return self.limiter.async_slot(cost) if self.limiter else nullcontext({})
+
+    def _record_usage(self, response, usage: Dict):
+        """
+        Feed the real token count back to the limiter, or pause all workers on 429
+        """
+        if not self.limiter:
+            return
+        if response.status_code == 200:
+            try:
+                usage['actual_tokens'] = response.json().get('usage', {}).get('total_tokens')
+            except ValueError:
+                pass
+        elif response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After', '1'))
+            except ValueError:
+                retry_after = 1.0
+            self.limiter.backoff(retry_after)
+
+    async def _async_record_usage(self, response, usage: Dict):
+        """
+        Async counterpart of _record_usage; the 429 backoff writes to SQLite, so it runs off the event loop
+        """
+        if self.limiter and response.status_code == 429:
+            await asyncio.to_thread(self._record_usage, response, usage)
+        else:
+            self._record_usage(response, usage)
+
+    def chat_completion(self, prompt: str, max_tokens: int = None, temperature: float = 0.7,
+                        models: List[str] = None, cache: bool = True, prompt_type: str = 'general',
+                        response_format: Dict = None) -> str:
+        """
+        Return the completion text.
+        With an explicit model list, try each name in order; otherwise use the resolved model.
+        Pass cache=False for prompts whose answer must stay fresh; cacheable prompts are also
+        coalesced with identical in-flight requests. prompt_type selects per-type policies such as
+        hedging and the output token budget used when max_tokens is not given.
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        if not cache:
+            return self._guarded_complete(prompt, max_tokens, temperature, models, prompt_type, response_format)
+        return self._cached_completion(prompt, max_tokens, temperature, models, prompt_type, response_format)
+
+    def structured_completion(self, prompt: str, schema: Dict, max_tokens: int = None, temperature: float = 0.7,
+                              models: List[str] = None, cache: bool = True, prompt_type: str = 'general'):
+        """
+        Return the JSON value of a completion, validated against schema.
+        Raises StructuredOutputError when the completion holds no matching JSON.
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        response_format = self._response_format()
+
+        def parse(text: str):
+            return self._parse_structured(text, schema, prompt_type)
+
+        if not cache:
+            return parse(self._guarded_complete(prompt, max_tokens, temperature, models, prompt_type,
+                                                response_format))
+        # Coalesced callers share the leader's value; each gets its own copy to mutate
+        return copy.deepcopy(self._cached_completion(prompt, max_tokens, temperature, models, prompt_type,
+                                                     response_format, parse))
+
+    def _cached_completion(self, prompt: str, max_tokens: int, temperature: float, models: Optional[List[str]],
+                           prompt_type: str, response_format: Optional[Dict],
+                           parse: Callable[[str], object] = None):
+        """
+        Serve a completion from the cache or from one call shared with identical in-flight requests.
+        With parse, return parse(text) and cache only text that parses, so a malformed reply is
+        retried by the next identical prompt instead of being replayed for the cache TTL.
+        """
+        key = self._cache_key(prompt, max_tokens, temperature, models, response_format)
+        if self.cache is not None:
+            started = time.monotonic()
+            cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    value = parse(cached) if parse else cached
+                except StructuredOutputError:
+                    # Stored before it was validated; drop it and ask again
+                    self.cache.delete(key)
+                else:
+                    self.metrics.record(prompt_type, 'cache_hit', time.monotonic() - started)
+                    return value
+
+        def _call():
+            text = self._guarded_complete(prompt, max_tokens, temperature, models, prompt_type, response_format)
+            value = parse(text) if parse else text
+            if self.cache is not None:
+                # Recompute the key: the first call may just have resolved the model
+                self.cache.set(self._cache_key(prompt, max_tokens, temperature, models, response_format), text)
+            return value
+
+        # Parsed and raw callers of the same prompt must not share a result
+        return self.single_flight.do(key if parse is None else f"{key}:structured", _call)
+
+    def _parse_structured(self, text: str, schema: Dict, prompt_type: str):
+        try:
+            return self.structured.parse(text, schema, prompt_type)
+        except StructuredOutputError:
+            self.metrics.record_fallback(prompt_type)
+            raise
+
+    def _response_format(self) -> Optional[Dict]:
+        return {"type": "json_object"} if self.json_mode else None
+
+    def _check_breaker(self):
+        if not self.breaker.allow_request():
+            raise XAICircuitOpenError("XAI API circuit open - using fallback responses")
+
+    def _record_outcome(self, error: Optional[Exception] = None):
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, XAIAPIError) and is_outage_error(error):
+            self.breaker.record_failure(error)
+        else:
+            # A request-specific error says nothing about API health
+            self.breaker.release_probe()
+
+    def _guarded_complete(self, prompt: str, max_tokens: int, temperature: float, models: List[str] = None,
+                          prompt_type: str = 'general', response_format: Dict = None) -> str:
+        """
+        Run _complete behind the circuit breaker, hedging slow calls when the policy allows,
+        and record the call's token counts and metrics
+        """
+        started = time.monotonic()
+        self._check_breaker_for(prompt_type, started)
+        usage, trace = {}, {}
+        reset, reset_trace = _call_usage.set(usage), _call_trace.set(trace)
+        try:
+            text = self._hedged(lambda: self._complete(prompt, max_tokens, temperature, models, response_format),
+                                prompt_type)
+        except Exception as e:
+            self._record_outcome(e)
+            self._record_call(prompt_type, started, prompt, None, usage, trace, e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedge loser or an abandoned request): no verdict on the API
+            self.breaker.release_probe()
+            self._record_call(prompt_type, started, prompt, None, usage, trace, status='cancelled')
+            raise
+        finally:
+            _call_usage.reset(reset)
+            _call_trace.reset(reset_trace)
+        self._record_outcome()
+        self.budgeter.record(prompt_type, prompt, text, usage)
+        self._record_call(prompt_type, started, prompt, text, usage, trace)
+        return text
+
+    def _check_breaker_for(self, prompt_type: str, started: float):
+        try:
+            self._check_breaker()
+        except XAICircuitOpenError as e:
+            self.metrics.record(prompt_type, 'circuit_open', time.monotonic() - started, error=str(e))
+            raise
+
+    def _record_call(self, prompt_type: str, started: float, prompt: str, text: Optional[str], usage: Dict,
+                     trace: Dict, error: Optional[Exception] = None, status: str = None):
+        """
+        Feed one finished call to the metrics; provider-reported tokens win over local estimates.
+        status defaults to 'ok', or 'error' with an error.
+        """
+        estimated = not usage.get('prompt_tokens')
+        self.metrics.record(
+            prompt_type, status or ('ok' if error is None else 'error'), time.monotonic() - started,
+            model=trace.get('model'), http_status=getattr(error, 'status_code', None) or trace.get('http_status'),
+            attempts=trace.get('attempts', 0), hedged=trace.get('hedged', False),
+            prompt_tokens=estimate_tokens(prompt) if estimated else usage['prompt_tokens'],
+            completion_tokens=(estimate_tokens(text or "") if estimated else usage.get('completion_tokens') or 0),
+            tokens_estimated=estimated, error=str(error) if error is not None else None
+        )
+
+    def _timed(self, call: Callable[[], str], prompt_type: str) -> str:
+        started = time.monotonic()
+        text = call()
+        self.hedging.record_latency(prompt_type, time.monotonic() - started)
+        return text
+
+    def _hedged(self, call: Callable[[], str], prompt_type: str) -> str:
+        """
+        Run call; if it is slower than the rolling p90 for its prompt type, fire a duplicate
+        and return whichever answers first
+        """
+        delay = self.hedging.hedge_delay(prompt_type)
+        if delay is None:
+            return self._timed(call, prompt_type)
+
+        # The caller must stay free to take the backup's answer, so the primary gets its own thread;
+        # only backups go through the shared hedge pool and never delay a primary request
+        primary = self._spawn(self._timed, call, prompt_type)
+        done, _ = futures_wait([primary], timeout=delay)
+        if done or not self.hedging.try_spend():
+            return primary.result()
+
+        # The slower request cannot be cancelled mid-flight; it finishes in the background
+        self._note_hedge()
+        backup = self._hedge_executor().submit(contextvars.copy_context().run, self._timed, call, prompt_type)
+        first_error = None
+        for future in as_completed([primary, backup]):
+            if future.exception() is None:
+                if future is backup:
+                    self.hedging.record_hedge_win()
+                return future.result()
+            first_error = first_error or future.exception()
+        raise first_error
+
+    def _hedged_stream(self, open_stream: Callable[[], Iterator[str]], prompt_type: str,
+                       trace: Dict) -> Iterator[str]:
+        """
+        Streaming counterpart of _hedged, hedged on time to first token.
+        Nothing is yielded until a winner has produced its first delta, and the losing stream is closed.
+        """
+        if not self.hedging.enabled_for(prompt_type):
+            yield from open_stream()
+            return
+
+        delay = self.hedging.hedge_delay(prompt_type, first_token=True)
+        if delay is None:
+            stream, first = self._first_delta(open_stream, prompt_type)
+        else:
+            primary = self._spawn(self._first_delta, open_stream, prompt_type)
+            done, _ = futures_wait([primary], timeout=delay)
+            if done or not self.hedging.try_spend():
+                stream, first = primary.result()
+            else:
+                self._note_hedge(trace)
+                trace['attempts'] += 1
+                backup = self._hedge_executor().submit(
+                    contextvars.copy_context().run, self._first_delta, open_stream, prompt_type)
+                stream, first = self._first_winner(primary, backup)
+
+        if first is None:
+            return
+        try:
+            yield first
+            yield from stream
+        finally:
+            stream.close()
+
+    def _first_winner(self, primary: Future, backup: Future) -> Tuple[Iterator[str], Optional[str]]:
+        first_error = None
+        for future in as_completed([primary, backup]):
+            if future.exception() is None:
+                if future is backup:
+                    self.hedging.record_hedge_win()
+                # The loser may still be waiting for its first token; close it once it has one
+                loser = primary if future is backup else backup
+                loser.add_done_callback(_close_first_delta_stream)
+                return future.result()
+            first_error = first_error or future.exception()
+        raise first_error
+
+    def _first_delta(self, open_stream: Callable[[], Iterator[str]],
+                     prompt_type: str) -> Tuple[Iterator[str], Optional[str]]:
+        """
+        Open a stream and wait for its first delta, recording the time to first token
+        """
+        started = time.monotonic()
+        stream = open_stream()
+        first = next(stream, None)
+        self.hedging.record_latency(prompt_type, time.monotonic() - started, first_token=True)
+        return stream, first
+
+    def _spawn(self, fn: Callable, *args) -> Future:
+        """
+        Run fn on a dedicated thread in a copy of the caller's context, so usage reaches the caller's sink
+        """
+        future = Future()
+        context = contextvars.copy_context()
+
+        def _run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(context.run(fn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=_run, name="xai-hedge-primary", daemon=True).start()
+        return future
+
+    def _note_hedge(self, trace: Dict = None):
+        if trace is None:
+            trace = _call_trace.get()
+        if trace is not None:
+            trace['hedged'] = True
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size * 2, thread_name_prefix="xai-hedge")
+            return self._executor
+
+    def _cache_key(self, prompt: str, max_tokens: int, temperature: float, models: List[str] = None,
+                   response_format: Dict = None) -> str:
+        if models is not None:
+            model = ",".join(models)
+        else:
+            model = self.resolver.get() or ",".join(self.resolver.candidates)
+        return CompletionCache.make_key(model, prompt, max_tokens, temperature, response_format)
+
+    def _complete(self, prompt: str, max_tokens: int, temperature: float, models: List[str] = None,
+                  response_format: Dict = None) -> str:
+        if models is not None:
+            return self._try_models(models, prompt, max_tokens, temperature, response_format=response_format)
+
+        model = self.resolver.get()
+        if model:
+            response = self.post_chat_completion(model, prompt, max_tokens, temperature, response_format=response_format)
+            if response.status_code != 404:
+                return self._completion_text(response)
+            # Cached model disappeared, fall through to a fresh probe
+            self.resolver.invalidate(model)
+
+        with self.resolver.probe_lock:
+            # Another thread may have finished probing while we waited
+            model = self.resolver.get()
+            if model:
+                response = self.post_chat_completion(model, prompt, max_tokens, temperature,
+                                                     response_format=response_format)
+                if response.status_code != 404:
+                    return self._completion_text(response)
+                self.resolver.invalidate(model)
+            return self._try_models(self.resolver.candidates, prompt, max_tokens, temperature, remember=True,
+                                    response_format=response_format)
+
+    def _try_models(self, models: List[str], prompt: str, max_tokens: int, temperature: float,
+                    remember: bool = False, response_format: Dict = None) -> str:
+        for model in models:
+            response = self.post_chat_completion(model, prompt, max_tokens, temperature,
+                                                 response_format=response_format)
+
+            if response.status_code == 404:
+                # Model not found, try next one
+                continue
+            text = self._completion_text(response)
+            if remember:
+                self.resolver.remember(model)
+            return text
+
+        # If all models fail, raise an exception to trigger fallback responses
+        raise XAIAPIError("XAI API not available - using fallback responses", 404)
+
+    def stream_chat_completion(self, prompt: str, max_tokens: int = None, temperature: float = 0.7,
+                               models: List[str] = None, prompt_type: str = 'general') -> Iterator[str]:
+        """
+        Yield completion text deltas as the server produces them (stream: true).
+        Streamed completions are never cached.
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        started = time.monotonic()
+        self._check_breaker_for(prompt_type, started)
+        parts = []
+        trace = {'attempts': 1}
+        try:
+            for delta in self._hedged_stream(lambda: self._stream(prompt, max_tokens, temperature, models),
+                                             prompt_type, trace):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self._record_outcome(e)
+            self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace, e)
+            raise
+        except BaseException:
+            # The consumer stopped reading (GeneratorExit) or was cancelled: not a failed call
+            self.breaker.release_probe()
+            self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace, status='cancelled')
+            raise
+        self._record_outcome()
+        self.budgeter.record(prompt_type, prompt, "".join(parts))
+        self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace)
+
+    def _stream(self, prompt: str, max_tokens: int, temperature: float, models: List[str] = None) -> Iterator[str]:
+        resolved = self.resolver.get() if models is None else None
+        candidates = models if models is not None else ([resolved] if resolved else self.resolver.candidates)
+
+        for model in candidates:
+            with self._rate_limited(estimate_request_tokens(prompt, max_tokens)) as usage:
+                response = self.post_chat_completion(model, prompt, max_tokens, temperature, stream=True)
+
+                if response.status_code == 404:
+                    response.close()
+                    reprobe = bool(resolved) and model == resolved
+                else:
+                    if response.status_code != 200:
+                        self._record_usage(response, usage)
+                        raise XAIAPIError(f"XAI API error: {response.status_code} - {response.text}", response.status_code)
+
+                    if models is None:
+                        self.resolver.remember(model)
+                    with response:
+                        try:
+                            yield from iter_sse_deltas(response.iter_lines(decode_unicode=True))
+                        except requests.RequestException as e:
+                            raise XAIAPIError(f"XAI API stream interrupted: {e}")
+                    return
+
+            if reprobe:
+                # Cached model disappeared, re-probe the full candidate list
+                self.resolver.invalidate(model)
+                yield from self._stream(prompt, max_tokens, temperature, models)
+                return
+
+        raise XAIAPIError("XAI API not available - using fallback responses", 404)
+
+    def _completion_text(self, response: requests.Response) -> str:
+        if response.status_code == 200:
+            payload = response.json()
+            usage = _call_usage.get()
+            if usage is not None:
+                usage.update(payload.get('usage') or {})
+            return payload["choices"][0]["message"]["content"]
+        raise XAIAPIError(f"XAI API error: {response.status_code} - {response.text}", response.status_code)
+
+    def _get_async_http(self) -> "httpx.AsyncClient":
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.pool_size)
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def async_post_chat_completion(self, model: str, prompt: str, max_tokens: int = 500,
+                                         temperature: float = 0.7, response_format: Dict = None) -> "httpx.Response":
+        """
+        Async counterpart of post_chat_completion
+        """
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if response_format:
+            data["response_format"] = response_format
+        async with self._async_rate_limited(estimate_request_tokens(prompt, max_tokens)) as usage:
+            try:
+                response = await self._get_async_http().post(f"{self.base_url}/chat/completions", json=data)
+            except httpx.HTTPError as e:
+                raise XAIAPIError(f"XAI API request failed: {e}")
+            self._note_attempt(model, response.status_code)
+            await self._async_record_usage(response, usage)
+            return response
+
+    async def async_chat_completion(self, prompt: str, max_tokens: int = None, temperature: float = 0.7,
+                                    models: List[str] = None, cache: bool = True,
+                                    prompt_type: str = 'general', response_format: Dict = None) -> str:
+        """
+        Async counterpart of chat_completion; shares the resolved model, the completion cache
+        and request coalescing
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        if not cache:
+            return await self._async_guarded_complete(prompt, max_tokens, temperature, models, prompt_type,
+                                                      response_format)
+        return await self._async_cached_completion(prompt, max_tokens, temperature, models, prompt_type,
+                                                   response_format)
+
+    async def async_structured_completion(self, prompt: str, schema: Dict, max_tokens: int = None,
+                                          temperature: float = 0.7, models: List[str] = None, cache: bool = True,
+                                          prompt_type: str = 'general'):
+        """
+        Async counterpart of structured_completion
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        response_format = self._response_format()
+
+        def parse(text: str):
+            return self._parse_structured(text, schema, prompt_type)
+
+        if not cache:
+            return parse(await self._async_guarded_complete(prompt, max_tokens, temperature, models, prompt_type,
+                                                            response_format))
+        return copy.deepcopy(await self._async_cached_completion(prompt, max_tokens, temperature, models,
+                                                                 prompt_type, response_format, parse))
+
+    async def _async_cached_completion(self, prompt: str, max_tokens: int, temperature: float,
+                                       models: Optional[List[str]], prompt_type: str,
+                                       response_format: Optional[Dict], parse: Callable[[str], object] = None):
+        """
+        Async counterpart of _cached_completion
+        """
+        key = self._cache_key(prompt, max_tokens, temperature, models, response_format)
+        if self.cache is not None:
+            started = time.monotonic()
+            cached = await self.cache.async_get(key)
+            if cached is not None:
+                try:
+                    value = parse(cached) if parse else cached
+                except StructuredOutputError:
+                    await self.cache.async_delete(key)
+                else:
+                    self.metrics.record(prompt_type, 'cache_hit', time.monotonic() - started)
+                    return value
+
+        async def _call():
+            text = await self._async_guarded_complete(prompt, max_tokens, temperature, models, prompt_type,
+                                                      response_format)
+            value = parse(text) if parse else text
+            if self.cache is not None:
+                await self.cache.async_set(self._cache_key(prompt, max_tokens, temperature, models, response_format),
+                                           text)
+            return value
+
+        return await self.single_flight.async_do(key if parse is None else f"{key}:structured", _call)
+
+    async def _async_guarded_complete(self, prompt: str, max_tokens: int, temperature: float,
+                                      models: List[str] = None, prompt_type: str = 'general',
+                                      response_format: Dict = None) -> str:
+        started = time.monotonic()
+        self._check_breaker_for(prompt_type, started)
+        usage, trace = {}, {}
+        reset, reset_trace = _call_usage.set(usage), _call_trace.set(trace)
+        try:
+            text = await self._async_hedged(
+                lambda: self._async_complete(prompt, max_tokens, temperature, models, response_format), prompt_type)
+        except Exception as e:
+            self._record_outcome(e)
+            self._record_call(prompt_type, started, prompt, None, usage, trace, e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedge loser or an abandoned request): no verdict on the API
+            self.breaker.release_probe()
+            self._record_call(prompt_type, started, prompt, None, usage, trace, status='cancelled')
+            raise
+        finally:
+            _call_usage.reset(reset)
+            _call_trace.reset(reset_trace)
+        self._record_outcome()
+        self.budgeter.record(prompt_type, prompt, text, usage)
+        self._record_call(prompt_type, started, prompt, text, usage, trace)
+        return text
+
+    async def _async_timed(self, call: Callable[[], Awaitable[str]], prompt_type: str) -> str:
+        started = time.monotonic()
+        text = await call()
+        self.hedging.record_latency(prompt_type, time.monotonic() - started)
+        return text
+
+    async def _async_hedged(self, call: Callable[[], Awaitable[str]], prompt_type: str) -> str:
+        """
+        Async counterpart of _hedged; the losing request is cancelled
+        """
+        delay = self.hedging.hedge_delay(prompt_type)
+        if delay is None:
+            return await self._async_timed(call, prompt_type)
+
+        primary = asyncio.ensure_future(self._async_timed(call, prompt_type))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.hedging.try_spend():
+            return await primary
+
+        self._note_hedge()
+        backup = asyncio.ensure_future(self._async_timed(call, prompt_type))
+        pending = {primary, backup}
+        first_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedging.record_hedge_win()
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _async_complete(self, prompt: str, max_tokens: int, temperature: float,
+                              models: List[str] = None, response_format: Dict = None) -> str:
+        if models is not None:
+            model = models[0] if len(models) == 1 else None
+        else:
+            model = self.resolver.get()
+        if not HTTPX_AVAILABLE or model is None:
+            # Model probing is rare and serialised by the sync probe lock, so leave it to the sync path
+            return await asyncio.to_thread(self._complete, prompt, max_tokens, temperature, models, response_format)
+
+        response = await self.async_post_chat_completion(model, prompt, max_tokens, temperature, response_format)
+        if response.status_code == 404 and models is None:
+            self.resolver.invalidate(model)
+            return await asyncio.to_thread(self._complete, prompt, max_tokens, temperature, models, response_format)
+        if response.status_code == 404:
+            raise XAIAPIError("XAI API not available - using fallback responses", 404)
+        return self._completion_text(response)
+
+    async def async_stream_chat_completion(self, prompt: str, max_tokens: int = None, temperature: float = 0.7,
+                                           models: List[str] = None,
+                                           prompt_type: str = 'general') -> AsyncIterator[str]:
+        """
+        Async counterpart of stream_chat_completion.
+        Without httpx or a resolved model the whole completion arrives as a single delta.
+        """
+        if max_tokens is None:
+            max_tokens = self.budgeter.output_budget(prompt_type)
+        started = time.monotonic()
+        self._check_breaker_for(prompt_type, started)
+        parts = []
+        trace = {'attempts': 1}
+        try:
+            async for delta in self._async_hedged_stream(
+                    lambda: self._async_stream(prompt, max_tokens, temperature, models), prompt_type, trace):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self._record_outcome(e)
+            self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace, e)
+            raise
+        except BaseException:
+            # The consumer stopped reading (GeneratorExit) or was cancelled: not a failed call
+            self.breaker.release_probe()
+            self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace, status='cancelled')
+            raise
+        self._record_outcome()
+        self.budgeter.record(prompt_type, prompt, "".join(parts))
+        self._record_call(prompt_type, started, prompt, "".join(parts), {}, trace)
+
+    async def _async_hedged_stream(self, open_stream: Callable[[], AsyncIterator[str]], prompt_type: str,
+                                   trace: Dict) -> AsyncIterator[str]:
+        """
+        Async counterpart of _hedged_stream; the losing stream is cancelled before any delta is forwarded
+        """
+        if not self.hedging.enabled_for(prompt_type):
+            async for delta in open_stream():
+                yield delta
+            return
+
+        delay = self.hedging.hedge_delay(prompt_type, first_token=True)
+        primary = asyncio.ensure_future(self._async_first_delta(open_stream, prompt_type))
+        pending = {primary}
+        try:
+            winner = primary
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self.hedging.try_spend():
+                    self._note_hedge(trace)
+                    trace['attempts'] += 1
+                    backup = asyncio.ensure_future(self._async_first_delta(open_stream, prompt_type))
+                    pending.add(backup)
+                    winner = await self._async_first_winner(pending, backup)
+            stream, first = await winner
+            pending.discard(winner)
+        finally:
+            for task in pending:
+                await _async_discard_first_delta(task)
+
+        if first is None:
+            return
+        try:
+            yield first
+            async for delta in stream:
+                yield delta
+        finally:
+            await stream.aclose()
+
+    async def _async_first_winner(self, pending: set, backup: "asyncio.Future") -> "asyncio.Future":
+        """
+        Wait for the first task to deliver a first delta; the caller discards whatever is left in pending
+        """
+        first_error = None
+        waiting = set(pending)
+        while waiting:
+            done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        self.hedging.record_hedge_win()
+                    return task
+                pending.discard(task)
+                first_error = first_error or task.exception()
+        raise first_error
+
+    async def _async_first_delta(self, open_stream: Callable[[], AsyncIterator[str]],
+                                 prompt_type: str) -> Tuple[AsyncIterator[str], Optional[str]]:
+        """
+        Async counterpart of _first_delta
+        """
+        started = time.monotonic()
+        stream = open_stream()
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        self.hedging.record_latency(prompt_type, time.monotonic() - started, first_token=True)
+        return stream, first
+
+    async def _async_stream(self, prompt: str, max_tokens: int, temperature: float,
+                            models: List[str] = None) -> AsyncIterator[str]:
+        model = self.resolver.get() if models is None else (models[0] if len(models) == 1 else None)
+        if not HTTPX_AVAILABLE or model is None:
+            yield await self._async_complete(prompt, max_tokens, temperature, models)
+            return
+
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        async with self._async_rate_limited(estimate_request_tokens(prompt, max_tokens)) as usage:
+            try:
+                async with self._get_async_http().stream("POST", f"{self.base_url}/chat/completions", json=data) as response:
+                    if response.status_code == 404 and models is None:
+                        reprobe = True
+                    elif response.status_code != 200:
+                        await response.aread()
+                        await self._async_record_usage(response, usage)
+                        raise XAIAPIError(f"XAI API error: {response.status_code} - {response.text}", response.status_code)
+                    else:
+                        async for line in response.aiter_lines():
+                            for delta in iter_sse_deltas([line]):
+                                yield delta
+                        return
+            except httpx.HTTPError as e:
+                raise XAIAPIError(f"XAI API request failed: {e}")
+
+        if reprobe:
+            self.resolver.invalidate(model)
+            yield await self._async_complete(prompt, max_tokens, temperature, models)
+
+    def get_stats(self) -> Dict:
+        """
+        Snapshot of the client's caching, coalescing, protection, token budgeting and per-call metrics
+        """
+        return {
+            'base_url': self.base_url,
+            'resolved_model': self.resolver.get(),
+            'cache': self.cache.get_stats() if self.cache else None,
+            'single_flight': self.single_flight.get_stats(),
+            'rate_limiter': self.limiter.get_stats() if self.limiter else None,
+            'circuit_breaker': self.breaker.get_state(),
+            'hedging': self.hedging.get_stats(),
+            'tokens': self.budgeter.get_stats(),
+            'structured_output': self.structured.get_stats(),
+            'calls': self.metrics.get_stats()
+        }
+
+    def close(self):
+        self.session.close()
+        self.metrics.close()
+
+
+def iter_sse_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Extract content deltas from the server-sent event lines of a streamed completion
+    """
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            return
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            continue
+        choices = chunk.get('choices') or [{}]
+        delta = (choices[0].get('delta') or {}).get('content')
+        if delta:
+            yield delta
+
+
+def _close_first_delta_stream(future: Future):
+    """
+    Close the stream of a losing hedged attempt once its first delta has arrived
+    """
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+
+async def _async_discard_first_delta(task: "asyncio.Future"):
+    """
+    Cancel a losing hedged stream attempt and close its stream if it had already opened
+    """
+    task.cancel()
+    try:
+        stream, _ = await task
+    except (asyncio.CancelledError, Exception):
+        return
+    await stream.aclose()
+
+
+_clients: Dict[Tuple[str, str], XAIClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_xai_client(api_token: str, base_url: str = DEFAULT_BASE_URL) -> XAIClient:
+    """
+    Return the process-wide client for this token, creating and warming it on first use
+    """
+    key = (api_token, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = XAIClient(api_token, base_url)
+            _clients[key] = client
+            client.warm_up()
+        return client
@@ -46,35 +46,23 @@ def clear_thoughts():
     global thought_stream
     thought_stream.clear()
 
-# Initialize core systems
-try:
-    from agents.dynamic_orchestrator import DynamicAgentOrchestrator
-    from agents.neural_learning_system import NeuralLearningSystem
-    
-    orchestrator = DynamicAgentOrchestrator()
-    neural_learning = NeuralLearningSystem()
-    print("✅ Systems initialized successfully")
-except Exception as e:
-    print(f"⚠️ Warning: {e}")
-    orchestrator = None
-    neural_learning = None
-
-# Import all routes from the frontend server
+# Import all routes from the frontend server. It builds the agent system lazily, one orchestrator
+# per conversation session, so nothing is created here at import time.
 try:
     from frontend.server import *
     print("✅ Routes imported successfully")
 except Exception as e:
     print(f"⚠️ Warning importing routes: {e}")
 
-# Health check endpoint
+# Health check endpoint; the frontend server's /api/status takes precedence when its routes are imported
 @app.route('/api/status')
 def status():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'timestamp': time.time(),
-        'orchestrator_available': orchestrator is not None,
-        'neural_learning_available': neural_learning is not None
+        'orchestrator_available': False,
+        'neural_learning_available': False
     })
 
 if __name__ == '__main__':
@@ -22,6 +22,8 @@ class AgentConversationUI {
         this.currentContext = '';
         this.thoughtStream = null;
         this.thoughtStreamActive = false;
+        // In-progress streamed replies by agent and exchange; parallel rounds interleave their deltas
+        this.streamEntries = new Map();
         
         this.initializeElements();
         this.bindEvents();
@@ -706,6 +708,17 @@ class AgentConversationUI {
         const content = document.getElementById('thought-stream-content');
         if (!content) return;
         
+        // Streamed tokens extend the agent's entry for this exchange instead of adding one line per token
+        const streamKey = thought.type === 'agent_delta' ? `${thought.agent_id}:${thought.exchange_number ?? ''}` : null;
+        if (streamKey !== null) {
+            const entry = this.streamEntries.get(streamKey);
+            if (entry && entry.isConnected) {
+                entry.querySelector('.thought-text').textContent += thought.message;
+                content.scrollTop = content.scrollHeight;
+                return;
+            }
+        }
+        
         const thoughtEntry = document.createElement('div');
         thoughtEntry.className = 'thought-entry';
         
@@ -724,6 +737,10 @@ class AgentConversationUI {
             <span class="thought-text">${thoughtText}</span>
         `;
         
+        if (streamKey !== null) {
+            this.streamEntries.set(streamKey, thoughtEntry);
+        }
+        
         content.appendChild(thoughtEntry);
         content.scrollTop = content.scrollHeight;
         
@@ -737,6 +754,7 @@ class AgentConversationUI {
     async clearThoughtStream() {
         try {
             await fetch('/api/thoughts/clear', { method: 'POST' });
+            this.streamEntries.clear();
             const content = document.getElementById('thought-stream-content');
             if (content) {
                 content.innerHTML = `
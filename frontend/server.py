@@ -3,13 +3,15 @@
 Simple Flask server for the Agent Conversation System Frontend
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, g, make_response, has_request_context
 import os
 import sys
 import json
 from datetime import datetime
 import time
+import functools
 import threading
+from collections import deque
 
 # Add the parent directory to the path to import agent modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,9 +20,23 @@ sys.path.insert(0, parent_dir)
 
 app = Flask(__name__)
 
+from agents.keyword_matcher import KeywordMatcher
+
+# Intent keywords for process_conversation, matched on word boundaries in one pass
+MESSAGE_INTENTS = KeywordMatcher({
+    'agent_creation': ['create', 'creating', 'agent*', 'team*', 'employee*', 'hire', 'hiring', 'build', 'building', 'assemble'],
+    'conversation_management': ['exchange', 'next', 'continue', 'proceed'],
+    'help_request': ['help', 'what can you do', 'how', 'guide', 'assist'],
+    'status_check': ['status', 'system', 'health', 'check'],
+    'learning_stats': ['learning', 'neural', 'stats', 'brain'],
+    'conversation_start': ['start', 'begin', 'new', 'project*', 'discuss*', 'talk*']
+})
+
 # Import dynamic agent modules
 try:
     from agents.dynamic_orchestrator import DynamicAgentOrchestrator
+    from agents.conversation_registry import ConversationRegistry, InvalidSessionIdError, SessionNotFoundError, is_valid_session_id
+    from agents.xai_client import get_xai_client, configured_api_token, configured_base_url
     AGENTS_AVAILABLE = True
     print("✅ Successfully imported DynamicAgentOrchestrator")
 except ImportError as e:
@@ -38,52 +54,194 @@ except ImportError as e:
     print(f"Warning: Neural learning system not available: {e}")
     NEURAL_LEARNING_AVAILABLE = False
 
-orchestrator = None
+registry = None
 neural_learning = None
-
-# Global thought stream for real-time updates
-thought_stream = []
-thought_stream_lock = threading.Lock()
-
-def initialize_orchestrator():
-    global orchestrator, neural_learning
-    if orchestrator is None and AGENTS_AVAILABLE:
+_registry_lock = threading.Lock()
+
+# Requests name their session in the JSON body, the query string, this header or the cookie;
+# requests without one get a new session, returned in the header and the cookie
+SESSION_HEADER = 'X-Session-ID'
+SESSION_COOKIE = os.getenv('SESSION_COOKIE_NAME', 'click2lead_session')
+
+class ThoughtStream:
+    """One session's thoughts for real-time updates"""
+    def __init__(self):
+        self.thoughts = deque(maxlen=int(os.getenv('THOUGHT_STREAM_SIZE', '1000')))
+        self.updated = threading.Condition()
+        # Each thought gets a monotonically increasing 'seq' so SSE readers never lose their place when old thoughts are dropped
+        self.seq = 0
+        self.closed = False
+
+# Thought streams by session ID, present while the registry holds the session; the lock only guards
+# the dict, each stream has its own condition
+thought_streams = {}
+thought_streams_lock = threading.Lock()
+# Notified when a stream is opened, so SSE readers can wait for their session to be loaded
+thought_streams_opened = threading.Condition(thought_streams_lock)
+
+def get_thought_stream(session_id):
+    """A session's thought stream, or None while the registry does not hold the session"""
+    with thought_streams_lock:
+        return thought_streams.get(session_id)
+
+def open_thought_stream(session_id):
+    """Give a session its thought stream when the registry creates or reloads it"""
+    with thought_streams_opened:
+        if session_id not in thought_streams:
+            thought_streams[session_id] = ThoughtStream()
+            thought_streams_opened.notify_all()
+
+def wait_for_thought_stream(session_id, timeout):
+    """A session's thought stream once the registry holds the session, or None after timeout seconds"""
+    with thought_streams_opened:
+        thought_streams_opened.wait_for(lambda: session_id in thought_streams, timeout=timeout)
+        return thought_streams.get(session_id)
+
+def drop_thought_stream(session_id):
+    """Forget an evicted session's thoughts and wake its SSE readers"""
+    with thought_streams_lock:
+        if registry is not None and registry.holds(session_id):
+            # Reloaded by another request since it was evicted; that load opened the current stream
+            return
+        stream = thought_streams.pop(session_id, None)
+    if stream is not None:
+        with stream.updated:
+            stream.closed = True
+            stream.updated.notify_all()
+
+def attach_listeners(session_id, session_orchestrator):
+    """Open a session's thought stream and route its agent events into it"""
+    open_thought_stream(session_id)
+    
+    # Stream agent responses token by token into the thought stream
+    if os.getenv('XAI_STREAM_RESPONSES', '1') != '0':
+        # Tagged with the exchange so the frontend can keep interleaved parallel-round replies apart
+        session_orchestrator.agent_manager.delta_listener = lambda agent_id, delta: add_thought(
+            'agent_delta', delta, agent_id, session_id=session_id,
+            exchange_number=session_orchestrator.broker.exchange_count)
+    
+    # Lazily created agents report when their full personality replaces the fallback
+    session_orchestrator.agent_manager.personality_listener = lambda agent: add_thought(
+        'agent_update', f"{agent['role']} personality {agent['personality_status']}", agent['id'], session_id=session_id)
+
+def initialize_registry():
+    global registry, neural_learning
+    if registry is None and AGENTS_AVAILABLE:
+        with _registry_lock:
+            if registry is not None:
+                return True
+            if not configured_api_token():
+                print("Error initializing conversation registry: XAI_API_TOKEN not found in environment variables")
+                return False
+            try:
+                # One orchestrator per session, created on the session's first request
+                registry = ConversationRegistry(DynamicAgentOrchestrator, on_create=attach_listeners,
+                                                on_evict=drop_thought_stream)
+                
+                # Initialize neural learning system
+                if neural_learning is None and NEURAL_LEARNING_AVAILABLE:
+                    neural_learning = NeuralLearningSystem()
+                    print("🧠 Neural learning system initialized")
+            except Exception as e:
+                print(f"Error initializing conversation registry: {e}")
+                return False
+    return registry is not None
+
+def shared_client():
+    """The process-wide LLM client every session's agents use"""
+    return get_xai_client(configured_api_token(), configured_base_url())
+
+def requested_session_id():
+    data = request.get_json(silent=True) or {}
+    return (data.get('session_id') or request.args.get('session_id')
+            or request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE))
+
+def requested_conversation_id():
+    data = request.get_json(silent=True) or {}
+    return data.get('conversation_id') or request.args.get('conversation_id')
+
+def remember_session(response, session_id):
+    response.headers[SESSION_HEADER] = session_id
+    if request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+def with_session(view=None, read_only=False):
+    """
+    Run a view in the request's session, holding that session's lock; the orchestrator is g.orchestrator.
+    Use @with_session(read_only=True) for views that only read the session's state; they run without
+    the lock, alongside the session's other requests, so they must only use thread-safe reads.
+    """
+    if view is None:
+        return functools.partial(with_session, read_only=read_only)
+    
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not initialize_registry():
+            return jsonify({'error': 'Agent system not available'}), 500
+        
         try:
-            orchestrator = DynamicAgentOrchestrator()
-            
-            # Initialize neural learning system
-            if neural_learning is None and NEURAL_LEARNING_AVAILABLE:
-                neural_learning = NeuralLearningSystem()
-                print("🧠 Neural learning system initialized")
-            
-            return True
-        except Exception as e:
-            print(f"Error initializing orchestrator: {e}")
-            return False
-    return AGENTS_AVAILABLE
-
-def add_thought(thought_type, message, agent_id=None):
-    """Add a thought to the global stream"""
-    with thought_stream_lock:
+            session_id = registry.resolve(requested_session_id(), requested_conversation_id())
+        except InvalidSessionIdError as e:
+            return jsonify({'error': str(e)}), 400
+        except SessionNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        
+        g.session_id = session_id
+        with registry.session(session_id, read_only=read_only) as session_orchestrator:
+            g.orchestrator = session_orchestrator
+            response = make_response(view(*args, **kwargs))
+        return remember_session(response, session_id)
+    return wrapper
+
+def add_thought(thought_type, message, agent_id=None, session_id=None, exchange_number=None):
+    """Add a thought to a session's stream, by default the current request's"""
+    if session_id is None:
+        session_id = g.get('session_id') if has_request_context() else None
+        if session_id is None:
+            return
+    stream = get_thought_stream(session_id)
+    if stream is None:
+        return
+    with stream.updated:
+        stream.seq += 1
         thought = {
+            'seq': stream.seq,
             'timestamp': datetime.now().isoformat(),
             'type': thought_type,
             'message': message,
             'agent_id': agent_id
         }
-        thought_stream.append(thought)
-        # Keep only last 100 thoughts
-        if len(thought_stream) > 100:
-            thought_stream.pop(0)
-
-def clear_thoughts():
-    """Clear the thought stream"""
-    with thought_stream_lock:
-        thought_stream.clear()
+        if exchange_number is not None:
+            thought['exchange_number'] = exchange_number
+        # The deque drops the oldest thoughts once full
+        stream.thoughts.append(thought)
+        stream.updated.notify_all()
+
+def clear_thoughts(session_id=None):
+    """Clear a session's thought stream, by default the current request's"""
+    session_id = session_id or g.get('session_id')
+    if session_id is None:
+        return
+    stream = get_thought_stream(session_id)
+    if stream is None:
+        return
+    with stream.updated:
+        stream.thoughts.clear()
+
+def stream_session_id():
+    """Session of a request that does not need the session's orchestrator; a new one if none is named"""
+    session_id = requested_session_id()
+    if session_id and not is_valid_session_id(session_id):
+        return None
+    return session_id or ConversationRegistry.new_session_id()
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    response = send_from_directory('.', 'index.html')
+    # Give the page its session up front so its event stream and requests share it
+    session_id = stream_session_id()
+    return remember_session(response, session_id) if session_id else response
 
 @app.route('/<path:filename>')
 def serve_static(filename):
@@ -91,31 +249,50 @@ def serve_static(filename):
 
 @app.route('/api/thoughts/stream')
 def stream_thoughts():
-    """Stream real-time thoughts as Server-Sent Events"""
+    """Stream one session's real-time thoughts as Server-Sent Events"""
+    session_id = stream_session_id()
+    if session_id is None:
+        return jsonify({'error': 'Invalid session ID'}), 400
+    
     def generate():
-        last_index = 0
+        stream = None
+        last_seq = 0
         while True:
-            with thought_stream_lock:
-                current_thoughts = thought_stream[last_index:]
-                last_index = len(thought_stream)
+            if stream is None or stream.closed:
+                # Wait for the registry to load the session (again, after an eviction); never create its stream here
+                stream = wait_for_thought_stream(session_id, timeout=15)
+                last_seq = 0
+                if stream is None:
+                    yield ": keepalive\n\n"
+                    continue
+            
+            with stream.updated:
+                # Wake as soon as a thought arrives so streamed tokens are not held back
+                stream.updated.wait_for(lambda: stream.seq > last_seq or stream.closed, timeout=15)
+                current_thoughts = [thought for thought in stream.thoughts if thought['seq'] > last_seq]
+                last_seq = stream.seq
+            
+            if not current_thoughts:
+                yield ": keepalive\n\n"
             
             for thought in current_thoughts:
                 yield f"data: {json.dumps(thought)}\n\n"
-            
-            time.sleep(0.5)  # Check every 500ms
     
-    return Response(generate(), mimetype='text/event-stream')
+    return remember_session(Response(generate(), mimetype='text/event-stream'), session_id)
 
 @app.route('/api/thoughts/clear', methods=['POST'])
 def clear_thought_stream():
-    """Clear the thought stream"""
-    clear_thoughts()
-    return jsonify({'status': 'cleared'})
+    """Clear the session's thought stream"""
+    session_id = stream_session_id()
+    if session_id is None:
+        return jsonify({'error': 'Invalid session ID'}), 400
+    clear_thoughts(session_id)
+    return remember_session(jsonify({'status': 'cleared'}), session_id)
 
 @app.route('/api/status')
 def api_status():
     """Check if the dynamic agent system is available"""
-    if initialize_orchestrator():
+    if initialize_registry():
         return jsonify({
             'status': 'available',
             'message': 'Dynamic Agent System is ready',
@@ -124,7 +301,8 @@ def api_status():
                 'Multi-agent conversations',
                 'AI-powered suggestions',
                 'Flexible conversation management'
-            ]
+            ],
+            'llm_circuit': shared_client().breaker.get_state()
         })
     else:
         return jsonify({
@@ -133,11 +311,29 @@ def api_status():
             'features': []
         })
 
+@app.route('/api/llm/metrics')
+def get_llm_metrics():
+    """Get LLM client statistics (per-call latency histograms, cache, request coalescing, rate limiting, circuit breaker, hedging, tokens)"""
+    if not initialize_registry():
+        return jsonify({'error': 'Agent system not available'}), 500
+    
+    try:
+        stats = shared_client().get_stats()
+        stats['sessions'] = registry.get_stats()
+        # Personality prewarming is per session; report the caller's if it is in memory
+        session_id = requested_session_id()
+        session_orchestrator = registry.peek(session_id) if session_id else None
+        if session_orchestrator is not None:
+            stats['personality_prewarm'] = session_orchestrator.agent_manager.get_prewarm_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/conversation/start', methods=['POST'])
+@with_session
 def start_conversation():
     """Start a new conversation with dynamic agents"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         data = request.get_json()
@@ -155,10 +351,10 @@ def start_conversation():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/agents/create', methods=['POST'])
+@with_session
 def create_agents():
     """Create agents from user specification with real-time updates"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         data = request.get_json()
@@ -243,10 +439,10 @@ def create_agents():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/conversation/exchange', methods=['POST'])
+@with_session
 def conduct_exchange():
     """Conduct one exchange between agents"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         result = orchestrator.conduct_exchange()
@@ -256,10 +452,10 @@ def conduct_exchange():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/conversation/full', methods=['POST'])
+@with_session
 def run_full_conversation():
     """Run a full conversation from start to finish"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         data = request.get_json()
@@ -278,10 +474,10 @@ def run_full_conversation():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/conversation/reset', methods=['POST'])
+@with_session
 def reset_conversation():
     """Reset the current conversation"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         orchestrator.reset_conversation()
@@ -291,10 +487,10 @@ def reset_conversation():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/agents/list')
+@with_session(read_only=True)
 def list_agents():
     """Get all created agents"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         agents = orchestrator.get_all_agents()
@@ -304,10 +500,10 @@ def list_agents():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/agents/suggestions', methods=['POST'])
+@with_session(read_only=True)
 def get_agent_suggestions():
     """Get agent role suggestions for a topic"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         data = request.get_json()
@@ -324,10 +520,10 @@ def get_agent_suggestions():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/conversation/status')
+@with_session(read_only=True)
 def get_conversation_status():
     """Get current conversation status"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         status = orchestrator.get_conversation_status()
@@ -392,10 +588,10 @@ def get_demo_scenario(scenario):
         return jsonify({'error': 'Demo scenario not found'}), 404
 
 @app.route('/api/conversation/process', methods=['POST'])
+@with_session
 def process_conversation():
     """Process any conversation prompt intelligently with real-time updates"""
-    if not initialize_orchestrator():
-        return jsonify({'error': 'Agent system not available'}), 500
+    orchestrator = g.orchestrator
     
     try:
         data = request.get_json()
@@ -439,13 +635,10 @@ def process_conversation():
                 time.sleep(0.5)
                 
                 # Step 2: Determine response type based on neural prediction
-                lower_message = user_message.lower()
+                intents = MESSAGE_INTENTS.match(user_message)
                 
                 # Check for agent creation intent
-                agent_keywords = ['create', 'agent', 'team', 'employees', 'hire', 'build', 'assemble']
-                agent_indicators = any(keyword in lower_message for keyword in agent_keywords)
-                
-                if agent_indicators:
+                if 'agent_creation' in intents:
                     add_thought('system', 'Detected agent creation request')
                     add_thought('system', 'Preparing to create dynamic agents...')
                     add_thought('system', f'User request: "{user_message[:100]}{"..." if len(user_message) > 100 else ""}"')
@@ -486,7 +679,7 @@ def process_conversation():
                         }
                 
                 # Check for conversation management
-                elif any(word in lower_message for word in ['exchange', 'next', 'continue', 'proceed']):
+                elif 'conversation_management' in intents:
                     add_thought('system', 'Detected conversation management request')
                     add_thought('system', 'Preparing to conduct agent exchange...')
                     time.sleep(0.5)
@@ -519,7 +712,7 @@ def process_conversation():
                         }
                 
                 # Check for help requests
-                elif any(word in lower_message for word in ['help', 'what can you do', 'how', 'guide', 'assist']):
+                elif 'help_request' in intents:
                     add_thought('system', 'Detected help request')
                     add_thought('system', 'Generating helpful response...')
                     time.sleep(0.5)
@@ -554,13 +747,13 @@ What would you like to do today?"""
                     }
                 
                 # Check for status requests
-                elif any(word in lower_message for word in ['status', 'system', 'health', 'check']):
+                elif 'status_check' in intents:
                     add_thought('system', 'Detected system status request')
                     add_thought('system', 'Checking system health...')
                     time.sleep(0.5)
                     
                     # Check if user is asking about learning stats
-                    if any(word in lower_message for word in ['learning', 'neural', 'stats', 'brain']):
+                    if 'learning_stats' in intents:
                         add_thought('system', 'User requesting neural learning statistics')
                         return {
                             'type': 'learning_stats',
@@ -595,7 +788,7 @@ Everything is running smoothly! Ready to create your agent team."""
                     }
                 
                 # Check for general conversation starters
-                elif any(word in lower_message for word in ['start', 'begin', 'new', 'project', 'discuss', 'talk']):
+                elif 'conversation_start' in intents:
                     add_thought('system', 'Detected conversation starter')
                     add_thought('system', 'Suggesting agent creation for better discussion...')
                     time.sleep(0.5)
@@ -692,7 +885,7 @@ if __name__ == '__main__':
     print("Server will be available at: http://localhost:5001")
     print("Press Ctrl+C to stop the server")
     
-    if initialize_orchestrator():
+    if initialize_registry():
         print("✅ Dynamic Agent System is available")
     else:
         print("⚠️  Dynamic Agent System not available - running in demo mode")